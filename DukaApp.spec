@@ -5,6 +5,23 @@ from PyInstaller.utils.hooks import collect_all
 # Collect Streamlit and its dynamic imports
 streamlit_datas, streamlit_binaries, streamlit_hidden = collect_all("streamlit")
 
+# Heavy modules nothing in Duka App imports; leaving them out shrinks the
+# bundle and the one-file unpack on every cold start.
+EXCLUDES = [
+    'tkinter',
+    'matplotlib',
+    'scipy',
+    'IPython',
+    'jupyter_client',
+    'notebook',
+    'pytest',
+    'sphinx',
+    'PyQt5',
+    'PyQt6',
+    'PySide2',
+    'PySide6',
+]
+
 a = Analysis(
     ['app.py'],
     pathex=[],
@@ -21,7 +38,7 @@ a = Analysis(
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=EXCLUDES,
     noarchive=False,
     optimize=0,
 )
@@ -0,0 +1,294 @@
+"""Headless HTTP/JSON API for Duka App.
+
+Lets a second till, a handheld scanner or a price checker talk to
+`stock.db` without going through Streamlit.
+
+    python api_server.py --port 8600
+
+Endpoints
+- GET  /api/health
+- GET  /api/products/<barcode>            single lookup (price checkers)
+- GET  /api/products?barcode=A&barcode=B  batch lookup
+- GET  /api/products/search?q=socks&limit=20  (limit 1-100)
+- POST /api/checkout   {"attendant": "...", "items": [{"barcode": "...", "qty": 1}]}
+  (qty counts scans: a pack barcode sells its pack size in base units)
+- GET  /api/summary?date=YYYY-MM-DD
+
+Lookups are served from an in-memory barcode cache. The cache is dropped
+whenever `PRAGMA data_version` shows that another connection (e.g. the
+Streamlit till) committed, or after our own checkouts. Cache misses that
+arrive in the same event-loop tick are coalesced into one `IN (...)` query.
+Writes run on a single worker thread with its own connection so a slow
+commit never stalls lookups.
+"""
+
+import argparse
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import tornado.ioloop
+import tornado.web
+
+from database.tables import (
+    init_db,
+    get_connection,
+    get_products_by_barcodes,
+    search_products_by_name,
+    checkout,
+    get_sales_summary
+)
+
+MAX_SEARCH_LIMIT = 100
+
+
+# ---------------------------
+# Cached catalogue
+# ---------------------------
+class ProductCache:
+    """Barcode -> product row cache with batched misses."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.rows = {}
+        self.data_version = None
+        self.pending = {}
+        self.flush_scheduled = False
+
+    def _check_version(self):
+        version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        if version != self.data_version:
+            self.rows.clear()
+            self.data_version = version
+
+    def invalidate(self):
+        self.rows.clear()
+
+    def lookup_many(self, barcodes):
+        """Synchronous batch lookup, used by the batch endpoint."""
+        self._check_version()
+        missing = [b for b in barcodes if b not in self.rows]
+        if missing:
+            found = get_products_by_barcodes(missing, conn=self.conn)
+            for barcode in missing:
+                self.rows[barcode] = found.get(barcode)
+        return {b: self.rows[b] for b in barcodes}
+
+    def lookup(self, barcode):
+        """Return an awaitable for one barcode, batching cache misses."""
+        self._check_version()
+        future = asyncio.get_running_loop().create_future()
+        if barcode in self.rows:
+            future.set_result(self.rows[barcode])
+            return future
+
+        self.pending.setdefault(barcode, []).append(future)
+        if not self.flush_scheduled:
+            self.flush_scheduled = True
+            tornado.ioloop.IOLoop.current().add_callback(self._flush)
+        return future
+
+    def _flush(self):
+        pending, self.pending = self.pending, {}
+        self.flush_scheduled = False
+        try:
+            found = get_products_by_barcodes(pending.keys(), conn=self.conn)
+        except Exception as e:
+            for futures in pending.values():
+                for future in futures:
+                    future.set_exception(e)
+            return
+        for barcode, futures in pending.items():
+            row = found.get(barcode)
+            self.rows[barcode] = row
+            for future in futures:
+                future.set_result(row)
+
+
+def checkout_line_error(n, line):
+    """Why checkout item `n` is malformed, or None if it is fine."""
+    if not isinstance(line, dict):
+        return f"Item {n} must be an object"
+    qty = line.get("qty", 1)
+    # bool is an int subclass; "2" * pack_qty would repeat the string
+    if isinstance(qty, bool) or not isinstance(qty, int) or qty < 1:
+        return f"Item {n}: qty must be a whole number of at least 1"
+    product_id, barcode = line.get("product_id"), line.get("barcode")
+    if product_id is None:
+        if not isinstance(barcode, str) or not barcode:
+            return f"Item {n} needs a barcode or product_id"
+    elif isinstance(product_id, bool) or not isinstance(product_id, int):
+        return f"Item {n}: product_id must be an integer"
+    return None
+
+
+def product_json(barcode, row):
+    product_id, name, price, quantity, pack_qty = row
+    return {
+        "id": product_id,
+        "name": name,
+        "price": price,
+        "quantity": quantity,
+        "barcode": barcode,
+        "pack_qty": pack_qty
+    }
+
+
+# ---------------------------
+# Handlers
+# ---------------------------
+class BaseHandler(tornado.web.RequestHandler):
+    def initialize(self, state):
+        self.state = state
+
+    def set_default_headers(self):
+        self.set_header("Content-Type", "application/json")
+
+    def send_json(self, payload, status=200):
+        self.set_status(status)
+        self.finish(json.dumps(payload))
+
+    def write_error(self, status_code, **kwargs):
+        self.finish(json.dumps({"error": self._reason}))
+
+
+class HealthHandler(BaseHandler):
+    def get(self):
+        self.send_json({"status": "ok"})
+
+
+class ProductHandler(BaseHandler):
+    async def get(self, barcode):
+        row = await self.state["cache"].lookup(barcode)
+        if row is None:
+            self.send_json({"error": "Product not found"}, status=404)
+        else:
+            self.send_json(product_json(barcode, row))
+
+
+class ProductBatchHandler(BaseHandler):
+    def get(self):
+        barcodes = self.get_arguments("barcode")
+        if not barcodes:
+            self.send_json({"error": "Pass one or more ?barcode= values"}, status=400)
+            return
+        rows = self.state["cache"].lookup_many(barcodes)
+        self.send_json({
+            "products": [product_json(b, r) for b, r in rows.items() if r],
+            "missing": [b for b, r in rows.items() if r is None]
+        })
+
+
+class SearchHandler(BaseHandler):
+    def get(self):
+        query = self.get_argument("q", "").strip()
+        try:
+            limit = int(self.get_argument("limit", "20"))
+        except ValueError:
+            self.send_json({"error": "limit must be a whole number"}, status=400)
+            return
+        limit = min(max(limit, 1), MAX_SEARCH_LIMIT)
+        rows = search_products_by_name(query, limit=limit, conn=self.state["conn"])
+        self.send_json({"products": [
+            {"id": pid, "name": name, "price": price, "quantity": qty}
+            for pid, name, price, qty in rows
+        ]})
+
+
+class CheckoutHandler(BaseHandler):
+    async def post(self):
+        try:
+            body = json.loads(self.request.body or b"{}")
+            attendant = body["attendant"].strip()
+            lines = body["items"]
+        except (ValueError, KeyError, AttributeError, TypeError):
+            self.send_json({"error": "Expected {attendant, items}"}, status=400)
+            return
+        if not attendant or not lines:
+            self.send_json({"error": "Attendant and items are required"}, status=400)
+            return
+        if not isinstance(lines, list):
+            self.send_json({"error": "items must be a list"}, status=400)
+            return
+        for n, line in enumerate(lines, 1):
+            error = checkout_line_error(n, line)
+            if error:
+                self.send_json({"error": error}, status=400)
+                return
+
+        cache = self.state["cache"]
+        barcodes = [line["barcode"] for line in lines if line.get("product_id") is None]
+        found = cache.lookup_many(barcodes) if barcodes else {}
+
+        items = []
+        for line in lines:
+            product_id = line.get("product_id")
+            qty = line.get("qty", 1)
+            if product_id is None:
+                row = found.get(line.get("barcode"))
+                if row is None:
+                    self.send_json({"error": f"Unknown barcode {line.get('barcode')}"}, status=404)
+                    return
+                # a pack barcode sells pack_qty base units per scan
+                product_id, qty = row[0], qty * row[4]
+            items.append({"product_id": product_id, "qty": qty})
+
+        loop = asyncio.get_running_loop()
+        try:
+            receipt_no, total = await loop.run_in_executor(
+                self.state["writer"], checkout, items, attendant, self.state["write_conn"]
+            )
+        except ValueError as e:
+            self.send_json({"error": str(e)}, status=409)
+            return
+        finally:
+            cache.invalidate()
+
+        self.send_json({"receipt_no": receipt_no, "total": total}, status=201)
+
+
+class SummaryHandler(BaseHandler):
+    def get(self):
+        day = self.get_argument("date", None)
+        count, qty, total = get_sales_summary(day, conn=self.state["conn"])
+        self.send_json({"transactions": count, "items_sold": qty, "total": total})
+
+
+# ---------------------------
+# App
+# ---------------------------
+def make_app():
+    init_db()
+    conn = get_connection()
+    state = {
+        "conn": conn,
+        "cache": ProductCache(conn),
+        # one writer thread + one write connection: commits are serialised
+        # here instead of fighting over the SQLite lock
+        "writer": ThreadPoolExecutor(max_workers=1),
+        "write_conn": get_connection()
+    }
+    args = {"state": state}
+    return tornado.web.Application([
+        (r"/api/health", HealthHandler, args),
+        (r"/api/products/search", SearchHandler, args),
+        (r"/api/products", ProductBatchHandler, args),
+        (r"/api/products/([A-Za-z0-9-]+)", ProductHandler, args),
+        (r"/api/checkout", CheckoutHandler, args),
+        (r"/api/summary", SummaryHandler, args),
+    ])
+
+
+async def main(host, port):
+    app = make_app()
+    app.listen(port, address=host)
+    print(f"Duka API listening on http://{host}:{port}")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Duka App headless API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    opts = parser.parse_args()
+    asyncio.run(main(opts.host, opts.port))
@@ -2,9 +2,15 @@ import streamlit as st
 from modules.products import product_ui
 from modules.sales import sales_ui
 from modules.reports import reports_ui
+from modules.inventory import inventory_ui
+from modules.maintenance import maintenance_ui
+from modules.promotions import promotions_ui
+from modules.stock_take import stock_take_ui
 from database.tables import init_db
+from database.scheduler import start_scheduler
+from database.tenants import list_tenants, set_tenant_resolver
 
-from utils.visitor_db import init_visitor_db
+from utils.visitor_db import init_visitor_db, record_event
 from utils.whatsapp_notifier import notify
 
 
@@ -21,8 +27,13 @@ st.set_page_config(
 # ---------------------------
 # Initialize DBs
 # ---------------------------
+# every data-layer call goes to the shop picked at login (the single-shop
+# DB before login, or when no shops are hosted)
+set_tenant_resolver(lambda: st.session_state.get("tenant"))
+
 init_db()
 init_visitor_db()
+start_scheduler()
 
 
 # =====================================================
@@ -31,8 +42,10 @@ init_visitor_db()
 
 def login_screen():
     st.title("🔐 Duka App Login")
+    shops = list_tenants()
 
     with st.form("login_form"):
+        shop = st.selectbox("Shop", shops) if shops else None
         name = st.text_input("Your Name")
         password = st.text_input("Password", type="password")
         st.caption("Demo password: 1234")  # 👈 hint
@@ -41,11 +54,18 @@ def login_screen():
     if submitted:
         # demo password (change if you want)
         if password == "1234" and name.strip():
+            st.session_state.tenant = shop
             st.session_state.logged_in = True
             st.session_state.username = name
+            record_event(name, "login")
 
             # 🔔 SEND WHATSAPP NOTIFICATION HERE
-            notify(name, "Logged into Duka App")
+            # best effort: a missing Twilio setup or no internet must not
+            # stop staff from logging in
+            try:
+                notify(name, "Logged into Duka App")
+            except Exception:
+                pass
 
             st.success("Welcome!")
             st.rerun()
@@ -69,16 +89,19 @@ if not st.session_state.logged_in:
 # =====================================================
 
 st.sidebar.title("🧦 Duka App")
+if st.session_state.get("tenant"):
+    st.sidebar.write(f"🏪 {st.session_state.tenant}")
 st.sidebar.write(f"👤 {st.session_state.username}")
 
 if st.sidebar.button("Logout"):
+    record_event(st.session_state.username, "logout")
     st.session_state.clear()
     st.rerun()
 
 
 page = st.sidebar.radio(
     "Navigate",
-    ["Products", "Sales", "Reports"]
+    ["Products", "Sales", "Promotions", "Stock Take", "Reports", "Inventory", "Maintenance"]
 )
 
 
@@ -91,5 +114,17 @@ if page == "Products":
 elif page == "Sales":
     sales_ui()
 
+elif page == "Promotions":
+    promotions_ui()
+
+elif page == "Stock Take":
+    stock_take_ui()
+
 elif page == "Reports":
     reports_ui()
+
+elif page == "Inventory":
+    inventory_ui()
+
+elif page == "Maintenance":
+    maintenance_ui()
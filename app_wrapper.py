@@ -1,24 +1,173 @@
-import webview
 import threading
 import subprocess
+import socket
 import sys
 import os
 import time
+import urllib.request
+from datetime import datetime
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 # Path to your Streamlit app
-streamlit_app = os.path.join(os.path.dirname(__file__), "app.py")
+streamlit_app = os.path.join(BASE_DIR, "app.py")
+
+HEALTH_TIMEOUT = 90  # seconds; slow shop PCs can take a while on first run
+LAUNCH_LOG = os.path.join(BASE_DIR, "launcher.log")
+
+SPLASH_HTML = """
+<html>
+<body style="font-family:sans-serif;display:flex;align-items:center;
+             justify-content:center;height:100vh;margin:0;background:#f5f5f5">
+  <div style="text-align:center">
+    <div style="font-size:64px">🧦</div>
+    <h2 style="color:#4CAF50">Duka App</h2>
+    <p id="status">Starting, please wait…</p>
+  </div>
+</body>
+</html>
+"""
+
+
+def run_streamlit_here(port):
+    """Entry point for the child process: run the Streamlit server in-process.
+
+    Used instead of `python -m streamlit` so the same code path works from a
+    PyInstaller build, where sys.executable is this launcher.
+    """
+    from streamlit.web import cli
+    sys.argv = [
+        "streamlit", "run", streamlit_app,
+        "--server.port", str(port),
+        "--server.headless", "true",
+        "--server.fileWatcherType", "none",
+        "--global.developmentMode", "false",
+        "--browser.gatherUsageStats", "false",
+    ]
+    sys.exit(cli.main())
+
+
+def pick_port(preferred=8501):
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        if s.connect_ex(("127.0.0.1", preferred)) != 0:
+            return preferred
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port):
+    """Start Streamlit in a child process"""
+    if getattr(sys, "frozen", False):
+        cmd = [sys.executable, "--streamlit", str(port)]
+    else:
+        cmd = [sys.executable, os.path.abspath(__file__), "--streamlit", str(port)]
+    return subprocess.Popen(cmd, cwd=BASE_DIR)
+
+
+def wait_until_ready(port, proc, timeout=HEALTH_TIMEOUT):
+    """Poll Streamlit's health endpoint until it answers "ok".
+
+    Returns seconds waited, or None if the server died or timed out.
+    """
+    url = f"http://127.0.0.1:{port}/_stcore/health"
+    started = time.perf_counter()
+    delay = 0.05
+    while time.perf_counter() - started < timeout:
+        if proc.poll() is not None:
+            return None
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return time.perf_counter() - started
+        except OSError:
+            pass
+        time.sleep(delay)
+        delay = min(delay * 1.5, 0.5)
+    return None
+
+
+def prewarm():
+    """Create/migrate the DB and pull it into the OS file cache.
+
+    Runs while Streamlit is still booting, so the first page render reads
+    the catalogue from memory instead of a cold disk.
+    """
+    from database.tables import DB_PATH, init_db, get_products
+    from database.scheduler import start_scheduler
+
+    started = time.perf_counter()
+    init_db()
+    with open(DB_PATH, "rb") as f:
+        while f.read(1024 * 1024):
+            pass
+    get_products()
+    # Maintenance jobs run here, off the Streamlit server process; the
+    # scheduler lease stops app.py's copy from running them as well.
+    start_scheduler()
+    return time.perf_counter() - started
+
+
+def log_startup(timings):
+    line = f"{datetime.now():%Y-%m-%d %H:%M:%S} " + " ".join(
+        f"{k}={v:.2f}s" if isinstance(v, float) else f"{k}={v}" for k, v in timings.items()
+    )
+    print(f"[launcher] {line}")
+    try:
+        with open(LAUNCH_LOG, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+    except OSError:
+        pass
+
+
+def main():
+    import webview  # not needed by the server child process
+
+    launched = time.perf_counter()
+    timings = {}
+
+    port = pick_port()
+    proc = start_server(port)
+
+    prewarm_thread = threading.Thread(
+        target=lambda: timings.__setitem__("prewarm", prewarm()), daemon=True
+    )
+    prewarm_thread.start()
+
+    window = webview.create_window("Duka App 🧦", html=SPLASH_HTML, width=900, height=700)
 
-def run_streamlit():
-    """Run Streamlit in the background"""
-    subprocess.run([sys.executable, "-m", "streamlit", "run", streamlit_app, "--server.port", "8501"])
+    def on_loaded():
+        if "page_loaded" not in timings and "server_ready" in timings:
+            timings["page_loaded"] = time.perf_counter() - launched
+            log_startup(timings)
 
-# Start Streamlit in a background thread
-threading.Thread(target=run_streamlit, daemon=True).start()
+    def boot():
+        waited = wait_until_ready(port, proc)
+        if waited is None:
+            window.evaluate_js(
+                "document.getElementById('status').innerText ="
+                " 'Could not start the app server. Please restart Duka App.'"
+            )
+            timings["server_ready"] = "failed"
+            log_startup(timings)
+            return
+        timings["server_ready"] = time.perf_counter() - launched
+        prewarm_thread.join()
+        window.events.loaded += on_loaded
+        window.load_url(f"http://127.0.0.1:{port}")
 
-# Give the server a few seconds to start
-time.sleep(2)
+    try:
+        webview.start(boot)
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            proc.kill()
 
-# Open a desktop window pointing to the local Streamlit server
-webview.create_window("Duka App 🧦", "http://127.0.0.1:8501", width=900, height=700)
-webview.start()
 
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "--streamlit":
+        run_streamlit_here(int(sys.argv[2]))
+    else:
+        main()
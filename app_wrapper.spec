@@ -6,9 +6,42 @@ binaries = []
 hiddenimports = []
 tmp_ret = collect_all('streamlit')
 datas += tmp_ret[0]; binaries += tmp_ret[1]; hiddenimports += tmp_ret[2]
-tmp_ret = collect_all('pywebview')
+tmp_ret = collect_all('webview')
 datas += tmp_ret[0]; binaries += tmp_ret[1]; hiddenimports += tmp_ret[2]
 
+# app.py is started by Streamlit at runtime, so ship it and its packages
+# as data and list the third-party modules they import.
+datas += [
+    ('app.py', '.'),
+    ('assets', 'assets'),
+    ('database/*.py', 'database'),
+    ('modules', 'modules'),
+    ('utils/*.py', 'utils'),
+]
+hiddenimports += [
+    'pandas',
+    'barcode',
+    'barcode.writer',
+    'twilio.rest',
+]
+
+# Heavy modules nothing in Duka App imports; leaving them out shrinks the
+# bundle and the one-file unpack on every cold start.
+EXCLUDES = [
+    'tkinter',
+    'matplotlib',
+    'scipy',
+    'IPython',
+    'jupyter_client',
+    'notebook',
+    'pytest',
+    'sphinx',
+    'PyQt5',
+    'PyQt6',
+    'PySide2',
+    'PySide6',
+]
+
 
 a = Analysis(
     ['app_wrapper.py'],
@@ -19,7 +52,7 @@ a = Analysis(
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=EXCLUDES,
     noarchive=False,
     optimize=0,
 )
@@ -0,0 +1,275 @@
+"""Online backups of `stock.db` using the SQLite backup API.
+
+Copying the file while the till writes can produce a torn copy. Here the
+live DB is copied with `sqlite3.Connection.backup` a few pages at a time,
+sleeping between steps so the till can take its write lock, then gzipped
+and rotated.
+
+    python -m database.backup run            # one snapshot now
+    python -m database.backup list
+    python -m database.backup verify database/backups/stock-....db.gz
+    python -m database.backup restore database/backups/stock-....db.gz
+
+Each run reports its duration. `run` from the command line also reports
+the lock-wait a writer saw while the backup was running, measured by a
+probe connection taking BEGIN EXCLUSIVE. Scheduled backups skip the probe:
+it competes with the till for the very lock it measures.
+"""
+
+import argparse
+import glob
+import gzip
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from database.tables import DB_PATH, BASE_DIR
+from database.tenants import current_tenant, tenant_file
+
+BACKUP_DIR = os.path.join(BASE_DIR, "backups")
+BACKUP_PREFIX = "stock-"
+BACKUP_SUFFIX = ".db.gz"
+
+
+# ---------------------------
+# Lock-wait probe
+# ---------------------------
+class LockProbe(threading.Thread):
+    """Repeatedly take and release the write lock, recording the wait.
+
+    Stands in for the till: the waits it records are what a checkout
+    committing during the backup would have seen.
+    """
+
+    def __init__(self, db_path, interval=0.02):
+        super().__init__(daemon=True)
+        self.db_path = db_path
+        self.interval = interval
+        self.waits = []
+        self.stopped = threading.Event()
+
+    def run(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            while not self.stopped.is_set():
+                start = time.perf_counter()
+                conn.execute("BEGIN EXCLUSIVE")
+                self.waits.append(time.perf_counter() - start)
+                conn.execute("ROLLBACK")
+                self.stopped.wait(self.interval)
+        finally:
+            conn.close()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        return {
+            "probes": len(self.waits),
+            "max_wait_ms": round(max(self.waits, default=0) * 1000, 2),
+            "avg_wait_ms": round(sum(self.waits) / len(self.waits) * 1000, 2) if self.waits else 0
+        }
+
+
+# ---------------------------
+# Backup / rotate
+# ---------------------------
+def current_backup_dir():
+    """Backup folder for the current shop (BACKUP_DIR when none is selected)."""
+    tenant = current_tenant()
+    return BACKUP_DIR if tenant is None else tenant_file(tenant, "backups")
+
+
+def list_backups(backup_dir=BACKUP_DIR):
+    """Return snapshot paths, oldest first."""
+    return sorted(glob.glob(os.path.join(backup_dir, f"{BACKUP_PREFIX}*{BACKUP_SUFFIX}")))
+
+
+def rotate_backups(keep, backup_dir=BACKUP_DIR):
+    removed = []
+    for path in list_backups(backup_dir)[:-keep] if keep > 0 else []:
+        os.remove(path)
+        removed.append(path)
+    return removed
+
+
+def backup_database(
+    db_path=DB_PATH,
+    backup_dir=BACKUP_DIR,
+    pages=256,
+    sleep=0.05,
+    keep=14,
+    measure_lock_wait=False
+):
+    """Take one compressed snapshot of `db_path`.
+
+    pages/sleep: copy `pages` pages per step and pause `sleep` seconds
+    between steps so writers get the lock.
+    keep: number of snapshots to keep (older ones are deleted).
+    measure_lock_wait: run a LockProbe alongside the copy (diagnostics).
+    Returns a dict of stats.
+    """
+    os.makedirs(backup_dir, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    final_path = os.path.join(backup_dir, f"{BACKUP_PREFIX}{stamp}{BACKUP_SUFFIX}")
+
+    steps = 0
+    restarts = 0
+    last_remaining = None
+
+    def progress(status, remaining, total):
+        nonlocal steps, restarts, last_remaining
+        steps += 1
+        # a write through another connection restarts the copy
+        if last_remaining is not None and remaining > last_remaining:
+            restarts += 1
+        last_remaining = remaining
+
+    probe = LockProbe(db_path) if measure_lock_wait else None
+    fd, tmp_path = tempfile.mkstemp(suffix=".db", dir=backup_dir)
+    os.close(fd)
+
+    started = time.perf_counter()
+    if probe:
+        probe.start()
+    try:
+        src = sqlite3.connect(db_path)
+        dst = sqlite3.connect(tmp_path)
+        try:
+            src.backup(dst, pages=pages, progress=progress, sleep=sleep)
+        finally:
+            dst.close()
+            src.close()
+        copied = time.perf_counter()
+
+        with open(tmp_path, "rb") as f_in, gzip.open(final_path + ".tmp", "wb", compresslevel=6) as f_out:
+            shutil.copyfileobj(f_in, f_out, 1024 * 1024)
+        os.replace(final_path + ".tmp", final_path)
+        raw_size = os.path.getsize(tmp_path)
+    finally:
+        lock_stats = probe.stop() if probe else {}
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    finished = time.perf_counter()
+    return {
+        "path": final_path,
+        "duration_s": round(finished - started, 3),
+        "copy_s": round(copied - started, 3),
+        "steps": steps,
+        "restarts": restarts,
+        "size_bytes": raw_size,
+        "compressed_bytes": os.path.getsize(final_path),
+        "lock_wait": lock_stats,
+        "rotated_out": rotate_backups(keep, backup_dir)
+    }
+
+
+# ---------------------------
+# Verify / restore
+# ---------------------------
+def _unpack(path, directory):
+    fd, tmp_path = tempfile.mkstemp(suffix=".db", dir=directory)
+    with os.fdopen(fd, "wb") as f_out, gzip.open(path, "rb") as f_in:
+        shutil.copyfileobj(f_in, f_out, 1024 * 1024)
+    return tmp_path
+
+
+def verify_backup(path):
+    """Check a snapshot opens and passes integrity_check.
+
+    Returns a dict with `ok`, the integrity result and row counts.
+    """
+    tmp_path = _unpack(path, os.path.dirname(os.path.abspath(path)))
+    try:
+        conn = sqlite3.connect(tmp_path)
+        try:
+            result = conn.execute("PRAGMA integrity_check").fetchone()[0]
+            counts = {
+                table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ("products", "sales")
+            }
+        finally:
+            conn.close()
+    except sqlite3.DatabaseError as e:
+        return {"ok": False, "integrity": str(e), "counts": {}}
+    finally:
+        os.remove(tmp_path)
+    return {"ok": result == "ok", "integrity": result, "counts": counts}
+
+
+def restore_backup(path, db_path=DB_PATH, backup_dir=BACKUP_DIR):
+    """Verify `path` and copy it over the live DB.
+
+    The current DB is snapshotted first. The copy goes through the backup
+    API so connections that are still open see a consistent database.
+    """
+    check = verify_backup(path)
+    if not check["ok"]:
+        raise ValueError(f"Backup failed verification: {check['integrity']}")
+
+    safety = backup_database(db_path, backup_dir, keep=0, measure_lock_wait=False)
+
+    tmp_path = _unpack(path, backup_dir)
+    try:
+        src = sqlite3.connect(tmp_path)
+        dst = sqlite3.connect(db_path, timeout=30)
+        try:
+            src.backup(dst)
+        finally:
+            dst.close()
+            src.close()
+    finally:
+        os.remove(tmp_path)
+    return {"restored": path, "previous": safety["path"], "counts": check["counts"]}
+
+
+# ---------------------------
+# CLI
+# ---------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Duka DB backups")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_run = sub.add_parser("run", help="take a snapshot now")
+    p_run.add_argument("--keep", type=int, default=14)
+    p_run.add_argument("--pages", type=int, default=256)
+    p_run.add_argument("--sleep", type=float, default=0.05)
+
+    sub.add_parser("list", help="list snapshots")
+
+    p_verify = sub.add_parser("verify", help="check a snapshot")
+    p_verify.add_argument("path")
+
+    p_restore = sub.add_parser("restore", help="verify and restore a snapshot")
+    p_restore.add_argument("path")
+
+    opts = parser.parse_args()
+
+    if opts.command == "run":
+        stats = backup_database(pages=opts.pages, sleep=opts.sleep, keep=opts.keep,
+                                measure_lock_wait=True)
+        lock = stats["lock_wait"]
+        print(f"Backup written to {stats['path']}")
+        print(f"  duration: {stats['duration_s']}s (copy {stats['copy_s']}s, {stats['steps']} steps, {stats['restarts']} restarts)")
+        print(f"  size: {stats['size_bytes']} -> {stats['compressed_bytes']} bytes")
+        print(f"  till lock wait: max {lock['max_wait_ms']} ms, avg {lock['avg_wait_ms']} ms over {lock['probes']} probes")
+
+    elif opts.command == "list":
+        for path in list_backups():
+            print(f"{path}  {os.path.getsize(path)} bytes")
+
+    elif opts.command == "verify":
+        result = verify_backup(opts.path)
+        print(("OK" if result["ok"] else "FAILED") + f": {result['integrity']} {result['counts']}")
+
+    else:
+        result = restore_backup(opts.path)
+        print(f"Restored {result['restored']} (previous DB saved as {result['previous']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""In-process change feed for pages that are already open.
+
+The write functions in database/tables.py publish what they changed
+after committing: an entity name and the ids touched. Each publish
+bumps the feed's data version.
+
+    products   product ids (stock, price, details, deletes)
+    sales      receipt ids of completed checkouts
+
+A page keeps a `Subscription` in its session and polls it from a
+fragment every few seconds. A poll is a version compare and a walk over
+the newest events, with no DB access. It returns {entity: ids} for what
+changed since the previous poll, so the page re-reads only those rows.
+A poll returns None when the subscriber fell so far behind that events
+were dropped (the feed keeps the last KEEP_EVENTS). The page then
+reloads everything once.
+
+There is one feed per shop (see database/tenants.py). Only writes made
+by this process are published; the API server or another process
+writing the same file shows up on the next full load.
+"""
+
+import threading
+from collections import deque
+
+from database.tenants import current_tenant
+
+KEEP_EVENTS = 4096
+POLL_SECONDS = 5  # how often open pages poll the feed
+
+
+class ChangeFeed:
+    def __init__(self, keep=KEEP_EVENTS):
+        self.version = 0
+        self.events = deque(maxlen=keep)  # (version, entity, frozenset of ids)
+        self.lock = threading.Lock()
+
+    def publish(self, entity, ids):
+        """Record a change to `ids` of `entity`; returns the new data version."""
+        ids = frozenset(ids)
+        with self.lock:
+            self.version += 1
+            self.events.append((self.version, entity, ids))
+            return self.version
+
+    def since(self, version, entities=None):
+        """(current version, {entity: set of ids}) for changes after `version`.
+
+        The dict is None if events after `version` have been dropped.
+        """
+        with self.lock:
+            current = self.version
+            if version >= current:
+                return current, {}
+            if self.events[0][0] > version + 1:
+                return current, None
+            changed = {}
+            for event_version, entity, ids in reversed(self.events):
+                if event_version <= version:
+                    break
+                if entities is None or entity in entities:
+                    changed.setdefault(entity, set()).update(ids)
+            return current, changed
+
+
+class Subscription:
+    """A reader's position in the current shop's feed."""
+
+    def __init__(self, *entities):
+        self.entities = frozenset(entities) or None
+        self.feed = get_feed()
+        self.version = self.feed.version
+
+    def poll(self):
+        """{entity: ids} changed since the last poll ({} if nothing, None if lost)."""
+        self.version, changed = self.feed.since(self.version, self.entities)
+        return changed
+
+
+_feeds = {}
+_feeds_lock = threading.Lock()
+
+
+def get_feed():
+    """The current shop's feed (created on first use)."""
+    tenant = current_tenant()
+    with _feeds_lock:
+        feed = _feeds.get(tenant)
+        if feed is None:
+            feed = _feeds[tenant] = ChangeFeed()
+        return feed
+
+
+def publish(entity, ids):
+    """Publish a committed change to the current shop's feed."""
+    return get_feed().publish(entity, ids)
@@ -0,0 +1,84 @@
+"""Query results as Arrow tables.
+
+`fetchall()` + `pd.DataFrame(rows)` keeps every row as a tuple and every
+cell as a Python object until pandas copies it all again into object
+columns. Here the cursor is read `batch_size` rows at a time and each
+batch becomes an Arrow record batch straight away, so only one batch of
+Python objects is alive at once and the result is typed, columnar data:
+
+- integers -> int64, reals -> float64
+- text -> dictionary-encoded strings (names repeat a lot in sales data)
+- anything named in `types` is built as that type, e.g. an epoch-seconds
+  column as pa.timestamp("s")
+
+    table = cursor_arrow(conn.execute(sql, params), types={"sold_at": pa.timestamp("s")})
+    df = table.to_pandas(types_mapper=pd.ArrowDtype)
+
+A cursor the caller has already started reading (e.g. one statement that
+returns a few summary rows and then the detail rows) is finished with
+`cursor_arrow(cursor, types, head=[rows already fetched])`.
+
+A column SQLite hands back as both integers and reals is widened to
+float64; a column that is NULL throughout stays Arrow null.
+"""
+
+import pyarrow as pa
+
+BATCH_SIZE = 10_000
+
+STRING = pa.dictionary(pa.int32(), pa.string())
+
+
+def _column_type(values):
+    """Arrow type for one batch of a column (None if it is all NULL)."""
+    found = None
+    for value in values:
+        if value is None:
+            continue
+        if isinstance(value, str):
+            return STRING
+        if isinstance(value, bytes):
+            return pa.binary()
+        if isinstance(value, float):
+            return pa.float64()
+        found = pa.int64()
+    return found
+
+
+def iter_record_batches(cursor, types=None, batch_size=BATCH_SIZE, head=()):
+    """Yield the rest of an executed cursor as pyarrow RecordBatches.
+
+    head: rows already fetched from the cursor; they go out first.
+    """
+    names = [d[0] for d in cursor.description]
+    types = dict(types or {})
+    head = list(head)
+    while True:
+        rows = head + cursor.fetchmany(batch_size - len(head))
+        head = []
+        if not rows:
+            return
+        arrays = []
+        for name, values in zip(names, zip(*rows)):
+            kind = types.get(name)
+            if kind is None:
+                kind = _column_type(values) or pa.null()
+            elif pa.types.is_integer(kind) and _column_type(values) == pa.float64():
+                kind = pa.float64()  # a real turned up in an integer column
+            arrays.append(pa.array(values, type=kind))
+        yield pa.RecordBatch.from_arrays(arrays, names=names)
+
+
+def cursor_arrow(cursor, types=None, batch_size=BATCH_SIZE, head=()):
+    """The rest of an executed cursor (after `head`) as a pyarrow Table."""
+    names = [d[0] for d in cursor.description]
+    tables = [
+        pa.Table.from_batches([batch])
+        for batch in iter_record_batches(cursor, types, batch_size, head)
+    ]
+    if not tables:
+        return pa.table({name: pa.array([], (types or {}).get(name, pa.null())) for name in names})
+    # batches may disagree (int64 vs float64, null vs typed); widen to fit
+    table = pa.concat_tables(tables, promote_options="permissive")
+    return table.unify_dictionaries()
+
@@ -1,19 +1,87 @@
+"""Move a shop's sales into the compact sale_lines storage.
+
+`init_db` does the migration itself the first time it meets a legacy
+`sales` table (see init_sales_storage); this script runs it on purpose,
+vacuums the file so the space is handed back, and prints the file size
+and the time of a full sales scan before and after.
+
+    python -m database.migrate_sales_tables
+    python -m database.migrate_sales_tables --db /path/to/stock.db
+
+Take a backup first (python -m database.backup) - the old table is
+dropped.
+"""
+
+import argparse
+import os
 import sqlite3
+import time
+
+
+def _sales_kind(conn):
+    row = conn.execute("SELECT type FROM sqlite_master WHERE name = 'sales'").fetchone()
+    return row[0] if row else None
+
+
+def _scan_seconds(conn, sql):
+    started = time.perf_counter()
+    conn.execute(sql).fetchall()
+    return time.perf_counter() - started
+
+
+def _stats(path, scan_sql):
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        rows = conn.execute("SELECT COUNT(*), IFNULL(SUM(total), 0) FROM sales").fetchone()
+        scan = min(_scan_seconds(conn, scan_sql) for _ in range(3))
+    finally:
+        conn.close()
+    return rows, os.path.getsize(path), scan
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Migrate sales to compact storage")
+    parser.add_argument("--db", help="DB file (default: the app's stock.db)")
+    opts = parser.parse_args()
+
+    if opts.db:
+        os.environ["DUKA_DB_PATH"] = opts.db
+    from database.tables import DB_PATH, init_db
+
+    conn = sqlite3.connect(DB_PATH)
+    kind = _sales_kind(conn)
+    conn.close()
+    if kind == "view":
+        print("Sales are already in compact storage")
+        return
+
+    # the same per-day, per-attendant totals a report works out
+    (count, revenue), size_before, scan_before = _stats(DB_PATH, """
+        SELECT substr(sale_date, 1, 10), attendant, SUM(quantity), SUM(total)
+        FROM sales GROUP BY 1, 2
+    """) if kind == "table" else ((0, 0), os.path.getsize(DB_PATH), 0.0)
+
+    init_db()
+    conn = sqlite3.connect(DB_PATH)
+    conn.execute("VACUUM")
+    conn.close()
 
-conn = sqlite3.connect("database/stock.db")
-c = conn.cursor()
+    (count_after, revenue_after), size_after, scan_after = _stats(DB_PATH, """
+        SELECT sold_at / 86400, attendant_id, SUM(quantity),
+               SUM(quantity * price_cents - discount_cents)
+        FROM sale_lines GROUP BY 1, 2
+    """)
+    if (count_after, round(revenue_after, 2)) != (count, round(revenue, 2)):
+        raise SystemExit(
+            f"Row count or revenue changed: {count} / {revenue:.2f} before, "
+            f"{count_after} / {revenue_after:.2f} after"
+        )
 
-# Add missing columns safely
-try:
-    c.execute("ALTER TABLE sales ADD COLUMN attendant TEXT")
-except sqlite3.OperationalError:
-    pass  # Column already exists
+    print(f"Migrated {count} sale lines (revenue {revenue:,.2f} unchanged)")
+    print(f"File size: {size_before / 1e6:.1f} MB -> {size_after / 1e6:.1f} MB")
+    print(f"Full scan: {scan_before * 1000:.0f} ms -> {scan_after * 1000:.0f} ms")
 
-try:
-    c.execute("ALTER TABLE sales ADD COLUMN receipt_no TEXT")
-except sqlite3.OperationalError:
-    pass  # Column already exists
 
-conn.commit()
-conn.close()
-print("Sales table updated successfully")
+if __name__ == "__main__":
+    main()
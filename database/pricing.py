@@ -0,0 +1,279 @@
+"""Effective prices and promotions.
+
+Prices resolve in two steps:
+
+1. Regular price: the latest-started row of `price_schedule` whose window
+   covers now, else `products.price`. Scheduled prices (a weekend price,
+   next month's increase) and the history of price edits live there.
+2. Promotion: the live promotion for the product or its category that
+   saves the customer the most on the line. There is no stacking.
+   - percent: `percent_off` off the unit price
+   - buy_x_get_y: for every `buy_qty` + `get_qty` units, `get_qty` are free
+
+Rules are loaded once per shop into a `PriceBook` held in memory (in the
+shop's slot of `tenant_cache`). The book is reloaded only when
+`pricing_version` moves (triggers bump it on any rule change) or when a
+rule's window opens or closes. A lookup at scan time is one tiny read of
+the version row plus dictionary lookups.
+
+All amounts are integer cents.
+"""
+
+import threading
+from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
+
+from database.tables import borrow_connection, current_db_path
+from database.tenants import current_tenant, tenant_cache
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+_book_lock = threading.Lock()
+
+
+def to_cents(amount):
+    """Convert a price (float/str/Decimal) to integer cents, rounding half up."""
+    return int(
+        (Decimal(str(amount)) * 100).quantize(Decimal("1"), rounding=ROUND_HALF_UP)
+    )
+
+
+def _now():
+    return datetime.now().strftime(TIME_FORMAT)
+
+
+# ---------------------------
+# Line pricing
+# ---------------------------
+def promo_unit_cents(list_cents, promo):
+    """Unit price after a percent promotion (unchanged for other kinds)."""
+    if promo and promo["kind"] == "percent":
+        return int(
+            (Decimal(list_cents) * (100 - Decimal(str(promo["percent_off"]))) / 100)
+            .quantize(Decimal("1"), rounding=ROUND_HALF_UP)
+        )
+    return list_cents
+
+
+def line_total_cents(list_cents, qty, promo):
+    """Total for `qty` units at `list_cents` each with `promo` applied."""
+    if promo and promo["kind"] == "buy_x_get_y":
+        group = promo["buy_qty"] + promo["get_qty"]
+        free = (qty // group) * promo["get_qty"]
+        return list_cents * (qty - free)
+    return promo_unit_cents(list_cents, promo) * qty
+
+
+def best_promotion(promotions, list_cents, qty):
+    """Of `promotions`, the one saving the most on `qty` units (None if none saves)."""
+    best, best_saving = None, 0
+    for promo in promotions:
+        saving = list_cents * qty - line_total_cents(list_cents, qty, promo)
+        if saving > best_saving:
+            best, best_saving = promo, saving
+    return best
+
+
+# ---------------------------
+# Price book
+# ---------------------------
+class PriceBook:
+    """Every schedule row and promotion that is live now or starts later."""
+
+    def __init__(self, version, loaded_at, schedule, by_product, by_category):
+        self.version = version
+        self.schedule = schedule          # {product_id: [(starts, ends, cents)]}, newest first
+        self.by_product = by_product      # {product_id: [promo]}
+        self.by_category = by_category    # {category: [promo]}
+        # the book is stale once any window opens or closes
+        boundaries = [
+            t for rows in schedule.values() for start, end, _ in rows
+            for t in (start, end) if t and t > loaded_at
+        ] + [
+            t for promos in (*by_product.values(), *by_category.values()) for p in promos
+            for t in (p["starts_at"], p["ends_at"]) if t and t > loaded_at
+        ]
+        self.valid_until = min(boundaries) if boundaries else None
+        # rough size for the tenant cache's memory budget
+        rows = sum(map(len, schedule.values())) + sum(
+            map(len, (*by_product.values(), *by_category.values()))
+        )
+        self.nbytes = 1024 + 400 * rows
+
+    @classmethod
+    def load(cls, conn):
+        now = _now()
+        version = _pricing_version(conn)
+        schedule = {}
+        for product_id, price, starts, ends in conn.execute("""
+            SELECT product_id, price, starts_at, ends_at
+            FROM price_schedule
+            WHERE ends_at IS NULL OR ends_at > ?
+            ORDER BY product_id, starts_at DESC, id DESC
+        """, (now,)):
+            schedule.setdefault(product_id, []).append((starts, ends, to_cents(price)))
+
+        by_product, by_category = {}, {}
+        for row in conn.execute("""
+            SELECT id, name, kind, product_id, category, percent_off,
+                   buy_qty, get_qty, starts_at, ends_at
+            FROM promotions
+            WHERE active = 1 AND (ends_at IS NULL OR ends_at > ?)
+        """, (now,)):
+            promo = dict(zip(
+                ("id", "name", "kind", "product_id", "category", "percent_off",
+                 "buy_qty", "get_qty", "starts_at", "ends_at"),
+                row
+            ))
+            if promo["product_id"] is not None:
+                by_product.setdefault(promo["product_id"], []).append(promo)
+            else:
+                by_category.setdefault(promo["category"], []).append(promo)
+        return cls(version, now, schedule, by_product, by_category)
+
+    def list_cents(self, product_id, base_price, now=None):
+        """Regular unit price right now, in cents."""
+        now = now or _now()
+        for starts, ends, cents in self.schedule.get(product_id, ()):
+            if starts <= now and (ends is None or ends > now):
+                return cents
+        return to_cents(base_price)
+
+    def promotions_for(self, product_id, category, now=None):
+        """Promotions live right now for a product (its own and its category's)."""
+        now = now or _now()
+        return [
+            promo
+            for promo in (*self.by_product.get(product_id, ()), *self.by_category.get(category, ()))
+            if promo["starts_at"] <= now and (promo["ends_at"] is None or promo["ends_at"] > now)
+        ]
+
+    def best_promotion(self, product_id, category, list_cents, qty, now=None):
+        """The live promotion saving the most on `qty` units, or None."""
+        return best_promotion(self.promotions_for(product_id, category, now), list_cents, qty)
+
+    def quote(self, product_id, category, base_price, qty=1):
+        """Price `qty` units of a product. Returns a dict of cents:
+
+            list_cents, unit_cents, total_cents, discount_cents, promotion
+        """
+        now = _now()
+        list_cents = self.list_cents(product_id, base_price, now)
+        promo = self.best_promotion(product_id, category, list_cents, qty, now)
+        total = line_total_cents(list_cents, qty, promo)
+        return {
+            "list_cents": list_cents,
+            "unit_cents": promo_unit_cents(list_cents, promo),
+            "total_cents": total,
+            "discount_cents": list_cents * qty - total,
+            "promotion": promo,
+        }
+
+
+def _pricing_version(conn):
+    row = conn.execute("SELECT version FROM pricing_version WHERE id = 1").fetchone()
+    return row[0] if row else 0
+
+
+def get_price_book(conn=None):
+    """The current shop's PriceBook, reloaded only when rules or windows change."""
+    tenant, path = current_tenant(), current_db_path()
+    with borrow_connection(conn) as conn:
+        version = _pricing_version(conn)
+        with _book_lock:
+            book = tenant_cache.get(tenant, path, "price_book")
+            if (
+                book is None
+                or book.version != version
+                or (book.valid_until and book.valid_until <= _now())
+            ):
+                book = tenant_cache.put(tenant, path, "price_book", PriceBook.load(conn))
+    return book
+
+
+def quote(product_id, category, base_price, qty=1, conn=None):
+    """Shortcut for get_price_book(conn).quote(...)."""
+    return get_price_book(conn).quote(product_id, category, base_price, qty)
+
+
+# ---------------------------
+# Managing prices and promotions
+# ---------------------------
+def schedule_price(product_id, price, starts_at, ends_at=None, note=None):
+    """Sell `product_id` at `price` from `starts_at` (until `ends_at`)."""
+    if ends_at and ends_at <= starts_at:
+        raise ValueError("End must be after start")
+    with borrow_connection() as conn:
+        with conn:
+            cur = conn.execute("""
+                INSERT INTO price_schedule (product_id, price, starts_at, ends_at, note)
+                VALUES (?, ?, ?, ?, ?)
+            """, (product_id, price, starts_at, ends_at, note))
+        return cur.lastrowid
+
+
+def get_price_history(product_id):
+    """[(price, starts_at, ends_at, note)] for a product, newest first."""
+    with borrow_connection() as conn:
+        return conn.execute("""
+            SELECT price, starts_at, ends_at, note
+            FROM price_schedule
+            WHERE product_id = ?
+            ORDER BY starts_at DESC, id DESC
+        """, (product_id,)).fetchall()
+
+
+def add_promotion(name, kind, starts_at, ends_at=None, product_id=None, category=None,
+                  percent_off=None, buy_qty=None, get_qty=None):
+    """Create a promotion for one product or a whole category.
+
+    Raises ValueError if the rule is incomplete.
+    """
+    if (product_id is None) == (not category):
+        raise ValueError("A promotion needs either a product or a category")
+    if kind == "percent":
+        if not percent_off or not 0 < percent_off < 100:
+            raise ValueError("Percent off must be between 0 and 100")
+    elif kind == "buy_x_get_y":
+        if not buy_qty or not get_qty or buy_qty < 1 or get_qty < 1:
+            raise ValueError("Buy and free quantities must be at least 1")
+    else:
+        raise ValueError(f"Unknown promotion kind {kind!r}")
+    if ends_at and ends_at <= starts_at:
+        raise ValueError("End must be after start")
+
+    with borrow_connection() as conn:
+        with conn:
+            cur = conn.execute("""
+                INSERT INTO promotions (name, kind, product_id, category, percent_off,
+                                        buy_qty, get_qty, starts_at, ends_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (name, kind, product_id, category or None, percent_off,
+                  buy_qty, get_qty, starts_at, ends_at))
+        return cur.lastrowid
+
+
+def end_promotion(promotion_id):
+    with borrow_connection() as conn:
+        with conn:
+            conn.execute(
+                "UPDATE promotions SET active = 0 WHERE id = ?", (promotion_id,)
+            )
+
+
+def get_promotions(include_ended=False):
+    """[(id, name, kind, target, percent_off, buy_qty, get_qty, starts_at, ends_at, active)]."""
+    sql = """
+        SELECT p.id, p.name, p.kind,
+               IFNULL(pr.name, 'Category: ' || p.category),
+               p.percent_off, p.buy_qty, p.get_qty, p.starts_at, p.ends_at, p.active
+        FROM promotions p
+        LEFT JOIN products pr ON pr.id = p.product_id
+    """
+    params = ()
+    if not include_ended:
+        sql += " WHERE p.active = 1 AND (p.ends_at IS NULL OR p.ends_at > ?)"
+        params = (_now(),)
+    sql += " ORDER BY p.starts_at DESC"
+    with borrow_connection() as conn:
+        return conn.execute(sql, params).fetchall()
@@ -0,0 +1,418 @@
+"""In-process scheduler for maintenance jobs.
+
+`start_scheduler()` is called on every Streamlit rerun (and by the desktop
+launcher) but only starts one background thread per process and shop: a
+hosted shop (database/tenants.py) gets its own scheduler whose jobs run
+against that shop's files. A lease row
+in `scheduler_lease` makes sure only one process runs jobs at a time, so a
+second till or the API server sharing `stock.db` never runs VACUUM twice.
+The holder renews it once less than half of it is left, not every tick.
+
+Triggers
+- cron: "minute hour day-of-month month day-of-week" ("30 2 * * *",
+  "*/15 * * * *", "0 3 * * 0"). Day-of-week is 0-6 with 0 = Sunday. As in
+  standard cron, when both day-of-month and day-of-week are restricted a
+  day matching either one runs ("0 9 1 * 1": the 1st and every Monday).
+- every: a fixed interval in minutes.
+- idle_minutes: hold a due job until nothing has written to the DB for
+  that long, so heavy work waits for a quiet moment instead of a sale.
+
+Every run is recorded in `job_runs` with its duration and outcome.
+"""
+
+import os
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+
+from database.tables import current_db_path, get_connection
+from database.tenants import current_tenant, set_tenant, use_tenant
+
+TICK_SECONDS = 30
+LEASE_SECONDS = 120
+LEASE_RENEW_SECONDS = LEASE_SECONDS // 2  # renew once less than this is left
+
+
+# ---------------------------
+# Cron
+# ---------------------------
+def _parse_field(field, low, high):
+    values = set()
+    for part in field.split(","):
+        step = 1
+        if "/" in part:
+            part, step = part.split("/")
+            step = int(step)
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start, end = (int(x) for x in part.split("-"))
+        else:
+            start = end = int(part)
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class Cron:
+    """Minimal 5-field cron expression."""
+
+    def __init__(self, expr):
+        fields = expr.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron needs 5 fields: {expr!r}")
+        self.expr = expr
+        self.minutes = _parse_field(fields[0], 0, 59)
+        self.hours = _parse_field(fields[1], 0, 23)
+        self.days = _parse_field(fields[2], 1, 31)
+        self.months = _parse_field(fields[3], 1, 12)
+        self.weekdays = _parse_field(fields[4], 0, 6)
+        # a field starting with "*" leaves the day to the other one
+        self.any_day = fields[2].startswith("*")
+        self.any_weekday = fields[4].startswith("*")
+
+    def _day_matches(self, dt):
+        if dt.month not in self.months:
+            return False
+        day = dt.day in self.days
+        weekday = (dt.weekday() + 1) % 7 in self.weekdays  # Python: Monday=0; cron: Sunday=0
+        if self.any_day or self.any_weekday:
+            return day and weekday
+        return day or weekday
+
+    def next_after(self, after):
+        """First matching minute strictly after `after`."""
+        dt = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = dt + timedelta(days=366)
+        while dt < limit:
+            if not self._day_matches(dt):
+                dt = (dt + timedelta(days=1)).replace(hour=0, minute=0)
+                continue
+            if dt.hour not in self.hours:
+                dt = (dt + timedelta(hours=1)).replace(minute=0)
+                continue
+            if dt.minute in self.minutes:
+                return dt
+            dt += timedelta(minutes=1)
+        raise ValueError(f"Cron {self.expr!r} never matches")
+
+
+# ---------------------------
+# Jobs
+# ---------------------------
+class Job:
+    def __init__(self, name, func, cron=None, every=None, idle_minutes=0, description="",
+                 takes_due=False):
+        if (cron is None) == (every is None):
+            raise ValueError("Give a job exactly one of cron= or every=")
+        self.name = name
+        self.func = func
+        self.cron = Cron(cron) if cron else None
+        self.every = timedelta(minutes=every) if every else None
+        self.idle_minutes = idle_minutes
+        self.description = description
+        self.takes_due = takes_due  # func(due): when this run was due, for catch-ups
+        self.last_run = None
+        self.next_due = None
+        self.running = False
+
+    @property
+    def trigger(self):
+        text = f"cron {self.cron.expr}" if self.cron else f"every {int(self.every.total_seconds() // 60)} min"
+        if self.idle_minutes:
+            text += f", after {self.idle_minutes} min idle"
+        return text
+
+    def schedule_from(self, when):
+        self.next_due = self.cron.next_after(when) if self.cron else when + self.every
+
+
+def _job_optimize():
+    conn = get_connection()
+    try:
+        conn.execute("PRAGMA optimize")
+        conn.execute("ANALYZE")
+    finally:
+        conn.close()
+    return "optimized"
+
+
+def _job_checkpoint():
+    conn = get_connection()
+    try:
+        mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+        if mode != "wal":
+            return f"skipped ({mode} journal)"
+        busy, log, checkpointed = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+    finally:
+        conn.close()
+    return f"{checkpointed}/{log} frames checkpointed" + (" (busy)" if busy else "")
+
+
+def _job_vacuum():
+    path = current_db_path()
+    before = os.path.getsize(path)
+    conn = get_connection()
+    try:
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+    return f"{before} -> {os.path.getsize(path)} bytes"
+
+
+def _job_backup():
+    from database.backup import backup_database, current_backup_dir
+    stats = backup_database(db_path=current_db_path(), backup_dir=current_backup_dir())
+    return f"{stats['compressed_bytes']} bytes in {stats['duration_s']}s"
+
+
+def _job_event_retention():
+    from utils.visitor_db import compact_events
+    return f"{compact_events(retention_days=180)} old events removed"
+
+
+def _job_change_log_retention():
+    from database.sync import CHANGE_LOG_KEEP_DAYS, prune_change_log
+    conn = get_connection()
+    try:
+        removed = prune_change_log(conn)
+    finally:
+        conn.close()
+    return f"{removed} change log entries removed (synced or older than {CHANGE_LOG_KEEP_DAYS} days)"
+
+
+def _job_day_digest(due):
+    from modules.digest import send_digest
+    body = send_digest("day", now=due)
+    return f"sent ({len(body)} chars)" if body else "not sent"
+
+
+def _job_hour_digest(due):
+    from modules.digest import send_digest
+    body = send_digest("hour", now=due)
+    return f"sent ({len(body)} chars)" if body else "no sales this hour"
+
+
+def _job_forecast_close():
+    from modules.forecast import close_days
+    return f"{close_days()} day(s) folded into demand forecasts"
+
+
+def default_jobs():
+    jobs = [
+        Job("backup", _job_backup, every=60,
+            description="Compressed online snapshot of stock.db"),
+        Job("wal_checkpoint", _job_checkpoint, every=15, idle_minutes=2,
+            description="Fold the WAL back into the DB file"),
+        Job("optimize", _job_optimize, cron="30 2 * * *", idle_minutes=10,
+            description="PRAGMA optimize + ANALYZE for the query planner"),
+        Job("vacuum", _job_vacuum, cron="0 3 * * 0", idle_minutes=30,
+            description="Rebuild the DB file to reclaim free pages"),
+        Job("event_retention", _job_event_retention, cron="0 4 * * *", idle_minutes=10,
+            description="Drop staff events older than 180 days"),
+        Job("change_log_retention", _job_change_log_retention, cron="15 4 * * *", idle_minutes=10,
+            description="Trim the sync change log to what peers still need"),
+        Job("day_digest", _job_day_digest, cron="10 0 * * *", takes_due=True,
+            description="Yesterday's sales and low-stock WhatsApp digest"),
+        Job("forecast_close", _job_forecast_close, cron="5 0 * * *",
+            description="Fold yesterday's sales into demand forecasts"),
+    ]
+    if os.environ.get("DUKA_HOURLY_DIGEST"):
+        jobs.append(Job("hour_digest", _job_hour_digest, cron="1 * * * *", takes_due=True,
+                        description="Sales for the hour just gone (skipped when quiet)"))
+    return jobs
+
+
+# ---------------------------
+# History / lease
+# ---------------------------
+def init_scheduler_tables(conn):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS job_runs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        job TEXT NOT NULL,
+        started_at TEXT NOT NULL,
+        duration_ms INTEGER,
+        status TEXT NOT NULL,
+        detail TEXT,
+        runner TEXT
+    )
+    """)
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_job_runs_job ON job_runs(job, started_at)"
+    )
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS scheduler_lease (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        owner TEXT NOT NULL,
+        expires_at REAL NOT NULL
+    )
+    """)
+    conn.commit()
+
+
+def get_job_runs(limit=100, job=None):
+    """Return [(job, started_at, duration_ms, status, detail, runner)], newest first."""
+    conn = get_connection()
+    try:
+        init_scheduler_tables(conn)
+        sql = "SELECT job, started_at, duration_ms, status, detail, runner FROM job_runs"
+        params = []
+        if job:
+            sql += " WHERE job = ?"
+            params.append(job)
+        sql += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        return conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+
+class Scheduler:
+    def __init__(self, jobs=None, tick=TICK_SECONDS, tenant=None):
+        self.jobs = {job.name: job for job in (jobs or default_jobs())}
+        self.tick = tick
+        self.tenant = tenant
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self.stop_event = threading.Event()
+        self.thread = None
+        with use_tenant(tenant):
+            path = current_db_path()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.data_version = None
+        self.last_activity = datetime.now()
+        self.lease_until = 0.0  # when the lease we hold runs out (0: not held)
+        init_scheduler_tables(self.conn)
+        self._load_history()
+
+    def _load_history(self):
+        now = datetime.now()
+        for job in self.jobs.values():
+            row = self.conn.execute(
+                "SELECT MAX(started_at) FROM job_runs WHERE job = ?", (job.name,)
+            ).fetchone()
+            job.last_run = datetime.fromisoformat(row[0]) if row[0] else None
+            job.schedule_from(job.last_run or now)
+
+    def _acquire_lease(self):
+        """Take or renew the single-runner lease; True if we hold it.
+
+        Only writes when the lease is ours and getting short, or free.
+        """
+        now = time.time()
+        if self.lease_until - now > LEASE_RENEW_SECONDS:
+            return True
+        row = self.conn.execute(
+            "SELECT owner, expires_at FROM scheduler_lease WHERE id = 1"
+        ).fetchone()
+        if row is not None and row[0] != self.owner and row[1] >= now:
+            self.lease_until = 0.0
+            return False
+        with self.conn:
+            self.conn.execute("""
+                INSERT INTO scheduler_lease (id, owner, expires_at) VALUES (1, ?, ?)
+                ON CONFLICT(id) DO UPDATE
+                SET owner = excluded.owner, expires_at = excluded.expires_at
+                WHERE scheduler_lease.owner = excluded.owner
+                   OR scheduler_lease.expires_at < ?
+            """, (self.owner, now + LEASE_SECONDS, now))
+        row = self.conn.execute("SELECT owner FROM scheduler_lease WHERE id = 1").fetchone()
+        held = row is not None and row[0] == self.owner
+        self.lease_until = now + LEASE_SECONDS if held else 0.0
+        return held
+
+    def _idle_for(self):
+        """Minutes since another connection last committed to the DB."""
+        version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        if version != self.data_version:
+            self.data_version = version
+            self.last_activity = datetime.now()
+        return (datetime.now() - self.last_activity).total_seconds() / 60
+
+    def run_job(self, job):
+        with self.lock:
+            if job.running:
+                return None
+            job.running = True
+        started = datetime.now()
+        t0 = time.perf_counter()
+        due = min(job.next_due or started, started)
+        try:
+            detail, status = (job.func(due) if job.takes_due else job.func()), "ok"
+        except Exception as e:
+            detail, status = f"{e}\n{traceback.format_exc(limit=3)}", "error"
+        duration_ms = int((time.perf_counter() - t0) * 1000)
+
+        with self.lock:
+            job.running = False
+            job.last_run = started
+            job.schedule_from(started)
+            with self.conn:
+                self.conn.execute("""
+                    INSERT INTO job_runs (job, started_at, duration_ms, status, detail, runner)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, (job.name, started.isoformat(timespec="seconds"), duration_ms,
+                      status, str(detail), self.owner))
+            # our own job's writes don't count as till activity
+            self.data_version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        return status
+
+    def run_pending(self):
+        if not self._acquire_lease():
+            return
+        idle = self._idle_for()
+        now = datetime.now()
+        for job in self.jobs.values():
+            if job.next_due and job.next_due <= now and idle >= job.idle_minutes:
+                self.run_job(job)
+                idle = self._idle_for()
+
+    def _loop(self):
+        set_tenant(self.tenant)  # jobs on this thread use this shop's files
+        while not self.stop_event.is_set():
+            try:
+                self.run_pending()
+            except sqlite3.Error:
+                pass  # DB busy: try again next tick
+            self.stop_event.wait(self.tick)
+
+    def start(self):
+        self.thread = threading.Thread(target=self._loop, name="duka-scheduler", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+
+    def _run_job_as_tenant(self, job):
+        set_tenant(self.tenant)
+        return self.run_job(job)
+
+    def run_now(self, name):
+        """Run a job immediately on a side thread (used by the UI)."""
+        threading.Thread(
+            target=self._run_job_as_tenant, args=(self.jobs[name],), daemon=True
+        ).start()
+
+
+_schedulers = {}   # shop (None = the single-shop DB) -> Scheduler
+_scheduler_lock = threading.Lock()
+
+
+def start_scheduler():
+    """Start the current shop's scheduler once; later calls return it."""
+    tenant = current_tenant()
+    with _scheduler_lock:
+        scheduler = _schedulers.get(tenant)
+        if scheduler is None:
+            scheduler = _schedulers[tenant] = Scheduler(tenant=tenant)
+            scheduler.start()
+    return scheduler
+
+
+def get_scheduler():
+    return _schedulers.get(current_tenant())
@@ -0,0 +1,424 @@
+"""Incremental multi-shop sync.
+
+Every shop keeps its own `stock.db`. Triggers created by `init_db` append
+the id of each changed product/sale row to `change_log`; a sync reads only
+the log entries after the shop's last sync point, packs the current state
+of those rows into a zlib-compressed JSON delta and hands it to a
+transport. The head office applies deltas into `hq_products`/`hq_sales`
+(keyed by shop id + local row id) with `executemany` upserts.
+
+    # at the shop
+    python -m database.sync push --shop-id town --to-dir /mnt/usb/outbox
+    # at head office
+    python -m database.sync apply --hq hq.db --from-dir /mnt/usb/outbox
+
+or over the network with a small stand-in server:
+
+    python -m database.sync serve --hq hq.db --port 8700
+    python -m database.sync push --shop-id town --url http://hq:8700
+
+The log is trimmed after each push and, by the scheduler's maintenance
+job, to CHANGE_LOG_KEEP_DAYS even for a shop that never syncs. A peer
+whose sync point is older than what the log still holds gets a full copy
+of the shop instead of a delta.
+
+Sync runs shop -> head office only; prices and products set at head
+office are not sent back to the shops.
+"""
+
+import argparse
+import glob
+import json
+import os
+import sqlite3
+import urllib.request
+import zlib
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from database.tables import get_connection, init_db
+
+PRODUCT_COLUMNS = ["id", "name", "category", "price", "quantity", "barcode"]
+SALE_COLUMNS = [
+    "id", "product_id", "product_name", "quantity", "price", "total",
+    "sale_date", "attendant", "receipt_no"
+]
+SYNCED_TABLES = {"products": PRODUCT_COLUMNS, "sales": SALE_COLUMNS}
+# where each synced table's rows live (`sales` is a view over sale_lines)
+BASE_TABLES = {"products": "products", "sales": "sale_lines"}
+CHANGE_LOG_KEEP_DAYS = 30
+
+
+# ---------------------------
+# Shop side
+# ---------------------------
+def init_sync_state(conn):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS sync_state (
+        peer TEXT PRIMARY KEY,
+        shop_id TEXT NOT NULL,
+        last_seq INTEGER NOT NULL DEFAULT 0,
+        synced_at TEXT
+    )
+    """)
+    conn.commit()
+
+
+def get_sync_point(conn, peer):
+    row = conn.execute(
+        "SELECT last_seq FROM sync_state WHERE peer = ?", (peer,)
+    ).fetchone()
+    return row[0] if row else 0
+
+
+def set_sync_point(conn, peer, shop_id, last_seq):
+    conn.execute("""
+        INSERT INTO sync_state (peer, shop_id, last_seq, synced_at)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(peer) DO UPDATE
+        SET shop_id = excluded.shop_id,
+            last_seq = excluded.last_seq,
+            synced_at = excluded.synced_at
+    """, (peer, shop_id, last_seq, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+    conn.commit()
+
+
+def export_changes(conn, shop_id, since_seq):
+    """Build a delta of everything logged after `since_seq`.
+
+    Returns a dict, or None when nothing changed. Rows are sent in their
+    current state; ids that were logged but no longer exist are sent as
+    deletions. If the log has been trimmed past `since_seq`, the delta is
+    a full copy of the shop ("full": True) for the receiver to replace
+    what it holds.
+    """
+    # Read the high-water mark and the rows in one read transaction so a
+    # sale committed mid-export is left for the next sync.
+    conn.execute("BEGIN")
+    try:
+        row = conn.execute(
+            "SELECT seq FROM sqlite_sequence WHERE name = 'change_log'"
+        ).fetchone()
+        to_seq = row[0] if row else 0
+        if to_seq <= since_seq:
+            return None
+        oldest = conn.execute("SELECT MIN(seq) FROM change_log").fetchone()[0]
+        full = oldest is None or oldest > since_seq + 1
+
+        delta = {
+            "version": 1,
+            "shop_id": shop_id,
+            "from_seq": since_seq,
+            "to_seq": to_seq,
+            "full": full,
+            "deleted": {}
+        }
+        for table, columns in SYNCED_TABLES.items():
+            if full:
+                rows = conn.execute(f"SELECT {', '.join(columns)} FROM {table}").fetchall()
+                delta[table] = [list(r) for r in rows]
+                delta["deleted"][table] = []
+                continue
+            changed = """
+                SELECT DISTINCT row_id FROM change_log
+                WHERE table_name = ? AND seq > ? AND seq <= ?
+            """
+            params = (table, since_seq, to_seq)
+            rows = conn.execute(f"""
+                SELECT {", ".join(columns)} FROM {table}
+                WHERE id IN ({changed})
+            """, params).fetchall()
+            # only the logged ids, checked against the base table
+            deleted = conn.execute(f"""
+                SELECT row_id FROM ({changed}) AS c
+                WHERE NOT EXISTS (SELECT 1 FROM {BASE_TABLES[table]} WHERE id = c.row_id)
+            """, params).fetchall()
+            delta[table] = [list(r) for r in rows]
+            delta["deleted"][table] = [r[0] for r in deleted]
+    finally:
+        conn.rollback()
+    return delta
+
+
+def pack_delta(delta):
+    return zlib.compress(json.dumps(delta, separators=(",", ":")).encode("utf-8"), 6)
+
+
+def unpack_delta(data):
+    return json.loads(zlib.decompress(data).decode("utf-8"))
+
+
+def prune_change_log(conn, up_to_seq=None, keep_days=CHANGE_LOG_KEEP_DAYS):
+    """Drop log entries every peer has received, and any older than `keep_days`.
+
+    up_to_seq: what was just sent (push); the maintenance job leaves it
+    out. A peer behind the trimmed log gets a full copy on its next push.
+    Returns the number of entries removed.
+    """
+    init_sync_state(conn)
+    row = conn.execute("SELECT MIN(last_seq) FROM sync_state").fetchone()
+    received = [seq for seq in (up_to_seq, row[0]) if seq is not None]
+    keep_after = min(received) if received else 0
+    cur = conn.execute("""
+        DELETE FROM change_log
+        WHERE seq <= ? OR changed_at < datetime('now', 'localtime', ?)
+    """, (keep_after, f"-{keep_days} days"))
+    conn.commit()
+    return cur.rowcount
+
+
+def push(conn, shop_id, transport, peer="head-office"):
+    """Send the pending delta through `transport`.
+
+    Returns (rows sent, compressed bytes); (0, 0) if already up to date.
+    """
+    init_sync_state(conn)
+    since = get_sync_point(conn, peer)
+    delta = export_changes(conn, shop_id, since)
+    if delta is None:
+        return 0, 0
+
+    data = pack_delta(delta)
+    transport.send(shop_id, delta["from_seq"], delta["to_seq"], data)
+
+    set_sync_point(conn, peer, shop_id, delta["to_seq"])
+    prune_change_log(conn, delta["to_seq"])
+    sent = sum(len(delta[t]) + len(delta["deleted"][t]) for t in SYNCED_TABLES)
+    return sent, len(data)
+
+
+# ---------------------------
+# Head office side
+# ---------------------------
+def init_head_office(conn):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS hq_products (
+        shop_id TEXT NOT NULL,
+        id INTEGER NOT NULL,
+        name TEXT,
+        category TEXT,
+        price REAL,
+        quantity INTEGER,
+        barcode TEXT,
+        PRIMARY KEY (shop_id, id)
+    )
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS hq_sales (
+        shop_id TEXT NOT NULL,
+        id INTEGER NOT NULL,
+        product_id INTEGER,
+        product_name TEXT,
+        quantity INTEGER,
+        price REAL,
+        total REAL,
+        sale_date TEXT,
+        attendant TEXT,
+        receipt_no TEXT,
+        PRIMARY KEY (shop_id, id)
+    )
+    """)
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_hq_sales_date ON hq_sales(sale_date)"
+    )
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS hq_sync (
+        shop_id TEXT PRIMARY KEY,
+        last_seq INTEGER NOT NULL,
+        synced_at TEXT
+    )
+    """)
+    conn.commit()
+
+
+def apply_delta(conn, delta):
+    """Apply one shop delta in a single transaction.
+
+    Deltas already applied are skipped; a delta that starts after the
+    shop's last applied sequence (a lost file) raises ValueError so the gap
+    is noticed instead of silently leaving holes. A full copy replaces
+    every row held for the shop.
+    Returns the number of rows applied.
+    """
+    shop_id = delta["shop_id"]
+    row = conn.execute(
+        "SELECT last_seq FROM hq_sync WHERE shop_id = ?", (shop_id,)
+    ).fetchone()
+    last_seq = row[0] if row else 0
+
+    if delta["to_seq"] <= last_seq:
+        return 0
+    full = delta.get("full", False)
+    if delta["from_seq"] > last_seq and not full:
+        raise ValueError(
+            f"Missing changes for shop {shop_id}: have up to {last_seq}, "
+            f"delta starts at {delta['from_seq']}"
+        )
+
+    applied = 0
+    try:
+        for table, columns in SYNCED_TABLES.items():
+            if full:
+                # a full copy replaces everything held for the shop
+                conn.execute(f"DELETE FROM hq_{table} WHERE shop_id = ?", (shop_id,))
+            rows = [[shop_id] + r for r in delta[table]]
+            if rows:
+                cols = ", ".join(["shop_id"] + columns)
+                marks = ", ".join("?" * (len(columns) + 1))
+                updates = ", ".join(f"{c} = excluded.{c}" for c in columns[1:])
+                conn.executemany(f"""
+                    INSERT INTO hq_{table} ({cols}) VALUES ({marks})
+                    ON CONFLICT(shop_id, id) DO UPDATE SET {updates}
+                """, rows)
+            deleted = [(shop_id, i) for i in delta["deleted"][table]]
+            if deleted:
+                conn.executemany(
+                    f"DELETE FROM hq_{table} WHERE shop_id = ? AND id = ?", deleted
+                )
+            applied += len(rows) + len(deleted)
+
+        conn.execute("""
+            INSERT INTO hq_sync (shop_id, last_seq, synced_at) VALUES (?, ?, ?)
+            ON CONFLICT(shop_id) DO UPDATE
+            SET last_seq = excluded.last_seq, synced_at = excluded.synced_at
+        """, (shop_id, delta["to_seq"], datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return applied
+
+
+# ---------------------------
+# Transports
+# ---------------------------
+class FileTransport:
+    """Drop deltas as files in a shared folder (USB stick, network share)."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def send(self, shop_id, from_seq, to_seq, data):
+        name = f"{shop_id}-{from_seq:012d}-{to_seq:012d}.delta"
+        tmp = os.path.join(self.directory, name + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, os.path.join(self.directory, name))
+
+    def receive(self):
+        """Yield (path, data) in sequence order per shop."""
+        for path in sorted(glob.glob(os.path.join(self.directory, "*.delta"))):
+            with open(path, "rb") as f:
+                yield path, f.read()
+
+
+class HttpTransport:
+    """POST deltas to a head-office server started with `serve`."""
+
+    def __init__(self, url, timeout=30):
+        self.url = url.rstrip("/") + "/sync"
+        self.timeout = timeout
+
+    def send(self, shop_id, from_seq, to_seq, data):
+        request = urllib.request.Request(
+            self.url, data=data, method="POST",
+            headers={"Content-Type": "application/octet-stream"}
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            if response.status != 200:
+                raise RuntimeError(f"Head office rejected delta: HTTP {response.status}")
+
+
+def apply_directory(conn, directory, remove=True):
+    """Apply every delta file in `directory`; returns rows applied."""
+    init_head_office(conn)
+    total = 0
+    for path, data in FileTransport(directory).receive():
+        total += apply_delta(conn, unpack_delta(data))
+        if remove:
+            os.remove(path)
+    return total
+
+
+def serve(hq_path, host="127.0.0.1", port=8700):
+    """Minimal head-office receiver for HttpTransport."""
+    conn = sqlite3.connect(hq_path, check_same_thread=False)
+    init_head_office(conn)
+
+    class SyncHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path != "/sync":
+                self.send_error(404)
+                return
+            data = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            try:
+                applied = apply_delta(conn, unpack_delta(data))
+            except ValueError as e:
+                self.send_error(409, str(e))
+                return
+            body = json.dumps({"applied": applied}).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    # one request at a time: deltas from a shop must apply in order
+    server = HTTPServer((host, port), SyncHandler)
+    print(f"Head office sync listening on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    finally:
+        conn.close()
+
+
+# ---------------------------
+# CLI
+# ---------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Duka multi-shop sync")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_push = sub.add_parser("push", help="send this shop's changes")
+    p_push.add_argument("--shop-id", required=True)
+    target = p_push.add_mutually_exclusive_group(required=True)
+    target.add_argument("--to-dir")
+    target.add_argument("--url")
+
+    p_apply = sub.add_parser("apply", help="apply delta files at head office")
+    p_apply.add_argument("--hq", required=True, help="head office DB file")
+    p_apply.add_argument("--from-dir", required=True)
+    p_apply.add_argument("--keep", action="store_true", help="keep applied files")
+
+    p_serve = sub.add_parser("serve", help="run the head office receiver")
+    p_serve.add_argument("--hq", required=True)
+    p_serve.add_argument("--host", default="127.0.0.1")
+    p_serve.add_argument("--port", type=int, default=8700)
+
+    opts = parser.parse_args()
+
+    if opts.command == "push":
+        init_db()
+        transport = FileTransport(opts.to_dir) if opts.to_dir else HttpTransport(opts.url)
+        conn = get_connection()
+        try:
+            rows, size = push(conn, opts.shop_id, transport)
+        finally:
+            conn.close()
+        print("Already up to date" if not rows else f"Sent {rows} rows ({size} bytes)")
+
+    elif opts.command == "apply":
+        conn = sqlite3.connect(opts.hq)
+        try:
+            rows = apply_directory(conn, opts.from_dir, remove=not opts.keep)
+        finally:
+            conn.close()
+        print(f"Applied {rows} rows")
+
+    else:
+        serve(opts.hq, opts.host, opts.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,80 @@
+import calendar
 import os
 import re
 import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
 from barcode import Code128
 from barcode.writer import ImageWriter
 from datetime import datetime
 
+from database.changes import publish
+from database.tenants import current_tenant, tenant_cache, tenant_file
+
 # ---------------------------
 # Paths
 # ---------------------------
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DB_PATH = os.path.join(BASE_DIR, "stock.db")
+# DUKA_DB_PATH points the app at another file (load tests, demos)
+DB_PATH = os.environ.get("DUKA_DB_PATH") or os.path.join(BASE_DIR, "stock.db")
 BARCODE_FOLDER = os.path.join(BASE_DIR, "barcodes")
 os.makedirs(BARCODE_FOLDER, exist_ok=True)
 
+def current_db_path():
+    """DB file for the current shop (DB_PATH when no shop is selected)."""
+    tenant = current_tenant()
+    return DB_PATH if tenant is None else tenant_file(tenant, "stock.db")
+
+
 # ---------------------------
 # Connection & Table Init
 # ---------------------------
 def get_connection():
-    return sqlite3.connect(DB_PATH, check_same_thread=False)
+    return sqlite3.connect(current_db_path(), check_same_thread=False)
+
+
+def get_read_connection():
+    """Read-only connection for reports and analytics.
+
+    Opened with `mode=ro`, so a bug in report code can't write or take a
+    write lock. With the DB in WAL mode (see init_db) every query reads a
+    consistent snapshot and never blocks a till committing a sale.
+    """
+    conn = sqlite3.connect(f"file:{current_db_path()}?mode=ro", uri=True, check_same_thread=False)
+    conn.execute("PRAGMA query_only = 1")
+    return conn
+
+
+@contextmanager
+def borrow_connection(conn=None):
+    """Yield `conn` if given, else one from the current shop's pool.
+
+    Long-running callers (the API server, batch jobs) pass their own
+    connection so repeated calls reuse it. Pooled connections go back on
+    exit with any uncommitted work rolled back.
+    """
+    if conn is not None:
+        yield conn
+        return
+    tenant, path = current_tenant(), current_db_path()
+    conn = tenant_cache.acquire(tenant, path)
+    try:
+        yield conn
+    finally:
+        tenant_cache.release(tenant, path, conn)
 
 
 def init_db():
     conn = get_connection()
     c = conn.cursor()
 
+    # WAL lets readers (reports, sync, backups) work from a snapshot while
+    # a till commits; the setting is stored in the DB file, so this only
+    # does work the first time
+    c.execute("PRAGMA journal_mode = WAL")
+
     # Products table
     c.execute("""
     CREATE TABLE IF NOT EXISTS products (
@@ -36,32 +87,531 @@ def init_db():
     )
     """)
 
-    # Sales table
+    # Carts: the basket being rung up per attendant, and parked baskets
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS active_carts (
+        attendant TEXT PRIMARY KEY,
+        items TEXT NOT NULL,
+        updated_at TEXT NOT NULL
+    )
+    """)
+
     c.execute("""
-    CREATE TABLE IF NOT EXISTS sales (
+    CREATE TABLE IF NOT EXISTS held_carts (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
-        product_id INTEGER,
-        product_name TEXT,
-        quantity INTEGER,
-        price REAL,
-        total REAL,
-        sale_date TEXT,
+        label TEXT,
         attendant TEXT,
-        receipt_no TEXT
+        items TEXT NOT NULL,
+        total_cents INTEGER NOT NULL,
+        held_at TEXT NOT NULL
     )
     """)
 
+    init_stock_alerts(c)
+    init_pricing(c)
+    init_sales_storage(c)
+    init_change_log(c)
+    init_product_barcodes(c)
+
     conn.commit()
     conn.close()
 
 
+def add_column_if_missing(c, table, column, decl):
+    c.execute(f"PRAGMA table_info({table})")
+    if column not in [row[1] for row in c.fetchall()]:
+        c.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+
+def init_stock_alerts(c):
+    """Per-product reorder levels and trigger-driven low-stock alerts.
+
+    The triggers fire on the write that takes a product to (or below) its
+    reorder level, whoever makes it (checkout, update_stock, the API), so
+    nothing has to scan the products table to notice low stock. The
+    partial index holds only products that are low right now.
+    """
+    add_column_if_missing(c, "products", "reorder_level", "INTEGER")
+
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS stock_alerts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        product_id INTEGER NOT NULL,
+        quantity INTEGER NOT NULL,
+        reorder_level INTEGER NOT NULL,
+        created_at TEXT NOT NULL DEFAULT (datetime('now', 'localtime')),
+        notified INTEGER NOT NULL DEFAULT 0
+    )
+    """)
+    c.execute("""
+    CREATE INDEX IF NOT EXISTS idx_stock_alerts_pending
+    ON stock_alerts(product_id) WHERE notified = 0
+    """)
+    c.execute("""
+    CREATE INDEX IF NOT EXISTS idx_products_low_stock
+    ON products(quantity) WHERE quantity <= reorder_level
+    """)
+
+    c.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_products_low_stock_upd
+    AFTER UPDATE OF quantity, reorder_level ON products
+    WHEN NEW.quantity <= NEW.reorder_level
+     AND NOT (OLD.reorder_level IS NOT NULL AND OLD.quantity <= OLD.reorder_level)
+    BEGIN
+        INSERT INTO stock_alerts (product_id, quantity, reorder_level)
+        VALUES (NEW.id, NEW.quantity, NEW.reorder_level);
+    END
+    """)
+    c.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_products_low_stock_ins
+    AFTER INSERT ON products
+    WHEN NEW.quantity <= NEW.reorder_level
+    BEGIN
+        INSERT INTO stock_alerts (product_id, quantity, reorder_level)
+        VALUES (NEW.id, NEW.quantity, NEW.reorder_level);
+    END
+    """)
+
+
+def init_sales_storage(c):
+    """Compact sales storage behind a `sales` view of the old shape.
+
+    Each sale line is stored in `sale_lines` as integers only: product
+    names, attendants and receipt numbers are ids into dimension tables
+    (so reports group and count receipts on integers), money is
+    integer cents and the time is `sold_at`, the local wall-clock time as
+    seconds since 1970-01-01 (so `datetime(sold_at, 'unixepoch')` gives
+    back the old sale_date text). The line total is not stored:
+
+        total_cents = quantity * price_cents - discount_cents
+
+    where price_cents is the regular (list) price and discount_cents is
+    everything taken off by a promotion.
+
+    `sales` is a view with the old columns (id, product_id, product_name,
+    quantity, price, total, sale_date, attendant, receipt_no, promotion_id,
+    promotion, discount); INSERT and DELETE on it are routed to
+    `sale_lines`, so sync, backups and older scripts keep working.
+    Hot readers (reports, forecast, inventory, stock-take) query
+    `sale_lines` directly with integer ranges on `sold_at`.
+
+    A legacy `sales` table is migrated in place, keeping its ids.
+    """
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS attendants (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL UNIQUE
+    )
+    """)
+
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS product_names (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL UNIQUE
+    )
+    """)
+
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS receipts (
+        id INTEGER PRIMARY KEY,
+        receipt_no TEXT NOT NULL UNIQUE
+    )
+    """)
+
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS sale_lines (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        product_id INTEGER,
+        name_id INTEGER,
+        quantity INTEGER,
+        price_cents INTEGER,
+        discount_cents INTEGER NOT NULL DEFAULT 0,
+        sold_at INTEGER,
+        attendant_id INTEGER,
+        receipt_id INTEGER,
+        promotion_id INTEGER
+    )
+    """)
+
+    c.execute("CREATE INDEX IF NOT EXISTS idx_sale_lines_sold_at ON sale_lines(sold_at)")
+
+    c.execute("SELECT type FROM sqlite_master WHERE name = 'sales'")
+    row = c.fetchone()
+    if row and row[0] == "table":
+        _migrate_legacy_sales(c)
+
+    c.execute("""
+    CREATE VIEW IF NOT EXISTS sales AS
+    SELECT l.id, l.product_id, n.name AS product_name, l.quantity,
+           l.price_cents / 100.0 AS price,
+           (l.quantity * l.price_cents - l.discount_cents) / 100.0 AS total,
+           datetime(l.sold_at, 'unixepoch') AS sale_date,
+           a.name AS attendant, r.receipt_no,
+           l.promotion_id, p.name AS promotion,
+           l.discount_cents / 100.0 AS discount
+    FROM sale_lines l
+    LEFT JOIN product_names n ON n.id = l.name_id
+    LEFT JOIN attendants a ON a.id = l.attendant_id
+    LEFT JOIN receipts r ON r.id = l.receipt_id
+    LEFT JOIN promotions p ON p.id = l.promotion_id
+    """)
+
+    # Writers of the old shape send price = unit price paid and total;
+    # whatever total is short of quantity * price becomes the discount
+    c.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_sales_view_ins INSTEAD OF INSERT ON sales
+    BEGIN
+        INSERT INTO product_names (name)
+        SELECT NEW.product_name WHERE NEW.product_name IS NOT NULL
+        ON CONFLICT(name) DO NOTHING;
+        INSERT INTO attendants (name)
+        SELECT NEW.attendant WHERE NEW.attendant IS NOT NULL
+        ON CONFLICT(name) DO NOTHING;
+        INSERT INTO receipts (receipt_no)
+        SELECT NEW.receipt_no WHERE NEW.receipt_no IS NOT NULL
+        ON CONFLICT(receipt_no) DO NOTHING;
+        INSERT INTO sale_lines (
+            id, product_id, name_id, quantity, price_cents, discount_cents,
+            sold_at, attendant_id, receipt_id, promotion_id
+        )
+        VALUES (
+            NEW.id,
+            NEW.product_id,
+            (SELECT id FROM product_names WHERE name = NEW.product_name),
+            NEW.quantity,
+            CAST(round(NEW.price * 100) AS INTEGER),
+            IFNULL(
+                NEW.quantity * CAST(round(NEW.price * 100) AS INTEGER)
+                - CAST(round(NEW.total * 100) AS INTEGER),
+                IFNULL(CAST(round(NEW.discount * 100) AS INTEGER), 0)
+            ),
+            CAST(strftime('%s', IFNULL(NEW.sale_date, datetime('now', 'localtime'))) AS INTEGER),
+            (SELECT id FROM attendants WHERE name = NEW.attendant),
+            (SELECT id FROM receipts WHERE receipt_no = NEW.receipt_no),
+            NEW.promotion_id
+        );
+    END
+    """)
+
+    c.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_sales_view_del INSTEAD OF DELETE ON sales
+    BEGIN
+        DELETE FROM sale_lines WHERE id = OLD.id;
+    END
+    """)
+
+
+def _migrate_legacy_sales(c):
+    """Move a legacy `sales` table into sale_lines and drop it.
+
+    Runs inside init_db's transaction, so it either completes or leaves
+    the old table as it was. Totals are kept to the cent: the list price
+    is recovered from total + discount where a promotion applied, and any
+    difference between quantity * price and total lands in discount_cents.
+    """
+    c.execute("PRAGMA table_info(sales)")
+    columns = {row[1] for row in c.fetchall()}
+
+    def column(name, default="NULL"):
+        return name if name in columns else default
+
+    discount = column("discount", "0")
+    c.execute(f"""
+        INSERT INTO product_names (name)
+        SELECT DISTINCT {column("product_name")} FROM sales
+        WHERE {column("product_name")} IS NOT NULL
+        ON CONFLICT(name) DO NOTHING
+    """)
+    c.execute(f"""
+        INSERT INTO attendants (name)
+        SELECT DISTINCT {column("attendant")} FROM sales
+        WHERE {column("attendant")} IS NOT NULL
+        ON CONFLICT(name) DO NOTHING
+    """)
+    c.execute(f"""
+        INSERT INTO receipts (receipt_no)
+        SELECT {column("receipt_no")} FROM sales
+        WHERE {column("receipt_no")} IS NOT NULL
+        GROUP BY 1 ORDER BY MIN(id)
+        ON CONFLICT(receipt_no) DO NOTHING
+    """)
+    c.execute(f"""
+        INSERT INTO sale_lines (
+            id, product_id, name_id, quantity, price_cents, discount_cents,
+            sold_at, attendant_id, receipt_id, promotion_id
+        )
+        WITH legacy AS (
+            SELECT id, product_id, {column("product_name")} AS product_name,
+                   quantity, total, sale_date, {column("attendant")} AS attendant,
+                   {column("receipt_no")} AS receipt_no,
+                   {column("promotion_id")} AS promotion_id,
+                   CAST(round(
+                       CASE WHEN {discount} > 0 AND quantity > 0
+                            THEN (total + {discount}) * 100 / quantity
+                            ELSE price * 100 END
+                   ) AS INTEGER) AS price_cents
+            FROM sales
+        )
+        SELECT s.id, s.product_id, n.id, s.quantity, s.price_cents,
+               IFNULL(s.quantity * s.price_cents - CAST(round(s.total * 100) AS INTEGER), 0),
+               CAST(strftime('%s', s.sale_date) AS INTEGER),
+               a.id, r.id, s.promotion_id
+        FROM legacy s
+        LEFT JOIN product_names n ON n.name = s.product_name
+        LEFT JOIN attendants a ON a.name = s.attendant
+        LEFT JOIN receipts r ON r.receipt_no = s.receipt_no
+        ORDER BY s.id
+    """)
+    # ids of deleted legacy rows are never handed out again
+    c.execute("""
+        UPDATE sqlite_sequence
+        SET seq = MAX(seq, IFNULL((SELECT seq FROM sqlite_sequence WHERE name = 'sales'), 0))
+        WHERE name = 'sale_lines'
+    """)
+    c.execute("DROP TABLE sales")
+
+
+def to_sold_at(value):
+    """A datetime, date or 'YYYY-MM-DD[ HH:MM:SS]' text as a sale_lines.sold_at value."""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    elif not isinstance(value, datetime):
+        value = datetime.combine(value, datetime.min.time())
+    return calendar.timegm(value.timetuple())
+
+
+def _dimension_id(c, table, value, column="name"):
+    """Id of `value` in a dimension table (attendants, product_names, receipts), added if new."""
+    if value is None:
+        return None
+    c.execute(
+        f"INSERT INTO {table} ({column}) VALUES (?) ON CONFLICT({column}) DO NOTHING", (value,)
+    )
+    c.execute(f"SELECT id FROM {table} WHERE {column} = ?", (value,))
+    return c.fetchone()[0]
+
+
+def init_change_log(c):
+    """Change-capture log used by multi-shop sync (see database/sync.py).
+
+    Triggers append the id of every inserted/updated/deleted product and
+    sale row, so a sync only has to read what changed since its last
+    sync point. Rows that existed before the log was created are seeded
+    once so the first sync carries the full history.
+    """
+    c.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'change_log'"
+    )
+    is_new = c.fetchone() is None
+
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS change_log (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        table_name TEXT NOT NULL,
+        row_id INTEGER NOT NULL,
+        op TEXT NOT NULL,
+        changed_at TEXT NOT NULL DEFAULT (datetime('now', 'localtime'))
+    )
+    """)
+
+    # sales are logged under their public name; the rows live in sale_lines
+    for table, source in (("products", "products"), ("sales", "sale_lines")):
+        c.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_log_ins AFTER INSERT ON {source}
+        BEGIN
+            INSERT INTO change_log (table_name, row_id, op) VALUES ('{table}', NEW.id, 'I');
+        END
+        """)
+        c.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_log_upd AFTER UPDATE ON {source}
+        BEGIN
+            INSERT INTO change_log (table_name, row_id, op) VALUES ('{table}', NEW.id, 'U');
+        END
+        """)
+        c.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_log_del AFTER DELETE ON {source}
+        BEGIN
+            INSERT INTO change_log (table_name, row_id, op) VALUES ('{table}', OLD.id, 'D');
+        END
+        """)
+        if is_new:
+            c.execute(f"""
+                INSERT INTO change_log (table_name, row_id, op)
+                SELECT '{table}', id, 'I' FROM {source} ORDER BY id
+            """)
+
+
+def init_pricing(c):
+    """Price schedule and promotions.
+
+    `price_schedule` holds timed prices per product (and, via a trigger,
+    every change to products.price, so it doubles as price history).
+    `promotions` holds percent-off and buy-X-get-Y rules for a product or
+    a whole category. Triggers bump `pricing_version` on any change so the
+    in-memory price book (database/pricing.py) knows when to reload.
+    """
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS price_schedule (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        product_id INTEGER NOT NULL,
+        price REAL NOT NULL,
+        starts_at TEXT NOT NULL,
+        ends_at TEXT,
+        note TEXT
+    )
+    """)
+    c.execute("""
+    CREATE INDEX IF NOT EXISTS idx_price_schedule_product
+    ON price_schedule(product_id, starts_at)
+    """)
+
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS promotions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        kind TEXT NOT NULL CHECK (kind IN ('percent', 'buy_x_get_y')),
+        product_id INTEGER,
+        category TEXT,
+        percent_off REAL,
+        buy_qty INTEGER,
+        get_qty INTEGER,
+        starts_at TEXT NOT NULL,
+        ends_at TEXT,
+        active INTEGER NOT NULL DEFAULT 1,
+        CHECK ((product_id IS NULL) <> (category IS NULL))
+    )
+    """)
+    c.execute("""
+    CREATE INDEX IF NOT EXISTS idx_promotions_live
+    ON promotions(ends_at) WHERE active = 1
+    """)
+
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS pricing_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL
+    )
+    """)
+    c.execute("INSERT OR IGNORE INTO pricing_version (id, version) VALUES (1, 0)")
+
+    for table in ("price_schedule", "promotions"):
+        for op in ("INSERT", "UPDATE", "DELETE"):
+            c.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_version_{op.lower()[:3]}
+            AFTER {op} ON {table}
+            BEGIN
+                UPDATE pricing_version SET version = version + 1 WHERE id = 1;
+            END
+            """)
+
+    # A price edit closes the product's open-ended row that is already in
+    # force before adding its own, so the price book only ever loads one
+    # open row per product however often prices change.
+    c.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = 'trg_products_price_history'"
+    )
+    row = c.fetchone()
+    if row is None or row[0] != PRICE_HISTORY_TRIGGER.strip():
+        # first run, or an older database whose trigger never closed rows:
+        # swap the trigger and close the open rows it left behind (once, so
+        # a normal start doesn't touch the schema)
+        c.execute("DROP TRIGGER IF EXISTS trg_products_price_history")
+        c.execute(PRICE_HISTORY_TRIGGER)
+        _close_replaced_prices(c)
+
+
+PRICE_HISTORY_TRIGGER = """
+CREATE TRIGGER trg_products_price_history
+AFTER UPDATE OF price ON products
+WHEN NEW.price IS NOT OLD.price
+BEGIN
+    UPDATE price_schedule SET ends_at = datetime('now', 'localtime')
+    WHERE product_id = NEW.id AND ends_at IS NULL
+      AND starts_at <= datetime('now', 'localtime');
+    INSERT INTO price_schedule (product_id, price, starts_at, note)
+    VALUES (NEW.id, NEW.price, datetime('now', 'localtime'), 'price change');
+END
+"""
+
+
+def _close_replaced_prices(c):
+    """End open price rows that a later-started open row already replaced."""
+    c.execute("""
+        SELECT id, (
+            SELECT MIN(n.starts_at) FROM price_schedule n
+            WHERE n.product_id = s.product_id AND n.ends_at IS NULL
+              AND (n.starts_at, n.id) > (s.starts_at, s.id)
+              AND n.starts_at <= datetime('now', 'localtime')
+        ) AS replaced_at
+        FROM price_schedule s
+        WHERE ends_at IS NULL AND replaced_at IS NOT NULL
+    """)
+    replaced = [(ends_at, row_id) for row_id, ends_at in c.fetchall()]
+    c.executemany("UPDATE price_schedule SET ends_at = ? WHERE id = ?", replaced)
+
+
+def init_product_barcodes(c):
+    """Every barcode that resolves to a product, with its pack size.
+
+    A product's own `products.barcode` is mirrored here (pack of 1) by
+    triggers, and extra rows add aliases: a supplier's code, or a carton
+    that sells `pack_qty` base units at once. Barcode is the primary key
+    of a WITHOUT ROWID table, so a scan is a single index seek no matter
+    how many aliases exist. Stock always stays in base units.
+    """
+    c.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'product_barcodes'"
+    )
+    is_new = c.fetchone() is None
+
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS product_barcodes (
+        barcode TEXT PRIMARY KEY,
+        product_id INTEGER NOT NULL,
+        pack_qty INTEGER NOT NULL DEFAULT 1 CHECK (pack_qty >= 1),
+        label TEXT
+    ) WITHOUT ROWID
+    """)
+    c.execute("""
+    CREATE INDEX IF NOT EXISTS idx_product_barcodes_product
+    ON product_barcodes(product_id)
+    """)
+
+    c.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_products_barcode_ins AFTER INSERT ON products
+    BEGIN
+        INSERT INTO product_barcodes (barcode, product_id, pack_qty) VALUES (NEW.barcode, NEW.id, 1);
+    END
+    """)
+    c.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_products_barcode_upd AFTER UPDATE OF barcode ON products
+    WHEN NEW.barcode IS NOT OLD.barcode
+    BEGIN
+        UPDATE product_barcodes SET barcode = NEW.barcode WHERE barcode = OLD.barcode;
+    END
+    """)
+    c.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_products_barcode_del AFTER DELETE ON products
+    BEGIN
+        DELETE FROM product_barcodes WHERE product_id = OLD.id;
+    END
+    """)
+
+    if is_new:
+        c.execute("""
+            INSERT OR IGNORE INTO product_barcodes (barcode, product_id, pack_qty)
+            SELECT barcode, id, 1 FROM products
+        """)
+
+
 # ---------------------------
 # Product Functions
 # ---------------------------
 def barcode_exists(barcode):
+    """True if `barcode` is any product's barcode or alias."""
     conn = get_connection()
     c = conn.cursor()
-    c.execute("SELECT 1 FROM products WHERE barcode = ?", (barcode,))
+    c.execute("SELECT 1 FROM product_barcodes WHERE barcode = ?", (barcode,))
     exists = c.fetchone() is not None
     conn.close()
     return exists
@@ -76,7 +626,7 @@ def generate_barcode_number():
     return str((max_id or 0) + 1001)
 
 
-def add_product(name, category, price, quantity, barcode):
+def add_product(name, category, price, quantity, barcode, reorder_level=None):
     conn = get_connection()
     c = conn.cursor()
 
@@ -96,16 +646,18 @@ def add_product(name, category, price, quantity, barcode):
 
         c.execute("""
             UPDATE products
-            SET name = ?, category = ?, price = ?, quantity = ?
+            SET name = ?, category = ?, price = ?, quantity = ?,
+                reorder_level = IFNULL(?, reorder_level)
             WHERE barcode = ?
-        """, (name, category, price, new_qty, barcode))
+        """, (name, category, price, new_qty, reorder_level, barcode))
 
     else:
         # New product → INSERT
         c.execute("""
-            INSERT INTO products (name, category, price, quantity, barcode)
-            VALUES (?, ?, ?, ?, ?)
-        """, (name, category, price, quantity, barcode))
+            INSERT INTO products (name, category, price, quantity, barcode, reorder_level)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (name, category, price, quantity, barcode, reorder_level))
+        product_id = c.lastrowid
 
         # Generate barcode image only for new products
         with open(barcode_path, "wb") as f:
@@ -113,6 +665,7 @@ def add_product(name, category, price, quantity, barcode):
 
     conn.commit()
     conn.close()
+    publish("products", [product_id])
 
     return barcode_path
 
@@ -127,32 +680,72 @@ def get_products():
     return rows
 
 
+def get_products_by_ids(product_ids, conn=None):
+    """Rows as in get_products() for just these ids (missing ids are left out)."""
+    ids = list(product_ids)
+    if not ids:
+        return []
+    with borrow_connection(conn) as conn:
+        return conn.execute(f"""
+            SELECT id, name, category, price, quantity, barcode
+            FROM products
+            WHERE id IN ({",".join("?" * len(ids))})
+        """, ids).fetchall()
+
+
 def get_product_by_barcode(barcode):
+    """Return (id, name, price, quantity, category, pack_qty) or None.
+
+    Any alias resolves; price and quantity are per base unit and pack_qty
+    is how many base units the scanned barcode stands for.
+    """
     conn = get_connection()
     c = conn.cursor()
     c.execute("""
-        SELECT id, name, price, quantity
-        FROM products
-        WHERE barcode = ?
+        SELECT p.id, p.name, p.price, p.quantity, p.category, b.pack_qty
+        FROM product_barcodes b
+        JOIN products p ON p.id = b.product_id
+        WHERE b.barcode = ?
     """, (barcode,))
     product = c.fetchone()
     conn.close()
     return product
 
 
-def search_products_by_name(query):
+def get_products_by_barcodes(barcodes, conn=None):
+    """Look up many barcodes in one query.
+
+    Returns a dict {barcode: (id, name, price, quantity, pack_qty)}; aliases
+    resolve like product barcodes and unknown barcodes are left out.
+    """
+    barcodes = list(dict.fromkeys(barcodes))
+    if not barcodes:
+        return {}
+    placeholders = ",".join("?" * len(barcodes))
+    with borrow_connection(conn) as conn:
+        rows = conn.execute(f"""
+            SELECT b.barcode, p.id, p.name, p.price, p.quantity, b.pack_qty
+            FROM product_barcodes b
+            JOIN products p ON p.id = b.product_id
+            WHERE b.barcode IN ({placeholders})
+        """, barcodes).fetchall()
+    return {row[0]: row[1:] for row in rows}
+
+
+def search_products_by_name(query, limit=None, conn=None):
     """Return a list of matching products by name"""
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute("""
+    sql = """
         SELECT id, name, price, quantity
         FROM products
         WHERE name LIKE ?
         ORDER BY name ASC
-    """, (f"%{query}%",))
-    results = c.fetchall()
-    conn.close()
-    return results
+    """
+    params = [f"%{query}%"]
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit)
+    with borrow_connection(conn) as conn:
+        return conn.execute(sql, params).fetchall()
 
 
 def update_stock(product_id, new_quantity):
@@ -164,6 +757,87 @@ def update_stock(product_id, new_quantity):
     )
     conn.commit()
     conn.close()
+    publish("products", [product_id])
+
+
+def set_reorder_level(product_id, reorder_level):
+    """Set the low-stock threshold (None disables alerts for the product)."""
+    conn = get_connection()
+    c = conn.cursor()
+    c.execute(
+        "UPDATE products SET reorder_level = ? WHERE id = ?",
+        (reorder_level, product_id)
+    )
+    conn.commit()
+    conn.close()
+    publish("products", [product_id])
+
+
+def get_low_stock_products():
+    """Products at or below their reorder level, served from the partial index."""
+    conn = get_connection()
+    c = conn.cursor()
+    c.execute("""
+        SELECT id, name, category, quantity, reorder_level, barcode
+        FROM products
+        WHERE quantity <= reorder_level
+        ORDER BY quantity ASC
+    """)
+    rows = c.fetchall()
+    conn.close()
+    return rows
+
+
+def mark_stock_alerts_notified(up_to_id):
+    """Mark pending alerts up to `up_to_id` (the newest one a digest listed) as sent."""
+    conn = get_connection()
+    c = conn.cursor()
+    c.execute("UPDATE stock_alerts SET notified = 1 WHERE notified = 0 AND id <= ?", (up_to_id,))
+    count = c.rowcount
+    conn.commit()
+    conn.close()
+    return count
+
+
+def add_barcode_alias(product_id, barcode, pack_qty=1, label=None):
+    """Make `barcode` scan as `pack_qty` units of `product_id`.
+
+    Raises ValueError if the barcode is already in use.
+    """
+    if pack_qty < 1:
+        raise ValueError("Pack size must be at least 1")
+    with borrow_connection() as conn:
+        try:
+            with conn:
+                conn.execute("""
+                    INSERT INTO product_barcodes (barcode, product_id, pack_qty, label)
+                    VALUES (?, ?, ?, ?)
+                """, (barcode, product_id, pack_qty, label))
+        except sqlite3.IntegrityError:
+            raise ValueError(f"Barcode {barcode} is already in use")
+
+
+def get_barcode_aliases(product_id):
+    """[(barcode, pack_qty, label)] for a product's extra barcodes."""
+    with borrow_connection() as conn:
+        return conn.execute("""
+            SELECT b.barcode, b.pack_qty, b.label
+            FROM product_barcodes b
+            JOIN products p ON p.id = b.product_id
+            WHERE b.product_id = ? AND b.barcode <> p.barcode
+            ORDER BY b.pack_qty, b.barcode
+        """, (product_id,)).fetchall()
+
+
+def remove_barcode_alias(barcode):
+    """Drop an alias (a product's own barcode can't be removed here)."""
+    with borrow_connection() as conn:
+        with conn:
+            conn.execute("""
+                DELETE FROM product_barcodes
+                WHERE barcode = ?
+                  AND barcode NOT IN (SELECT barcode FROM products WHERE barcode = ?)
+            """, (barcode, barcode))
 
 
 def delete_product(product_id):
@@ -172,6 +846,7 @@ def delete_product(product_id):
     c.execute("DELETE FROM products WHERE id = ?", (product_id,))
     conn.commit()
     conn.close()
+    publish("products", [product_id])
 
 
 # ---------------------------
@@ -210,3 +885,197 @@ def record_sale(product_id, product_name, qty, price, attendant):
 
     conn.commit()
     conn.close()
+    publish("sales", ())
+
+
+def checkout(items, attendant, conn=None):
+    """Sell a whole basket in one transaction.
+
+    items: list of dicts [{product_id, qty}] (name/price are read from the
+    products table so a stale client can't sell at an old price).
+    Scheduled prices and promotions are applied here too (database/pricing.py),
+    and each sale line records the list price, the promotion used and the
+    discount given (see init_sales_storage).
+    Stock is decremented with a guarded UPDATE, so two tills selling the last
+    unit can't both succeed. Raises ValueError (and rolls back) if a product
+    is missing or short of stock.
+    Returns: (receipt_no, total)
+    """
+    from database.pricing import get_price_book
+
+    sold_at = to_sold_at(datetime.now())
+    receipt_no = f"RCT-{int(datetime.now().timestamp() * 1000)}"
+    grand_total = 0
+
+    with borrow_connection(conn) as conn:
+        book = get_price_book(conn)
+        try:
+            c = conn.cursor()
+            attendant_id = _dimension_id(c, "attendants", attendant)
+            receipt_id = _dimension_id(c, "receipts", receipt_no, "receipt_no")
+            for item in items:
+                qty = int(item["qty"])
+                if qty <= 0:
+                    raise ValueError("Quantity must be positive")
+                c.execute(
+                    "SELECT name, price, category FROM products WHERE id = ?",
+                    (item["product_id"],)
+                )
+                product = c.fetchone()
+                if product is None:
+                    raise ValueError(f"Unknown product id {item['product_id']}")
+                name, base_price, category = product
+
+                c.execute("""
+                    UPDATE products
+                    SET quantity = quantity - ?
+                    WHERE id = ? AND quantity >= ?
+                """, (qty, item["product_id"], qty))
+                if c.rowcount == 0:
+                    raise ValueError(f"Not enough stock for {name}")
+
+                quote = book.quote(item["product_id"], category, base_price, qty)
+                promo = quote["promotion"]
+                grand_total += quote["total_cents"]
+                c.execute("""
+                    INSERT INTO sale_lines (
+                        product_id, name_id, quantity, price_cents, discount_cents,
+                        sold_at, attendant_id, receipt_id, promotion_id
+                    )
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (
+                    item["product_id"], _dimension_id(c, "product_names", name), qty,
+                    quote["list_cents"], quote["discount_cents"],
+                    sold_at, attendant_id, receipt_id,
+                    promo["id"] if promo else None
+                ))
+            started = time.perf_counter()
+            conn.commit()
+            _record_commit_latency(time.perf_counter() - started)
+        except Exception:
+            conn.rollback()
+            raise
+
+    # let open pages refresh just these rows (see database/changes.py)
+    publish("products", [item["product_id"] for item in items])
+    publish("sales", [receipt_id])
+    return receipt_no, grand_total / 100
+
+
+# Checkout commit times for this process, newest last (seconds)
+_commit_latency = deque(maxlen=1000)
+_commit_latency_lock = threading.Lock()
+
+
+def _record_commit_latency(seconds):
+    with _commit_latency_lock:
+        _commit_latency.append(seconds)
+
+
+def get_commit_latency_stats():
+    """p50/p95/max checkout commit time (ms) over the last 1000 sales."""
+    with _commit_latency_lock:
+        samples = sorted(_commit_latency)
+    if not samples:
+        return {"count": 0, "p50_ms": None, "p95_ms": None, "max_ms": None}
+
+    def pick(pct):
+        return round(samples[min(len(samples) - 1, int(len(samples) * pct))] * 1000, 2)
+
+    return {
+        "count": len(samples),
+        "p50_ms": pick(0.50),
+        "p95_ms": pick(0.95),
+        "max_ms": round(samples[-1] * 1000, 2),
+    }
+
+
+def get_sales_summary(day=None, conn=None):
+    """Return (transactions, items sold, revenue) for `day` (YYYY-MM-DD).
+
+    Defaults to today. Transactions are receipts, as in the sales report.
+    The range predicate keeps the query index-friendly.
+    """
+    start = to_sold_at(day or datetime.now().date())
+    with borrow_connection(conn) as conn:
+        return conn.execute("""
+            SELECT COUNT(DISTINCT receipt_id), IFNULL(SUM(quantity), 0),
+                   IFNULL(SUM(quantity * price_cents - discount_cents), 0) / 100.0
+            FROM sale_lines
+            WHERE sold_at >= ? AND sold_at < ?
+        """, (start, start + 86400)).fetchone()
+
+
+# ---------------------------
+# Cart Functions
+# ---------------------------
+def save_active_cart(attendant, items_json):
+    conn = get_connection()
+    conn.execute("""
+        INSERT INTO active_carts (attendant, items, updated_at)
+        VALUES (?, ?, ?)
+        ON CONFLICT(attendant) DO UPDATE
+        SET items = excluded.items, updated_at = excluded.updated_at
+    """, (attendant, items_json, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+    conn.commit()
+    conn.close()
+
+
+def get_active_cart(attendant):
+    """Return the saved in-progress cart JSON for `attendant`, or None."""
+    conn = get_connection()
+    row = conn.execute(
+        "SELECT items FROM active_carts WHERE attendant = ?", (attendant,)
+    ).fetchone()
+    conn.close()
+    return row[0] if row else None
+
+
+def clear_active_cart(attendant):
+    conn = get_connection()
+    conn.execute("DELETE FROM active_carts WHERE attendant = ?", (attendant,))
+    conn.commit()
+    conn.close()
+
+
+def hold_cart(label, attendant, items_json, total_cents):
+    conn = get_connection()
+    c = conn.cursor()
+    c.execute("""
+        INSERT INTO held_carts (label, attendant, items, total_cents, held_at)
+        VALUES (?, ?, ?, ?, ?)
+    """, (
+        label, attendant, items_json, total_cents,
+        datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    ))
+    held_id = c.lastrowid
+    conn.commit()
+    conn.close()
+    return held_id
+
+
+def get_held_carts():
+    """Return [(id, label, attendant, total_cents, held_at)], oldest first."""
+    conn = get_connection()
+    rows = conn.execute("""
+        SELECT id, label, attendant, total_cents, held_at
+        FROM held_carts
+        ORDER BY id ASC
+    """).fetchall()
+    conn.close()
+    return rows
+
+
+def resume_held_cart(held_id):
+    """Take a held cart out of the table; returns its items JSON or None.
+
+    The DELETE ... RETURNING makes resuming atomic, so two tills can't both
+    pick up the same parked customer.
+    """
+    conn = get_connection()
+    row = conn.execute(
+        "DELETE FROM held_carts WHERE id = ? RETURNING items", (held_id,)
+    ).fetchone()
+    conn.commit()
+    conn.close()
+    return row[0] if row else None
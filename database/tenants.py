@@ -0,0 +1,283 @@
+"""Several shops served from one process.
+
+Each shop (tenant) has its own folder under `tenants/` (or
+DUKA_TENANTS_DIR) holding its stock.db, visitors.db and backups. With no
+tenant selected everything uses the single-shop DB_PATH exactly as
+before, so a one-shop install never notices this module.
+
+Which shop a call is for:
+- `use_tenant(shop)` / `set_tenant(shop)` pin it for the current thread
+  (scheduler threads, scripts)
+- otherwise the resolver registered with `set_tenant_resolver` is asked;
+  app.py registers one that reads the Streamlit session, so widget
+  callbacks, which run before the script body, see the right shop too
+
+Open connections and per-shop caches (the price book, the report
+snapshot) live in `tenant_cache`, an LRU over shops bounded by an
+estimate of the memory they hold (DUKA_TENANT_CACHE_MB, default 256).
+Shops idle for DUKA_TENANT_IDLE_SECONDS (default 900) are dropped, and
+the least recently used ones go first when the budget is exceeded. A
+shop with a connection checked out, or a cache value in use (a report
+snapshot mid-query), is never evicted.
+
+    python -m database.tenants create town
+    python -m database.tenants list
+"""
+
+import argparse
+import contextvars
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TENANTS_DIR = os.environ.get("DUKA_TENANTS_DIR") or os.path.join(BASE_DIR, "tenants")
+CACHE_BYTES = int(float(os.environ.get("DUKA_TENANT_CACHE_MB", 256)) * 1024 * 1024)
+IDLE_SECONDS = float(os.environ.get("DUKA_TENANT_IDLE_SECONDS", 900))
+MAX_IDLE_CONNECTIONS = 4  # pooled connections kept per shop
+
+# shop ids become folder names: keep them to a safe, boring alphabet
+TENANT_ID = re.compile(r"^[a-z0-9][a-z0-9_-]{0,39}$")
+
+_current = contextvars.ContextVar("duka_tenant")
+_resolver = None
+
+
+# ---------------------------
+# Current tenant
+# ---------------------------
+def check_tenant(tenant):
+    """Return `tenant` if it is a valid shop id, else raise ValueError."""
+    if tenant is not None and not TENANT_ID.match(tenant):
+        raise ValueError(f"Invalid shop id {tenant!r}")
+    return tenant
+
+
+def current_tenant():
+    """The shop the current call is for (None = the single-shop DB)."""
+    try:
+        return _current.get()
+    except LookupError:
+        pass
+    return check_tenant(_resolver()) if _resolver else None
+
+
+def set_tenant(tenant):
+    """Pin `tenant` for the rest of this thread (None = the single-shop DB)."""
+    _current.set(check_tenant(tenant))
+
+
+@contextmanager
+def use_tenant(tenant):
+    token = _current.set(check_tenant(tenant))
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def set_tenant_resolver(resolver):
+    """Fallback for threads that never called set_tenant (e.g. Streamlit's)."""
+    global _resolver
+    _resolver = resolver
+
+
+def tenant_dir(tenant):
+    return os.path.join(TENANTS_DIR, check_tenant(tenant))
+
+
+def tenant_file(tenant, name):
+    """Path of `name` (stock.db, visitors.db, backups) inside a shop's folder."""
+    return os.path.join(tenant_dir(tenant), name)
+
+
+def list_tenants():
+    """Shop ids that have a database, sorted."""
+    if not os.path.isdir(TENANTS_DIR):
+        return []
+    return sorted(
+        name for name in os.listdir(TENANTS_DIR)
+        if TENANT_ID.match(name) and os.path.exists(tenant_file(name, "stock.db"))
+    )
+
+
+def create_tenant(tenant):
+    """Create a shop's folder and initialise its databases."""
+    from database.tables import init_db
+    from utils.visitor_db import init_visitor_db
+
+    os.makedirs(tenant_dir(tenant), exist_ok=True)
+    with use_tenant(tenant):
+        init_db()
+        init_visitor_db()
+
+
+# ---------------------------
+# Per-tenant connections and caches
+# ---------------------------
+class _TenantEntry:
+    def __init__(self, path):
+        self.path = path
+        self.idle = []        # pooled connections, ready to hand out
+        self.in_use = 0       # connections checked out right now
+        self.conn_bytes = 0   # page cache allowance of one connection
+        self.caches = {}      # name -> value
+        self.last_used = time.monotonic()
+
+
+def _connection_bytes(conn):
+    """Upper bound on one connection's page cache (PRAGMA cache_size)."""
+    pages = conn.execute("PRAGMA cache_size").fetchone()[0]
+    if pages < 0:
+        return -pages * 1024
+    return pages * conn.execute("PRAGMA page_size").fetchone()[0]
+
+
+class TenantCache:
+    """LRU of shops, each with pooled connections and named cache values.
+
+    Cache values may expose `nbytes` (their current size estimate),
+    `in_use` (non-zero while callers are using the value; the shop is kept
+    meanwhile) and `close()` (called when the shop is evicted).
+    """
+
+    def __init__(self, max_bytes=CACHE_BYTES, idle_seconds=IDLE_SECONDS):
+        self.max_bytes = max_bytes
+        self.idle_seconds = idle_seconds
+        self.entries = OrderedDict()   # tenant -> _TenantEntry, oldest first
+        self.lock = threading.RLock()
+        self.evictions = 0
+
+    def _entry(self, tenant, path):
+        entry = self.entries.get(tenant)
+        if entry is None or entry.path != path:
+            if entry is not None:
+                self._drop(tenant)
+            entry = self.entries[tenant] = _TenantEntry(path)
+        self.entries.move_to_end(tenant)
+        entry.last_used = time.monotonic()
+        return entry
+
+    # connections -----------------------------------------------------
+    def acquire(self, tenant, path):
+        """A connection to `path` for `tenant`; give it back with release()."""
+        with self.lock:
+            entry = self._entry(tenant, path)
+            entry.in_use += 1
+            conn = entry.idle.pop() if entry.idle else None
+        if conn is None:
+            conn = sqlite3.connect(path, check_same_thread=False)
+            if not entry.conn_bytes:
+                entry.conn_bytes = _connection_bytes(conn)
+        return conn
+
+    def release(self, tenant, path, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        with self.lock:
+            entry = self.entries.get(tenant)
+            if entry is not None and entry.path == path:
+                entry.in_use -= 1
+                if len(entry.idle) < MAX_IDLE_CONNECTIONS:
+                    entry.idle.append(conn)
+                    conn = None
+            if conn is not None:
+                conn.close()   # shop was evicted meanwhile, or pool is full
+            self._evict()
+
+    # cache values ----------------------------------------------------
+    def get(self, tenant, path, name):
+        with self.lock:
+            return self._entry(tenant, path).caches.get(name)
+
+    def put(self, tenant, path, name, value):
+        with self.lock:
+            self._entry(tenant, path).caches[name] = value
+            self._evict()
+        return value
+
+    # eviction --------------------------------------------------------
+    def _busy(self, entry):
+        return entry.in_use or any(
+            getattr(value, "in_use", 0) for value in entry.caches.values()
+        )
+
+    def _entry_bytes(self, entry):
+        total = len(entry.idle) * entry.conn_bytes
+        for value in entry.caches.values():
+            total += getattr(value, "nbytes", 0) or 0
+        return total
+
+    def _drop(self, tenant):
+        entry = self.entries.pop(tenant)
+        for conn in entry.idle:
+            conn.close()
+        for value in entry.caches.values():
+            close = getattr(value, "close", None)
+            if close:
+                close()
+        self.evictions += 1
+
+    def _evict(self):
+        now = time.monotonic()
+        for tenant, entry in list(self.entries.items()):
+            if not self._busy(entry) and now - entry.last_used > self.idle_seconds:
+                self._drop(tenant)
+
+        sizes = {tenant: self._entry_bytes(entry) for tenant, entry in self.entries.items()}
+        total = sum(sizes.values())
+        newest = next(reversed(self.entries), None)
+        for tenant in list(self.entries):  # least recently used first
+            if total <= self.max_bytes:
+                break
+            if tenant == newest or self._busy(self.entries[tenant]):
+                continue
+            total -= sizes[tenant]
+            self._drop(tenant)
+
+    def stats(self):
+        """[(tenant, idle connections, in use, est. bytes, idle seconds)], most recent first."""
+        now = time.monotonic()
+        with self.lock:
+            return [
+                (tenant, len(e.idle), e.in_use, self._entry_bytes(e), round(now - e.last_used))
+                for tenant, e in reversed(self.entries.items())
+            ]
+
+    def clear(self):
+        with self.lock:
+            for tenant in list(self.entries):
+                self._drop(tenant)
+
+
+tenant_cache = TenantCache()
+
+
+# ---------------------------
+# CLI
+# ---------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Manage hosted shops")
+    sub = parser.add_subparsers(dest="command", required=True)
+    create = sub.add_parser("create", help="create a shop and its database")
+    create.add_argument("shop")
+    sub.add_parser("list", help="list shops")
+    opts = parser.parse_args()
+
+    if opts.command == "create":
+        create_tenant(opts.shop)
+        print(f"Created {tenant_file(opts.shop, 'stock.db')}")
+    else:
+        for shop in list_tenants():
+            print(shop)
+
+
+if __name__ == "__main__":
+    # run the package's copy: under -m this file is __main__, and a shop
+    # pinned on __main__'s context variable is invisible to database.tables
+    from database.tenants import main
+    main()
@@ -0,0 +1,176 @@
+# cart.py
+import json
+from decimal import Decimal
+
+from database.pricing import best_promotion, line_total_cents, promo_unit_cents, to_cents
+from database.tables import (
+    save_active_cart,
+    clear_active_cart,
+    hold_cart,
+    resume_held_cart
+)
+
+
+def from_cents(cents):
+    return (Decimal(cents) / 100).quantize(Decimal("0.01"))
+
+
+class Cart:
+    """Shopping basket keyed by product id.
+
+    Totals are kept up to date on every change (no re-summing on render)
+    and held in integer cents so they never drift. Each line carries the
+    promotions that were live when it was scanned; the best one for the
+    line's quantity is re-picked whenever the quantity changes.
+    """
+
+    def __init__(self):
+        self.lines = {}
+        self.total_cents = 0
+        self.item_count = 0
+
+    def __len__(self):
+        return len(self.lines)
+
+    def __bool__(self):
+        return bool(self.lines)
+
+    def __contains__(self, product_id):
+        return product_id in self.lines
+
+    @property
+    def total(self):
+        return from_cents(self.total_cents)
+
+    def add(self, product_id, name, price, qty, stock, promotions=()):
+        """Add `qty` of a product, merging with an existing line.
+
+        price: the regular unit price; promotions: live promotion dicts
+        for the product (see database/pricing.py).
+        Raises ValueError if the line would exceed `stock`.
+        """
+        line = self.lines.get(product_id)
+        new_qty = qty + (line["qty"] if line else 0)
+        if new_qty > stock:
+            raise ValueError("Quantity exceeds available stock")
+
+        if line is None:
+            line = {
+                "product_id": product_id,
+                "name": name,
+                "price_cents": to_cents(price),
+                "qty": 0,
+                "stock": stock,
+                "promotions": list(promotions),
+                "promotion": None,
+                "total_cents": 0
+            }
+            self.lines[product_id] = line
+
+        line["qty"] = new_qty
+        line["stock"] = stock
+        self.item_count += qty
+        self._reprice(line)
+        return line
+
+    def _reprice(self, line):
+        """Re-pick the line's promotion and fold its new total into the cart."""
+        promo = best_promotion(line.get("promotions", ()), line["price_cents"], line["qty"])
+        cents = line_total_cents(line["price_cents"], line["qty"], promo)
+        self.total_cents += cents - line.get("total_cents", 0)
+        line["promotion"] = promo
+        line["total_cents"] = cents
+
+    def set_qty(self, product_id, qty):
+        line = self.lines[product_id]
+        if qty <= 0:
+            self.remove(product_id)
+            return
+        if qty > line["stock"]:
+            raise ValueError("Quantity exceeds available stock")
+        self.item_count += qty - line["qty"]
+        line["qty"] = qty
+        self._reprice(line)
+
+    def remove(self, product_id):
+        line = self.lines.pop(product_id, None)
+        if line:
+            self.total_cents -= line["total_cents"]
+            self.item_count -= line["qty"]
+
+    def clear(self):
+        self.lines.clear()
+        self.total_cents = 0
+        self.item_count = 0
+
+    def line_total(self, product_id):
+        return from_cents(self.lines[product_id]["total_cents"])
+
+    def update_stock(self, levels):
+        """Refresh lines' stock from {product_id: quantity} (e.g. after another
+        till sold some). Returns the lines now asking for more than is left.
+        """
+        for product_id, quantity in levels.items():
+            if product_id in self.lines:
+                self.lines[product_id]["stock"] = quantity
+        return [line for line in self.lines.values() if line["qty"] > line["stock"]]
+
+    def items(self):
+        """Lines as dicts in insertion order:
+
+        [{product_id, name, price, qty, stock, total, promotion, discount}]
+        where price is the unit price after any percent-off promotion and
+        promotion is the applied promotion's name (or None).
+        """
+        return [
+            {
+                "product_id": line["product_id"],
+                "name": line["name"],
+                "price": from_cents(promo_unit_cents(line["price_cents"], line["promotion"])),
+                "qty": line["qty"],
+                "stock": line["stock"],
+                "total": from_cents(line["total_cents"]),
+                "promotion": line["promotion"]["name"] if line["promotion"] else None,
+                "discount": from_cents(line["price_cents"] * line["qty"] - line["total_cents"])
+            }
+            for line in self.lines.values()
+        ]
+
+    # ---------------------------
+    # Persistence
+    # ---------------------------
+    def to_json(self):
+        return json.dumps(list(self.lines.values()))
+
+    @classmethod
+    def from_json(cls, data):
+        cart = cls()
+        for line in json.loads(data or "[]"):
+            # baskets saved before promotions existed have no totals yet
+            line["total_cents"] = 0
+            cart.lines[line["product_id"]] = line
+            cart.item_count += line["qty"]
+            cart._reprice(line)
+        return cart
+
+    def autosave(self, attendant):
+        """Keep the in-progress basket in SQLite so a closed tab doesn't lose it."""
+        if self.lines:
+            save_active_cart(attendant, self.to_json())
+        else:
+            clear_active_cart(attendant)
+
+    def hold(self, attendant, label):
+        """Park this basket as a held cart and empty it. Returns the held id."""
+        if not self.lines:
+            raise ValueError("Cart is empty")
+        held_id = hold_cart(label, attendant, self.to_json(), self.total_cents)
+        self.clear()
+        clear_active_cart(attendant)
+        return held_id
+
+    @classmethod
+    def resume(cls, held_id):
+        """Load (and remove) a held basket. Returns None if already resumed."""
+        data = resume_held_cart(held_id)
+        return None if data is None else cls.from_json(data)
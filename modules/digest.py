@@ -0,0 +1,187 @@
+"""Sales digests for the owner: one WhatsApp message per day (or hour).
+
+A digest covers [start, end) and is built from one statement: totals,
+per-attendant figures and the top products are GROUP BYs over the
+period's sale lines (read through the sold_at index, so a day is a few
+hundred rows even on a big DB), and the low-stock arm is served from the
+partial index on products. Products whose low-stock alert (written by
+the triggers in init_stock_alerts) has not gone out in an earlier digest
+are listed first, as new. It runs on a read-only connection, so it can
+go out during trading without holding up a till.
+
+The scheduler sends the end-of-day digest just after midnight for the
+whole day that ended (it then marks the alerts it read as notified) and, when DUKA_HOURLY_DIGEST is set, an hourly one for the hour
+just gone. A run the scheduler catches up on later still covers the
+day or hour it was due for. Messages go through the
+notifier's transport (DUKA_NOTIFY_TRANSPORT=stub writes them to a file).
+"""
+
+from datetime import datetime, timedelta
+
+from database.tables import get_read_connection, mark_stock_alerts_notified, to_sold_at
+from database.tenants import current_tenant
+
+TOP_PRODUCTS = 5
+LOW_STOCK_LINES = 8
+
+DIGEST_SQL = """
+WITH f AS MATERIALIZED (
+    SELECT product_id, name_id, attendant_id, receipt_id, quantity,
+           quantity * price_cents - discount_cents AS total_cents, discount_cents
+    FROM sale_lines
+    WHERE sold_at >= :start AND sold_at < :end
+)
+SELECT 'total', NULL, COUNT(DISTINCT receipt_id), IFNULL(SUM(quantity), 0),
+       IFNULL(SUM(total_cents), 0), IFNULL(SUM(discount_cents), 0)
+FROM f
+
+UNION ALL
+SELECT 'attendant', IFNULL((SELECT name FROM attendants WHERE id = attendant_id), '?'),
+       COUNT(DISTINCT receipt_id), SUM(quantity), SUM(total_cents), NULL
+FROM f GROUP BY attendant_id
+
+UNION ALL
+SELECT 'product', (SELECT name FROM product_names WHERE id = name_id),
+       receipts, qty, total_cents, NULL
+FROM (
+    SELECT MAX(name_id) AS name_id, COUNT(DISTINCT receipt_id) AS receipts,
+           SUM(quantity) AS qty, SUM(total_cents) AS total_cents
+    FROM f GROUP BY product_id
+    ORDER BY total_cents DESC
+    LIMIT :top
+)
+
+UNION ALL
+SELECT 'low_stock', name, quantity, reorder_level,
+       EXISTS (SELECT 1 FROM stock_alerts a WHERE a.product_id = products.id AND a.notified = 0),
+       NULL
+FROM products
+WHERE quantity <= reorder_level
+
+UNION ALL
+SELECT 'alerts', NULL, NULL, NULL, MAX(id), NULL
+FROM stock_alerts
+"""
+
+
+def period_bounds(period, now=None):
+    """[start, end) for a digest: the last full calendar day or hour before `now`."""
+    now = now or datetime.now()
+    if period == "hour":
+        end = now.replace(minute=0, second=0, microsecond=0)
+        return end - timedelta(hours=1), end
+    if period == "day":
+        end = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        return end - timedelta(days=1), end
+    raise ValueError(f"Unknown digest period {period!r}")
+
+
+def build_digest(start, end, top=TOP_PRODUCTS, conn=None):
+    """Figures for [start, end) as a dict:
+
+        start, end, receipts, items, revenue, discount,
+        attendants: [(name, receipts, items, revenue)], best first
+        top_products: [(name, receipts, items, revenue)], best first
+        low_stock: [(name, quantity, reorder_level, new)], new alerts
+            first, then emptiest first
+        alerts_up_to: id of the newest stock alert the digest saw
+
+    Money is in KSh.
+    """
+    params = {"start": to_sold_at(start), "end": to_sold_at(end), "top": top}
+    own_conn = conn is None
+    conn = conn or get_read_connection()
+    try:
+        rows = conn.execute(DIGEST_SQL, params).fetchall()
+    finally:
+        if own_conn:
+            conn.close()
+
+    digest = {
+        "start": start, "end": end,
+        "receipts": 0, "items": 0, "revenue": 0.0, "discount": 0.0,
+        "attendants": [], "top_products": [], "low_stock": [], "alerts_up_to": None,
+    }
+    for kind, label, a, b, cents, discount in rows:
+        if kind == "total":
+            digest.update(receipts=a, items=b, revenue=cents / 100, discount=discount / 100)
+        elif kind == "attendant":
+            digest["attendants"].append((label, a, b, cents / 100))
+        elif kind == "product":
+            digest["top_products"].append((label, a, b, cents / 100))
+        elif kind == "low_stock":
+            digest["low_stock"].append((label, a, b, bool(cents)))
+        else:
+            digest["alerts_up_to"] = cents
+    digest["attendants"].sort(key=lambda r: r[3], reverse=True)
+    digest["top_products"].sort(key=lambda r: r[3], reverse=True)
+    digest["low_stock"].sort(key=lambda r: (not r[3], r[1]))
+    return digest
+
+
+def format_digest(digest, title="Duka sales"):
+    """A compact plain-text message (well under WhatsApp's 1600 characters)."""
+    start, end = digest["start"], digest["end"]
+    if end - start == timedelta(days=1) and start.time() == end.time() == datetime.min.time():
+        when = f"{start:%a %d %b}"
+    elif start.date() == end.date():
+        when = f"{start:%a %d %b} {start:%H:%M}–{end:%H:%M}"
+    else:
+        when = f"{start:%d %b %H:%M} – {end:%d %b %H:%M}"
+    lines = [f"📊 {title} · {when}"]
+
+    if not digest["receipts"]:
+        lines.append("No sales.")
+    else:
+        lines.append(
+            f"KSh {digest['revenue']:,.0f} · {digest['receipts']} receipts · {digest['items']} items"
+            + (f" · KSh {digest['discount']:,.0f} off" if digest["discount"] else "")
+        )
+        lines.append("👤 " + " | ".join(
+            f"{name} {revenue:,.0f} ({receipts})"
+            for name, receipts, _, revenue in digest["attendants"]
+        ))
+        lines.append("🏆 Top:")
+        for n, (name, _, items, revenue) in enumerate(digest["top_products"], 1):
+            lines.append(f"{n}. {name} ×{items} = {revenue:,.0f}")
+
+    low = digest["low_stock"]
+    if low:
+        new = sum(1 for *_, is_new in low if is_new)
+        lines.append(f"⚠️ Low stock ({len(low)}" + (f", {new} new" if new else "") + "):")
+        for name, qty, level, is_new in low[:LOW_STOCK_LINES]:
+            lines.append(f"- {'🆕 ' if is_new else ''}{name}: {qty} left (reorder at {level})")
+        if len(low) > LOW_STOCK_LINES:
+            lines.append(f"…and {len(low) - LOW_STOCK_LINES} more")
+    return "\n".join(lines)
+
+
+def send_digest(period="day", now=None, send=None):
+    """Build and send the digest for `period` ('day' or 'hour') before `now`.
+
+    send: callable taking the message body; defaults to the WhatsApp
+    notifier. An hourly digest with no sales is skipped and leaves out
+    low stock. The daily one always goes out and marks the low-stock
+    alerts it read as notified (not ones raised while it was sending).
+    Returns the message sent, or None.
+    """
+    start, end = period_bounds(period, now)
+    digest = build_digest(start, end)
+    if period == "hour":
+        if not digest["receipts"]:
+            return None
+        # stock levels go out once a day, not every hour
+        digest["low_stock"] = []
+
+    if send is None:
+        from utils.whatsapp_notifier import send_message as send
+
+    title = "Duka end of day" if period == "day" else "Duka hourly sales"
+    if current_tenant():
+        title += f" · {current_tenant()}"  # the owner may run several shops
+    body = format_digest(digest, title)
+    if not send(body):
+        return None
+    if period == "day" and digest["alerts_up_to"] is not None:
+        mark_stock_alerts_notified(digest["alerts_up_to"])
+    return body
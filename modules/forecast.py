@@ -0,0 +1,203 @@
+"""Per-product demand forecasts and reorder suggestions.
+
+The model is updated one closed day at a time: each day's per-product
+quantities (one indexed range query) are folded into an exponentially
+smoothed level and a 7-day ring of daily values for the moving average.
+State lives in `forecast_state`, so nothing is ever refit from the full
+sales history. All products are updated together as NumPy arrays.
+"""
+
+from datetime import date, timedelta
+
+import numpy as np
+
+from database.tables import current_db_path, get_connection, to_sold_at
+from database.tenants import current_tenant, tenant_cache
+
+ALPHA = 0.3          # smoothing factor for the EWMA level
+WINDOW = 7           # days in the moving average
+BOOTSTRAP_DAYS = 90  # history folded in on the very first run
+SERVICE_Z = 1.65     # ~95% service level for safety stock
+
+
+# ---------------------------
+# State
+# ---------------------------
+def init_forecast_tables(conn):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS forecast_state (
+        product_id INTEGER PRIMARY KEY,
+        ewma REAL NOT NULL,
+        ring BLOB NOT NULL,
+        days_seen INTEGER NOT NULL
+    )
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS forecast_meta (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    )
+    """)
+    conn.commit()
+
+
+def _load_state(conn, ids):
+    """State arrays aligned to `ids` (new products start at zero)."""
+    n = len(ids)
+    ewma = np.zeros(n)
+    ring = np.zeros((n, WINDOW))
+    days_seen = np.zeros(n, dtype=np.int64)
+    index = {pid: i for i, pid in enumerate(ids)}
+    for pid, level, blob, seen in conn.execute(
+        "SELECT product_id, ewma, ring, days_seen FROM forecast_state"
+    ):
+        i = index.get(pid)
+        if i is not None:
+            ewma[i] = level
+            ring[i] = np.frombuffer(blob, dtype=np.float64)
+            days_seen[i] = seen
+    return ewma, ring, days_seen
+
+
+def _get_meta(conn, key):
+    row = conn.execute("SELECT value FROM forecast_meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+
+def close_days(upto=None):
+    """Fold every closed day up to `upto` (default yesterday) into the model.
+
+    Returns the number of days processed.
+    """
+    upto = upto or date.today() - timedelta(days=1)
+    conn = get_connection()
+    try:
+        init_forecast_tables(conn)
+        last = _get_meta(conn, "last_closed_day")
+        if last:
+            start = date.fromisoformat(last) + timedelta(days=1)
+        else:
+            first_sale = conn.execute("SELECT MIN(sold_at) FROM sale_lines").fetchone()[0]
+            if first_sale is None:
+                return 0
+            first_day = date(1970, 1, 1) + timedelta(days=first_sale // 86400)
+            start = max(first_day, upto - timedelta(days=BOOTSTRAP_DAYS - 1))
+        if start > upto:
+            return 0
+
+        ids = np.array(
+            [r[0] for r in conn.execute("SELECT id FROM products ORDER BY id")],
+            dtype=np.int64
+        )
+        ewma, ring, days_seen = _load_state(conn, ids)
+
+        day = start
+        while day <= upto:
+            x = np.zeros(len(ids))
+            rows = conn.execute("""
+                SELECT product_id, SUM(quantity) FROM sale_lines
+                WHERE sold_at >= ? AND sold_at < ?
+                GROUP BY product_id
+            """, (to_sold_at(day), to_sold_at(day) + 86400)).fetchall()
+            if rows and len(ids):
+                sold_ids = np.array([r[0] for r in rows], dtype=np.int64)
+                pos = np.clip(np.searchsorted(ids, sold_ids), 0, len(ids) - 1)
+                found = ids[pos] == sold_ids
+                x[pos[found]] = np.array([r[1] for r in rows], dtype=np.float64)[found]
+
+            ewma = np.where(days_seen == 0, x, ALPHA * x + (1 - ALPHA) * ewma)
+            ring[:, day.toordinal() % WINDOW] = x
+            days_seen += 1
+            day += timedelta(days=1)
+
+        with conn:
+            conn.execute("DELETE FROM forecast_state")
+            conn.executemany(
+                "INSERT INTO forecast_state (product_id, ewma, ring, days_seen) VALUES (?, ?, ?, ?)",
+                [
+                    (int(pid), float(level), ring[i].tobytes(), int(days_seen[i]))
+                    for i, (pid, level) in enumerate(zip(ids, ewma))
+                ]
+            )
+            conn.execute("""
+                INSERT INTO forecast_meta (key, value) VALUES ('last_closed_day', ?)
+                ON CONFLICT(key) DO UPDATE SET value = excluded.value
+            """, (upto.isoformat(),))
+        return (upto - start).days + 1
+    finally:
+        conn.close()
+
+
+# ---------------------------
+# Suggestions
+# ---------------------------
+def _data_version(conn):
+    """Changes whenever a product or sale is written (via the change log)."""
+    row = conn.execute(
+        "SELECT seq FROM sqlite_sequence WHERE name = 'change_log'"
+    ).fetchone()
+    return row[0] if row else 0
+
+
+def suggest_reorders(lead_days=7, cover_days=14):
+    """Forecast demand and suggest reorder quantities for every product.
+
+    Returns a list of dicts sorted by suggested quantity (largest first).
+    Results are cached in the shop's slot of `tenant_cache` until a
+    product or sale changes.
+    """
+    close_days()
+
+    tenant, path = current_tenant(), current_db_path()
+    conn = get_connection()
+    try:
+        last_closed = _get_meta(conn, "last_closed_day")
+        key = (_data_version(conn), lead_days, cover_days, last_closed)
+        cached = tenant_cache.get(tenant, path, "reorder_suggestions")
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        products = conn.execute(
+            "SELECT id, name, quantity FROM products ORDER BY id"
+        ).fetchall()
+        ids = np.array([p[0] for p in products], dtype=np.int64)
+        ewma, ring, days_seen = _load_state(conn, ids)
+    finally:
+        conn.close()
+
+    if not products or not last_closed:
+        return []
+
+    stock = np.array([p[2] for p in products], dtype=np.float64)
+    seen = np.clip(days_seen, 1, WINDOW)
+    moving_avg = ring.sum(axis=1) / seen
+    # slot age in days (0 = last closed day); slots older than a product's
+    # history are still empty and stay out of the spread
+    ages = (date.fromisoformat(last_closed).toordinal() - np.arange(WINDOW)) % WINDOW
+    filled = ages[None, :] < seen[:, None]
+    std = np.sqrt(
+        np.where(filled, (ring - moving_avg[:, None]) ** 2, 0).sum(axis=1) / seen
+    )
+
+    daily = ewma
+    safety = SERVICE_Z * std * np.sqrt(lead_days)
+    target = daily * (lead_days + cover_days) + safety
+    reorder = np.ceil(np.maximum(target - stock, 0)).astype(np.int64)
+    with np.errstate(divide="ignore"):
+        days_left = np.where(daily > 0, stock / daily, np.inf)
+
+    order = np.argsort(-reorder, kind="stable")
+    result = [
+        {
+            "product_id": int(ids[i]),
+            "name": products[i][1],
+            "stock": int(stock[i]),
+            "daily_ewma": round(float(daily[i]), 2),
+            "daily_ma": round(float(moving_avg[i]), 2),
+            "days_left": round(float(days_left[i]), 1),
+            "reorder_qty": int(reorder[i]),
+        }
+        for i in order
+    ]
+    tenant_cache.put(tenant, path, "reorder_suggestions", (key, result))
+    return result
@@ -0,0 +1,208 @@
+import streamlit as st
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+
+from database.tables import get_connection, to_sold_at
+from database.tenants import current_tenant
+from modules.forecast import suggest_reorders
+
+
+# ---------------------------
+# Data loading
+# ---------------------------
+def load_inventory_arrays(window_days=30, dead_days=60):
+    """Load products and their recent sales into aligned NumPy arrays.
+
+    Two queries in total: the product table, and one grouped pass over
+    sales since the longer of the two windows. Returns a dict of arrays
+    (one slot per product) plus the window sizes. A product is dead stock
+    if it has not sold in the last `dead_days`, whichever window is longer.
+    """
+    now = datetime.now()
+    since = to_sold_at(now - timedelta(days=max(window_days, dead_days)))
+    window_start = to_sold_at(now - timedelta(days=window_days))
+    dead_start = to_sold_at(now - timedelta(days=dead_days))
+
+    conn = get_connection()
+    try:
+        products = conn.execute("""
+            SELECT id, name, IFNULL(NULLIF(category, ''), 'Uncategorised'), price, quantity
+            FROM products
+            ORDER BY id
+        """).fetchall()
+        sold = conn.execute("""
+            SELECT product_id,
+                   SUM(CASE WHEN sold_at >= ? THEN quantity ELSE 0 END),
+                   MAX(sold_at)
+            FROM sale_lines
+            WHERE sold_at >= ?
+            GROUP BY product_id
+        """, (window_start, since)).fetchall()
+    finally:
+        conn.close()
+
+    n = len(products)
+    ids = np.fromiter((p[0] for p in products), dtype=np.int64, count=n)
+    arrays = {
+        "id": ids,
+        "name": np.array([p[1] for p in products], dtype=object),
+        "category": np.array([p[2] for p in products], dtype=object),
+        "price": np.fromiter((p[3] for p in products), dtype=np.float64, count=n),
+        "quantity": np.fromiter((p[4] for p in products), dtype=np.int64, count=n),
+        "sold": np.zeros(n, dtype=np.int64),
+        "sold_recently": np.zeros(n, dtype=bool),
+        "window_days": window_days,
+        "dead_days": dead_days,
+    }
+
+    if sold and n:
+        sold_ids = np.fromiter((s[0] for s in sold), dtype=np.int64, count=len(sold))
+        # products are ordered by id, so sales can be scattered by binary search
+        pos = np.searchsorted(ids, sold_ids)
+        pos = np.clip(pos, 0, n - 1)
+        found = ids[pos] == sold_ids
+        arrays["sold"][pos[found]] = np.fromiter(
+            (s[1] for s in sold), dtype=np.int64, count=len(sold)
+        )[found]
+        # a sale within the dead-stock window means not dead stock
+        last_sold = np.fromiter((s[2] for s in sold), dtype=np.int64, count=len(sold))
+        arrays["sold_recently"][pos[found]] = (last_sold >= dead_start)[found]
+
+    return arrays
+
+
+# ---------------------------
+# Vectorised metrics
+# ---------------------------
+def compute_inventory_metrics(arrays, categories=None):
+    """Per-product and per-category metrics, optionally for some categories."""
+    mask = np.ones(len(arrays["id"]), dtype=bool)
+    if categories:
+        mask = np.isin(arrays["category"], list(categories))
+
+    price = arrays["price"][mask]
+    qty = arrays["quantity"][mask]
+    sold = arrays["sold"][mask]
+    category = arrays["category"][mask]
+
+    stock_value = price * qty
+    daily_rate = sold / arrays["window_days"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        days_of_cover = np.where(daily_rate > 0, qty / daily_rate, np.inf)
+        sell_through = np.where(sold + qty > 0, sold / (sold + qty), 0.0)
+    dead = (qty > 0) & ~arrays["sold_recently"][mask]
+
+    per_product = pd.DataFrame({
+        "Product": arrays["name"][mask],
+        "Category": category,
+        "Price": price,
+        "Stock": qty,
+        "Stock Value": stock_value,
+        f"Sold ({arrays['window_days']}d)": sold,
+        "Sell-through %": np.round(sell_through * 100, 1),
+        "Days of Cover": np.round(days_of_cover, 1),
+        "Dead": dead,
+    })
+
+    cats, inverse = np.unique(category.astype(str), return_inverse=True)
+    k = len(cats)
+    cat_value = np.bincount(inverse, weights=stock_value, minlength=k)
+    cat_qty = np.bincount(inverse, weights=qty, minlength=k)
+    cat_sold = np.bincount(inverse, weights=sold, minlength=k)
+    cat_dead_value = np.bincount(inverse, weights=stock_value * dead, minlength=k)
+    cat_skus = np.bincount(inverse, minlength=k)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cat_cover = np.where(cat_sold > 0, cat_qty / (cat_sold / arrays["window_days"]), np.inf)
+        # stock turns per year at the current sales rate
+        cat_turnover = np.where(cat_qty > 0, (cat_sold / arrays["window_days"] * 365) / cat_qty, 0.0)
+
+    per_category = pd.DataFrame({
+        "Category": cats,
+        "SKUs": cat_skus,
+        "Stock": cat_qty.astype(np.int64),
+        "Stock Value": cat_value,
+        "Dead Stock Value": cat_dead_value,
+        f"Sold ({arrays['window_days']}d)": cat_sold.astype(np.int64),
+        "Days of Cover": np.round(cat_cover, 1),
+        "Turnover / yr": np.round(cat_turnover, 2),
+    }).sort_values("Stock Value", ascending=False)
+
+    totals = {
+        "stock_value": float(stock_value.sum()),
+        "units": int(qty.sum()),
+        "dead_value": float(stock_value[dead].sum()),
+        "dead_skus": int(dead.sum()),
+    }
+    return totals, per_product, per_category
+
+
+# ---------------------------
+# Streamlit UI
+# ---------------------------
+@st.cache_data(ttl=60, show_spinner=False)
+def _cached_arrays(tenant, window_days, dead_days):
+    # st.cache_data is shared by every session: the shop is part of the key
+    return load_inventory_arrays(window_days, dead_days)
+
+
+def inventory_ui():
+    st.markdown(
+        "<h1 style='text-align:center;color:#795548;'>📦 Inventory Value & Turnover</h1>",
+        unsafe_allow_html=True
+    )
+
+    col1, col2 = st.columns(2)
+    window_days = col1.selectbox("Sales window (days)", [7, 30, 90], index=1)
+    dead_days = col2.selectbox("Dead stock after (days without a sale)", [30, 60, 90, 180], index=1)
+
+    arrays = _cached_arrays(current_tenant(), window_days, dead_days)
+    if not len(arrays["id"]):
+        st.info("No products added yet")
+        return
+
+    categories = st.multiselect("Categories", sorted(set(arrays["category"])))
+    totals, per_product, per_category = compute_inventory_metrics(arrays, categories)
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("💰 Stock Value (KSh)", f"{totals['stock_value']:,.2f}")
+    col2.metric("📦 Units in Stock", f"{totals['units']:,}")
+    col3.metric("🪦 Dead Stock Value (KSh)", f"{totals['dead_value']:,.2f}")
+    col4.metric("🧊 Dead SKUs", totals["dead_skus"])
+
+    st.markdown("---")
+    st.subheader("🗂️ By Category")
+    st.dataframe(per_category, use_container_width=True, hide_index=True)
+
+    st.subheader("🪦 Dead Stock")
+    dead = per_product[per_product["Dead"]].sort_values("Stock Value", ascending=False)
+    if dead.empty:
+        st.success("✅ No dead stock")
+    else:
+        st.dataframe(dead.drop(columns="Dead"), use_container_width=True, hide_index=True)
+
+    st.subheader("⏳ Lowest Days of Cover")
+    selling = per_product[np.isfinite(per_product["Days of Cover"])]
+    st.dataframe(
+        selling.sort_values("Days of Cover").head(20).drop(columns="Dead"),
+        use_container_width=True,
+        hide_index=True
+    )
+
+    # ---------------------------
+    # Reorder suggestions
+    # ---------------------------
+    st.markdown("---")
+    st.subheader("🔮 Reorder Suggestions")
+    col1, col2 = st.columns(2)
+    lead_days = col1.number_input("Supplier lead time (days)", min_value=1, value=7, step=1)
+    cover_days = col2.number_input("Days of stock to order for", min_value=1, value=14, step=1)
+
+    suggestions = [s for s in suggest_reorders(lead_days, cover_days) if s["reorder_qty"] > 0]
+    if not suggestions:
+        st.success("✅ Nothing needs reordering at the current sales rate")
+        return
+
+    df = pd.DataFrame(suggestions).drop(columns="product_id")
+    df.columns = ["Product", "Stock", "Daily Demand (EWMA)", "Daily Demand (7d avg)", "Days Left", "Reorder Qty"]
+    st.dataframe(df, use_container_width=True, hide_index=True)
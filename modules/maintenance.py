@@ -0,0 +1,89 @@
+import streamlit as st
+import pandas as pd
+
+from database.scheduler import get_scheduler, get_job_runs
+from database.tables import get_commit_latency_stats
+from database.tenants import list_tenants, tenant_cache
+
+
+# ---------------------------
+# Streamlit UI
+# ---------------------------
+def maintenance_ui():
+    st.markdown(
+        "<h1 style='text-align:center;color:#607D8B;'>🛠️ Maintenance</h1>",
+        unsafe_allow_html=True
+    )
+
+    # ---------------------------
+    # Checkout commit latency
+    # ---------------------------
+    st.subheader("🧾 Checkout Commit Time")
+    stats = get_commit_latency_stats()
+    if not stats["count"]:
+        st.caption("No sales completed in this session of the app yet")
+    else:
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Sales measured", stats["count"])
+        col2.metric("p50 (ms)", stats["p50_ms"])
+        col3.metric("p95 (ms)", stats["p95_ms"])
+        col4.metric("Slowest (ms)", stats["max_ms"])
+    st.markdown("---")
+
+    # ---------------------------
+    # Hosted shops
+    # ---------------------------
+    if list_tenants():
+        st.subheader("🏪 Open Shops")
+        open_shops = pd.DataFrame(
+            tenant_cache.stats(),
+            columns=["Shop", "Idle connections", "In use", "Est. bytes", "Idle (s)"]
+        )
+        open_shops["Shop"] = open_shops["Shop"].fillna("(default)")
+        st.dataframe(open_shops, use_container_width=True)
+        st.caption(
+            f"Cache budget {tenant_cache.max_bytes / 1e6:,.0f} MB · "
+            f"idle shops dropped after {tenant_cache.idle_seconds / 60:.0f} min · "
+            f"{tenant_cache.evictions} evicted so far"
+        )
+        st.markdown("---")
+
+    scheduler = get_scheduler()
+    if scheduler is None:
+        st.warning("⚠️ Scheduler is not running in this process")
+        return
+
+    # ---------------------------
+    # Jobs
+    # ---------------------------
+    st.subheader("⏱️ Scheduled Jobs")
+    for job in scheduler.jobs.values():
+        col1, col2, col3, col4, col5 = st.columns([2, 3, 2, 2, 1])
+        col1.write(f"**{job.name}**")
+        col2.caption(f"{job.description} · {job.trigger}")
+        col3.write(f"Last: {job.last_run:%Y-%m-%d %H:%M}" if job.last_run else "Last: never")
+        col4.write("⏳ running" if job.running else f"Next: {job.next_due:%Y-%m-%d %H:%M}")
+        col5.button(
+            "▶️ Run",
+            key=f"run_{job.name}",
+            disabled=job.running,
+            on_click=scheduler.run_now,
+            args=(job.name,)
+        )
+
+    # ---------------------------
+    # History
+    # ---------------------------
+    st.markdown("---")
+    st.subheader("📜 Run History")
+
+    runs = get_job_runs(limit=100)
+    if not runs:
+        st.info("No jobs have run yet")
+        return
+
+    df = pd.DataFrame(
+        runs,
+        columns=["Job", "Started", "Duration (ms)", "Status", "Detail", "Runner"]
+    )
+    st.dataframe(df, use_container_width=True)
@@ -4,14 +4,21 @@ import streamlit as st
 from barcode import Code128
 from barcode.writer import ImageWriter
 
+from database.changes import POLL_SECONDS, Subscription
 from database.tables import (
     init_db,
     barcode_exists,
     generate_barcode_number,
     add_product,
     get_products,
-    delete_product
+    get_products_by_ids,
+    delete_product,
+    set_reorder_level,
+    add_barcode_alias,
+    get_barcode_aliases,
+    remove_barcode_alias
 )
+from modules.stock_alerts import low_stock_panel
 
 # ---------------------------
 # Paths
@@ -20,6 +27,51 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 BARCODE_FOLDER = os.path.join(BASE_DIR, "barcodes")
 os.makedirs(BARCODE_FOLDER, exist_ok=True)
 
+# ---------------------------
+# Product rows
+# ---------------------------
+def _product_rows():
+    """{id: row} kept in the session; only rows the change feed names are re-read."""
+    feed = st.session_state.get("products_feed")
+    rows = st.session_state.get("products_rows")
+    changed = feed.poll() if feed else None
+    if rows is None or changed is None:
+        st.session_state.products_feed = Subscription("products")
+        rows = st.session_state.products_rows = {row[0]: row for row in get_products()}
+    elif changed:
+        ids = changed["products"]
+        fresh = {row[0]: row for row in get_products_by_ids(ids)}
+        for pid in ids:
+            if pid in fresh:
+                rows[pid] = fresh[pid]
+            else:
+                rows.pop(pid, None)  # deleted
+    return rows
+
+
+@st.fragment(run_every=POLL_SECONDS)
+def product_list():
+    products = list(_product_rows().values())
+    if not products:
+        st.info("No products added yet")
+        return
+
+    for pid, name, category, price, qty, barcode in products:
+        col1, col2, col3, col4, col5, col6 = st.columns([2, 2, 1, 1, 2, 1])
+        col1.write(name)
+        col2.write(category or "-")
+        col3.write(f"KSh {price}")
+        col4.write(qty)
+
+        barcode_path = os.path.join(BARCODE_FOLDER, f"{barcode}.png")
+        if os.path.exists(barcode_path):
+            col5.image(barcode_path, width=100)
+
+        if col6.button("🗑 Delete", key=f"del_{pid}"):
+            delete_product(pid)
+            st.rerun()  # refresh product list after delete
+
+
 # ---------------------------
 # Streamlit UI
 # ---------------------------
@@ -49,6 +101,8 @@ def product_ui():
             st.session_state.price = 0.0
         if "quantity" not in st.session_state:
             st.session_state.quantity = 0
+        if "reorder_level" not in st.session_state:
+            st.session_state.reorder_level = 5
         if "barcode" not in st.session_state:
             st.session_state.barcode = generate_barcode_number()
 
@@ -57,6 +111,13 @@ def product_ui():
             category = st.text_input("Category", key="category")
             price = st.number_input("Price (KSh)", min_value=0.0, format="%.2f", key="price")
             quantity = st.number_input("Quantity", min_value=0, step=1, key="quantity")
+            reorder_level = st.number_input(
+                "Reorder level",
+                min_value=0,
+                step=1,
+                key="reorder_level",
+                help="Alert when stock falls to this level"
+            )
             barcode = st.text_input(
                 "Barcode (editable)",
                 key="barcode",
@@ -80,7 +141,7 @@ def product_ui():
                         Code128(barcode, writer=ImageWriter()).write(f)
 
                     # add product to DB
-                    add_product(name, category, price, quantity, barcode)
+                    add_product(name, category, price, quantity, barcode, reorder_level)
                     st.success(f"✅ {name} added successfully")
                     st.image(barcode_path, width=220)
 
@@ -89,28 +150,70 @@ def product_ui():
 
     st.markdown("---")
 
+    # -------- Low Stock --------
+    low_stock_panel()
+
+    st.markdown("---")
+
     # -------- Product List --------
     st.subheader("📦 Current Products")
-    products = get_products()
-
+    product_list()
+    # the rows the fragment just polled for
+    products = list(st.session_state.products_rows.values())
     if not products:
-        st.info("No products added yet")
         return
 
-    for pid, name, category, price, qty, barcode in products:
-        col1, col2, col3, col4, col5, col6 = st.columns([2, 2, 1, 1, 2, 1])
-        col1.write(name)
-        col2.write(category or "-")
-        col3.write(f"KSh {price}")
-        col4.write(qty)
-
-        barcode_path = os.path.join(BARCODE_FOLDER, f"{barcode}.png")
-        if os.path.exists(barcode_path):
-            col5.image(barcode_path, width=100)
-
-        if col6.button("🗑 Delete", key=f"del_{pid}"):
-            delete_product(pid)
-            st.rerun()  # refresh product list after delete
+    # -------- Reorder Levels --------
+    with st.expander("⚙️ Set reorder level"):
+        names = {pid: name for pid, name, *_ in products}
+        selected = st.selectbox(
+            "Product",
+            list(names),
+            format_func=lambda pid: names[pid]
+        )
+        level = st.number_input("Alert at or below", min_value=0, step=1, value=5)
+        col1, col2 = st.columns(2)
+        if col1.button("💾 Save level"):
+            set_reorder_level(selected, level)
+            st.rerun()
+        if col2.button("🔕 Disable alerts"):
+            set_reorder_level(selected, None)
+            st.rerun()
+
+    # -------- Extra Barcodes / Packs --------
+    with st.expander("🔖 Extra barcodes & pack sizes"):
+        selected = st.selectbox(
+            "Product",
+            list(names),
+            format_func=lambda pid: names[pid],
+            key="alias_product"
+        )
+        col1, col2, col3 = st.columns([2, 1, 2])
+        alias = col1.text_input("Barcode", placeholder="Scan the carton or supplier code")
+        pack_qty = col2.number_input("Units per scan", min_value=1, step=1, value=1)
+        label = col3.text_input("Label", placeholder="e.g. Carton of 12")
+        if st.button("➕ Add barcode"):
+            alias = alias.strip()
+            if not re.match("^[A-Za-z0-9-]+$", alias):
+                st.error("❌ Barcode must be letters, numbers or dashes")
+            else:
+                try:
+                    add_barcode_alias(selected, alias, pack_qty, label.strip() or None)
+                except ValueError as e:
+                    st.error(f"❌ {e}")
+                else:
+                    st.success(f"✅ {alias} now sells {pack_qty} x {names[selected]}")
+
+        for alias, alias_qty, alias_label in get_barcode_aliases(selected):
+            col1, col2, col3 = st.columns([3, 3, 1])
+            col1.write(f"`{alias}`")
+            col2.write(f"{alias_qty} unit(s)" + (f" · {alias_label}" if alias_label else ""))
+            col3.button(
+                "🗑",
+                key=f"del_alias_{alias}",
+                on_click=remove_barcode_alias,
+                args=(alias,)
+            )
 
 # ---------------------------
 # Run UI
@@ -0,0 +1,139 @@
+import streamlit as st
+import pandas as pd
+from datetime import date, datetime, time
+
+from database.tables import get_products
+from database.pricing import (
+    TIME_FORMAT,
+    add_promotion,
+    end_promotion,
+    get_price_history,
+    get_promotions,
+    schedule_price
+)
+
+KINDS = {
+    "percent": "Percent off",
+    "buy_x_get_y": "Buy X get Y free",
+}
+
+
+def _window(col_start, col_end, key):
+    """Start/end date pickers; returns (starts_at, ends_at) as DB text."""
+    start = col_start.date_input("Starts", value=date.today(), key=f"{key}_start")
+    end = col_end.date_input("Ends (optional)", value=None, key=f"{key}_end")
+    starts_at = datetime.combine(start, time.min)
+    if start == date.today():
+        starts_at = datetime.now()
+    # an end date includes that whole day
+    ends_at = datetime.combine(end, time.max).replace(microsecond=0) if end else None
+    return (
+        starts_at.strftime(TIME_FORMAT),
+        ends_at.strftime(TIME_FORMAT) if ends_at else None
+    )
+
+
+# ---------------------------
+# Streamlit UI
+# ---------------------------
+def promotions_ui():
+    st.markdown(
+        "<h1 style='text-align:center;color:#E91E63;'>🏷️ Prices & Promotions</h1>",
+        unsafe_allow_html=True
+    )
+
+    products = get_products()
+    if not products:
+        st.info("No products added yet")
+        return
+    by_label = {f"{p[1]} ({p[5]})": p for p in products}
+    categories = sorted({p[2] for p in products if p[2]})
+
+    # ---------------------------
+    # New promotion
+    # ---------------------------
+    with st.expander("➕ New promotion"):
+        name = st.text_input("Promotion name", placeholder="e.g. Back to school 10% off")
+        kind = st.selectbox("Type", list(KINDS), format_func=KINDS.get)
+        target = st.radio("Applies to", ["Product", "Category"], horizontal=True)
+        if target == "Product":
+            product = by_label[st.selectbox("Product", list(by_label))]
+            category = None
+        else:
+            product = None
+            category = st.selectbox("Category", categories)
+
+        col1, col2 = st.columns(2)
+        percent_off = buy_qty = get_qty = None
+        if kind == "percent":
+            percent_off = col1.number_input("Percent off", min_value=1.0, max_value=99.0, value=10.0)
+        else:
+            buy_qty = col1.number_input("Buy", min_value=1, value=2, step=1)
+            get_qty = col2.number_input("Get free", min_value=1, value=1, step=1)
+
+        col1, col2 = st.columns(2)
+        starts_at, ends_at = _window(col1, col2, "promo")
+
+        if st.button("💾 Save promotion"):
+            try:
+                add_promotion(
+                    name.strip() or KINDS[kind],
+                    kind,
+                    starts_at,
+                    ends_at,
+                    product_id=product[0] if product else None,
+                    category=category,
+                    percent_off=percent_off,
+                    buy_qty=buy_qty,
+                    get_qty=get_qty
+                )
+            except ValueError as e:
+                st.error(f"❌ {e}")
+            else:
+                st.success("✅ Promotion saved")
+
+    # ---------------------------
+    # Scheduled price
+    # ---------------------------
+    with st.expander("📅 Schedule a price"):
+        product = by_label[st.selectbox("Product", list(by_label), key="sched_product")]
+        price = st.number_input("Price (KSh)", min_value=0.0, value=float(product[3]), step=1.0)
+        col1, col2 = st.columns(2)
+        starts_at, ends_at = _window(col1, col2, "sched")
+        note = st.text_input("Note", placeholder="e.g. Weekend price")
+
+        if st.button("💾 Save price"):
+            try:
+                schedule_price(product[0], price, starts_at, ends_at, note or None)
+            except ValueError as e:
+                st.error(f"❌ {e}")
+            else:
+                st.success("✅ Price scheduled")
+
+        history = get_price_history(product[0])
+        if history:
+            st.caption("Price history (newest first)")
+            st.dataframe(
+                pd.DataFrame(history, columns=["Price", "From", "Until", "Note"]),
+                use_container_width=True,
+                hide_index=True
+            )
+
+    # ---------------------------
+    # Live & upcoming
+    # ---------------------------
+    st.subheader("📋 Live & Upcoming Promotions")
+    promotions = get_promotions()
+    if not promotions:
+        st.info("No promotions running")
+        return
+
+    now = datetime.now().strftime(TIME_FORMAT)
+    for promo_id, name, kind, target, percent_off, buy_qty, get_qty, starts_at, ends_at, _ in promotions:
+        rule = f"{percent_off:g}% off" if kind == "percent" else f"buy {buy_qty} get {get_qty} free"
+        col1, col2, col3, col4 = st.columns([3, 3, 3, 1])
+        col1.write(f"**{name}**")
+        col2.write(f"{target} · {rule}")
+        status = "🟢 live" if starts_at <= now else f"⏳ from {starts_at[:16]}"
+        col3.write(status + (f" · until {ends_at[:16]}" if ends_at else ""))
+        col4.button("⏹️ End", key=f"end_promo_{promo_id}", on_click=end_promotion, args=(promo_id,))
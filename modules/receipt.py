@@ -1,22 +1,419 @@
 # receipt.py
+"""Receipt rendering: plain text, ESC/POS (58/80mm thermal) and PDF.
+
+A receipt is laid out once into lines tagged with a style, using a
+`ReceiptTemplate` whose column widths and row formats are compiled when
+the template is built (one per paper width, cached), and the layout is
+then written out by a backend:
+
+- `render_text`: for the text area and the WhatsApp link
+- `render_escpos`: bytes for a thermal printer (init, codepage, bold /
+  double-height title, partial cut); `send_to_printer` writes them to a
+  device, a file or a network printer (tcp://host:9100)
+- `render_pdf`: one page per receipt on a roll-width page, in the PDF
+  base fonts (no PDF library needed)
+
+`reprint` renders every receipt in a date range as one streaming job:
+sale lines are read from a cursor in receipt order and each receipt is
+written to `out` as soon as its last line has been read.
+
+Environment: DUKA_SHOP_NAME (receipt header; a hosted shop uses its own
+name), DUKA_RECEIPT_PAPER ("58mm" or "80mm") and DUKA_PRINTER (default
+printer target).
+"""
+
+import io
+import os
+import socket
+import textwrap
+from contextlib import contextmanager
 from datetime import datetime
+from functools import lru_cache
+
+from database.pricing import to_cents
+from database.tables import get_read_connection, to_sold_at
+from database.tenants import current_tenant
+
+DEFAULT_SHOP = "KIJANI AFRICA"
+# characters per line in the printer's standard font
+PAPER_COLUMNS = {"58mm": 32, "80mm": 48}
+PAPER_POINTS = {"58mm": 164.4, "80mm": 226.8}  # page width for PDF
+PDF_MARGIN = 8  # points
+
+
+# ---------------------------
+# Receipts
+# ---------------------------
+def receipt_from_cart(attendant, sold_items, receipt_no=None, when=None):
+    """A receipt dict from Cart.items() (or [{name, qty, price}] lines).
+
+        receipt_no, attendant, sold_at,
+        lines: [{name, qty, unit_cents, total_cents, discount_cents, promotion}]
+
+    unit_cents is the regular price; total_cents is after any promotion.
+    """
+    lines = []
+    for item in sold_items:
+        total = to_cents(item.get("total", item["qty"] * item["price"]))
+        discount = to_cents(item.get("discount") or 0)
+        lines.append({
+            "name": item["name"],
+            "qty": item["qty"],
+            "unit_cents": (total + discount) // item["qty"] if item["qty"] else 0,
+            "total_cents": total,
+            "discount_cents": discount,
+            "promotion": item.get("promotion"),
+        })
+    return {
+        "receipt_no": receipt_no,
+        "attendant": attendant,
+        "sold_at": when or datetime.now(),
+        "lines": lines,
+    }
+
+
+RECEIPT_LINES_SQL = """
+SELECT r.receipt_no, a.name, datetime(l.sold_at, 'unixepoch'), n.name,
+       l.quantity, l.price_cents, l.discount_cents, p.name
+FROM sale_lines l
+LEFT JOIN receipts r ON r.id = l.receipt_id
+LEFT JOIN attendants a ON a.id = l.attendant_id
+LEFT JOIN product_names n ON n.id = l.name_id
+LEFT JOIN promotions p ON p.id = l.promotion_id
+WHERE {where}
+ORDER BY l.sold_at, l.receipt_id, l.id
+"""
+
+
+def _group_receipts(cursor):
+    """Turn sale-line rows (in receipt order) into receipt dicts, lazily."""
+    receipt = None
+    for receipt_no, attendant, sold_at, name, qty, unit, discount, promotion in cursor:
+        if receipt is None or receipt["receipt_no"] != receipt_no:
+            if receipt is not None:
+                yield receipt
+            receipt = {
+                "receipt_no": receipt_no,
+                "attendant": attendant,
+                "sold_at": datetime.fromisoformat(sold_at),
+                "lines": [],
+            }
+        receipt["lines"].append({
+            "name": name,
+            "qty": qty,
+            "unit_cents": unit,
+            "total_cents": qty * unit - discount,
+            "discount_cents": discount,
+            "promotion": promotion if discount else None,
+        })
+    if receipt is not None:
+        yield receipt
+
+
+def iter_receipts(start, end, conn=None):
+    """Yield the receipts sold in [start, end) one at a time, oldest first."""
+    own_conn = conn is None
+    conn = conn or get_read_connection()
+    try:
+        cursor = conn.execute(
+            RECEIPT_LINES_SQL.format(where="l.sold_at >= ? AND l.sold_at < ?"),
+            (to_sold_at(start), to_sold_at(end))
+        )
+        yield from _group_receipts(cursor)
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def load_receipt(receipt_no, conn=None):
+    """One past receipt by number, or None."""
+    own_conn = conn is None
+    conn = conn or get_read_connection()
+    try:
+        cursor = conn.execute(
+            RECEIPT_LINES_SQL.format(
+                where="l.receipt_id = (SELECT id FROM receipts WHERE receipt_no = ?)"
+            ),
+            (receipt_no,)
+        )
+        return next(_group_receipts(cursor), None)
+    finally:
+        if own_conn:
+            conn.close()
+
+
+# ---------------------------
+# Templates
+# ---------------------------
+class ReceiptTemplate:
+    """Layout settings for one paper width, compiled into row formats.
+
+    header/footer: lines of text; "{shop}" is replaced by the shop name.
+    """
+
+    def __init__(self, paper="58mm", shop=None, header=("{shop}", "RECEIPT"),
+                 footer=("Thank you!",), currency="KSh"):
+        if paper not in PAPER_COLUMNS:
+            raise ValueError(f"Unknown paper {paper!r} (use {', '.join(PAPER_COLUMNS)})")
+        shop = shop or shop_name()
+        self.paper = paper
+        self.width = width = PAPER_COLUMNS[paper]
+        self.currency = currency
+
+        # item rows: name | qty | amount
+        self.qty_w = 4
+        self.amount_w = 10 if width < 40 else 12
+        self.name_w = width - self.qty_w - self.amount_w - 2
+        self.row = f"{{:<{self.name_w}}} {{:>{self.qty_w}}} {{:>{self.amount_w}}}"
+        self.detail = f"  {{:<{width - self.amount_w - 3}}} {{:>{self.amount_w}}}"
+        self.total = f"{{:<{width - self.amount_w - 5}}} {currency} {{:>{self.amount_w}}}"
+        self.field = "{}: {}"
+        self.rule = "-" * width
+        self.heading = self.row.format("Item", "Qty", "Amount")
+        self.header = [line.format(shop=shop) for line in header]
+        self.footer = list(footer)
+
+    def wrap(self, name):
+        return textwrap.wrap(name or "?", self.name_w) or [""]
+
+
+def shop_name():
+    tenant = current_tenant()
+    if tenant is not None:
+        return tenant.replace("-", " ").replace("_", " ").upper()
+    return os.environ.get("DUKA_SHOP_NAME") or DEFAULT_SHOP
+
+
+@lru_cache(maxsize=None)
+def _template(paper, shop):
+    return ReceiptTemplate(paper, shop)
+
+
+def get_template(paper=None):
+    """The default template for `paper` (DUKA_RECEIPT_PAPER, else 58mm), compiled once."""
+    return _template(paper or os.environ.get("DUKA_RECEIPT_PAPER") or "58mm", shop_name())
+
+
+def _money(cents):
+    return f"{cents / 100:,.2f}"
+
+
+def layout(receipt, template=None):
+    """The receipt as [(style, text)]; style is title, center, bold or text."""
+    t = template or get_template()
+    out = [("title", t.header[0])] if t.header else []
+    out += [("center", line) for line in t.header[1:]]
+    out.append(("text", t.rule))
+    if receipt.get("receipt_no"):
+        out.append(("text", t.field.format("Receipt", receipt["receipt_no"])))
+    out.append(("text", t.field.format("Attendant", receipt["attendant"] or "-")))
+    out.append(("text", t.field.format("Date", f"{receipt['sold_at']:%Y-%m-%d %H:%M}")))
+    out.append(("text", t.rule))
+    out.append(("bold", t.heading))
+
+    total = saved = 0
+    for line in receipt["lines"]:
+        first, *rest = t.wrap(line["name"])
+        gross = line["total_cents"] + line["discount_cents"]
+        out.append(("text", t.row.format(first, line["qty"], _money(gross))))
+        out += [("text", t.row.format(more, "", "")) for more in rest]
+        if line["qty"] != 1:
+            out.append(("text", t.detail.format(f"@ {_money(line['unit_cents'])}", "")))
+        if line["discount_cents"]:
+            promo = (line["promotion"] or "Discount")[:t.width - t.amount_w - 3]
+            out.append(("text", t.detail.format(promo, f"-{_money(line['discount_cents'])}")))
+        total += line["total_cents"]
+        saved += line["discount_cents"]
+
+    out.append(("text", t.rule))
+    out.append(("bold", t.total.format("TOTAL", _money(total))))
+    if saved:
+        out.append(("text", t.total.format("You saved", _money(saved))))
+    out.append(("text", t.rule))
+    out += [("center", line) for line in t.footer]
+    return [(style, text.rstrip()) for style, text in out]
+
+
+# ---------------------------
+# Backends
+# ---------------------------
+def render_text(receipt, template=None):
+    t = template or get_template()
+    return "\n".join(
+        text.center(t.width).rstrip() if style in ("title", "center") else text
+        for style, text in layout(receipt, t)
+    )
+
+
+ESC_INIT = b"\x1b@"
+ESC_CODEPAGE = b"\x1bt\x10"          # WPC1252
+ESC_ALIGN = {"left": b"\x1ba\x00", "center": b"\x1ba\x01"}
+ESC_BOLD = {True: b"\x1bE\x01", False: b"\x1bE\x00"}
+ESC_SIZE = {"normal": b"\x1d!\x00", "tall": b"\x1d!\x01"}
+ESC_FEED_CUT = b"\x1bd\x04\x1dVB\x00"  # feed 4 lines, partial cut
+
+
+def render_escpos(receipt, template=None):
+    """ESC/POS bytes for one receipt, ending with a cut."""
+    out = [ESC_INIT, ESC_CODEPAGE]
+    for style, text in layout(receipt, template):
+        centered = style in ("title", "center")
+        out.append(ESC_ALIGN["center" if centered else "left"])
+        if style == "title":
+            out += [ESC_BOLD[True], ESC_SIZE["tall"]]
+        elif style == "bold":
+            out.append(ESC_BOLD[True])
+        out.append(text.encode("cp1252", "replace") + b"\n")
+        if style in ("title", "bold"):
+            out += [ESC_BOLD[False], ESC_SIZE["normal"]]
+    out.append(ESC_FEED_CUT)
+    return b"".join(out)
+
+
+@contextmanager
+def open_printer(target=None):
+    """A binary file object writing to `target` (DUKA_PRINTER by default).
+
+    target: "tcp://host:port" for a network printer (raw port 9100), else
+    a device or file path (opened for append, so a file collects jobs).
+    """
+    target = target or os.environ.get("DUKA_PRINTER")
+    if not target:
+        raise RuntimeError("No printer configured (set DUKA_PRINTER)")
+    if target.startswith("tcp://"):
+        host, _, port = target[len("tcp://"):].partition(":")
+        with socket.create_connection((host, int(port or 9100)), timeout=10) as sock:
+            with sock.makefile("wb") as out:
+                yield out
+    else:
+        with open(target, "ab") as out:
+            yield out
+
+
+def send_to_printer(data, target=None):
+    """Write ESC/POS bytes to `target` (see open_printer)."""
+    with open_printer(target) as out:
+        out.write(data)
+
+
+class PdfWriter:
+    """Minimal streaming PDF: one roll-width page per receipt, Courier text.
+
+    Objects are written as pages are added; the page tree, xref table and
+    trailer follow in close(), so memory stays flat however many pages.
+    """
+
+    def __init__(self, out, template=None):
+        self.out = out
+        self.t = template or get_template()
+        self.page_w = PAPER_POINTS[self.t.paper]
+        # Courier glyphs are 0.6 em wide: fit the template's columns
+        self.size = round((self.page_w - 2 * PDF_MARGIN) / (0.6 * self.t.width), 2)
+        self.leading = round(self.size * 1.25, 2)
+        self.offsets = {}
+        self.pages = []
+        self.pos = 0
+        self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        self._object(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>")
+        self._object(4, b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier-Bold /Encoding /WinAnsiEncoding >>")
+        self.next_id = 5
+
+    def _write(self, data):
+        self.out.write(data)
+        self.pos += len(data)
+
+    def _object(self, num, body):
+        self.offsets[num] = self.pos
+        self._write(b"%d 0 obj\n" % num + body + b"\nendobj\n")
+
+    @staticmethod
+    def _escape(text):
+        data = text.encode("cp1252", "replace")
+        return data.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+    def add_page(self, lines):
+        """Add one receipt ([(style, text)] from layout()) as a page."""
+        height = 2 * PDF_MARGIN + self.leading * (len(lines) + 1)
+        ops = [b"BT", b"%.2f TL" % self.leading,
+               b"%.2f %.2f Td" % (PDF_MARGIN, height - PDF_MARGIN - self.size)]
+        for style, text in lines:
+            if style in ("title", "center"):
+                text = text.center(self.t.width)
+            font = b"/F2" if style in ("title", "bold") else b"/F1"
+            ops.append(b"%s %.2f Tf (%s) Tj T*" % (font, self.size, self._escape(text)))
+        ops.append(b"ET")
+        stream = b"\n".join(ops)
+
+        content, page = self.next_id, self.next_id + 1
+        self.next_id += 2
+        self._object(content, b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        self._object(page, (
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %.2f %.2f] "
+            b"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents %d 0 R >>"
+        ) % (self.page_w, height, content))
+        self.pages.append(page)
+
+    def close(self):
+        kids = b" ".join(b"%d 0 R" % p for p in self.pages)
+        self._object(2, b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(self.pages)))
+        self._object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        xref = self.pos
+        count = self.next_id
+        self._write(b"xref\n0 %d\n0000000000 65535 f \n" % count)
+        for num in range(1, count):
+            self._write(b"%010d 00000 n \n" % self.offsets[num])
+        self._write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (count, xref))
+
+
+def render_pdf(receipts, out=None, template=None):
+    """Write `receipts` (a dict or an iterable of dicts) as a PDF.
+
+    Returns the PDF bytes when `out` is None, else the number of pages
+    written to the binary file object `out`.
+    """
+    if isinstance(receipts, dict):
+        receipts = [receipts]
+    buffer = io.BytesIO() if out is None else None
+    writer = PdfWriter(out or buffer, template)
+    for receipt in receipts:
+        writer.add_page(layout(receipt, writer.t))
+    writer.close()
+    return buffer.getvalue() if buffer is not None else len(writer.pages)
+
+
+# ---------------------------
+# Batch reprint
+# ---------------------------
+REPRINT_FORMATS = ("escpos", "pdf", "text")
+
+
+def reprint(start, end, fmt, out, template=None, conn=None):
+    """Render every receipt sold in [start, end) to the binary file `out`.
+
+    fmt: "escpos" (one print job, cut between receipts), "pdf" (a page
+    each) or "text" (separated by blank lines). Returns the receipt count.
+    An unknown fmt raises ValueError before anything is read or written.
+    """
+    if fmt not in REPRINT_FORMATS:
+        raise ValueError(f"Unknown receipt format {fmt!r}")
+    receipts = iter_receipts(start, end, conn)
+    if fmt == "pdf":
+        return render_pdf(receipts, out, template)
+
+    count = 0
+    for receipt in receipts:
+        if fmt == "escpos":
+            out.write(render_escpos(receipt, template))
+        else:
+            out.write(render_text(receipt, template).encode("utf-8") + b"\n\n\n")
+        count += 1
+    return count
+
 
 def generate_receipt(attendant, sold_items):
     """
-    sold_items: list of dicts [{name, qty, price}]
+    sold_items: list of dicts [{name, qty, price}], optionally with
+    total/promotion/discount from Cart.items()
     Returns: formatted receipt string
     """
-    total_amount = 0
-    receipt_text = (
-        f"🧾 KIJANI AFRICA RECEIPT\n"
-        f"Attendant: {attendant}\n"
-        f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
-    )
-    
-    for item in sold_items:
-        line_total = item['qty'] * item['price']
-        total_amount += line_total
-        receipt_text += f"{item['name']} - Qty: {item['qty']} - Price: KSh {item['price']} - Total: KSh {line_total}\n"
-    
-    receipt_text += f"\nTOTAL: KSh {total_amount}\n-------------------------\nThank you 🙏"
-    return receipt_text
+    return render_text(receipt_from_cart(attendant, sold_items))
@@ -0,0 +1,383 @@
+# report_engine.py
+import sqlite3
+import threading
+import time
+from datetime import date, timedelta
+
+import pandas as pd
+import pyarrow as pa
+
+from database.frames import STRING, cursor_arrow
+from database.tables import current_db_path, get_read_connection, to_sold_at
+from database.tenants import current_tenant, tenant_cache
+
+SNAPSHOT_MAX_AGE = 300  # seconds an in-memory snapshot may lag the DB
+# what REPORT_SQL reads: sale lines plus the tables their ids point into
+SNAPSHOT_TABLES = ("sale_lines", "attendants", "product_names", "promotions")
+
+COMPARISONS = {
+    "none": "No comparison",
+    "previous_period": "Previous period",
+    "previous_week": "Same days last week",
+    "last_year": "Same dates last year",
+}
+
+
+# ---------------------------
+# Date ranges
+# ---------------------------
+def _shift_year(d, years):
+    try:
+        return d.replace(year=d.year + years)
+    except ValueError:  # 29 Feb
+        return d.replace(year=d.year + years, day=28)
+
+
+def comparison_range(start, end, mode):
+    """Return the (start, end) to compare [start, end] against, or None."""
+    if mode == "previous_period":
+        length = (end - start).days + 1
+        return start - timedelta(days=length), start - timedelta(days=1)
+    if mode == "previous_week":
+        return start - timedelta(days=7), end - timedelta(days=7)
+    if mode == "last_year":
+        return _shift_year(start, -1), _shift_year(end, -1)
+    return None
+
+
+def _bounds(start, end):
+    """Inclusive dates -> half-open sold_at bounds (index-friendly)."""
+    return to_sold_at(start), to_sold_at(end + timedelta(days=1))
+
+
+# ---------------------------
+# Engine
+# ---------------------------
+# One statement, one pass: the rows of both periods are read once through
+# the sold_at index and materialised, and every breakdown is a GROUP BY
+# over that set (SQLite has no GROUPING SETS, so the sets are UNION ALL
+# arms). The scan and the grouping work on integer ids and cents from
+# sale_lines; names are looked up once per group, and joined in only
+# for the sale lines themselves.
+# Window functions add each product's share and the running total.
+# The sale lines come last, so run_report reads the few breakdown rows as
+# tuples and streams the rest of the cursor into Arrow batches.
+REPORT_SQL = """
+WITH f AS MATERIALIZED (
+    SELECT 'current' AS period,
+           product_id, name_id, attendant_id, promotion_id, quantity,
+           price_cents, quantity * price_cents - discount_cents AS total_cents,
+           discount_cents, sold_at, sold_at / 86400 AS day, receipt_id
+    FROM sale_lines
+    WHERE sold_at >= :cs AND sold_at < :ce
+    UNION ALL
+    SELECT 'previous',
+           product_id, name_id, attendant_id, promotion_id, quantity,
+           price_cents, quantity * price_cents - discount_cents,
+           discount_cents, sold_at, sold_at / 86400, receipt_id
+    FROM sale_lines
+    WHERE sold_at >= :ps AND sold_at < :pe
+)
+SELECT * FROM (
+SELECT 'summary' AS kind, period, NULL AS label, NULL AS attendant, NULL AS sale_date,
+       COUNT(DISTINCT receipt_id) AS txns, SUM(quantity) AS qty, NULL AS price,
+       SUM(total_cents) / 100.0 AS total, COUNT(*) AS extra
+FROM f GROUP BY period
+
+UNION ALL
+SELECT 'attendant', period, (SELECT name FROM attendants WHERE id = attendant_id), NULL, NULL,
+       COUNT(DISTINCT receipt_id), SUM(quantity), NULL, SUM(total_cents) / 100.0, COUNT(*)
+FROM f GROUP BY period, attendant_id
+
+UNION ALL
+SELECT 'product', period, (SELECT name FROM product_names WHERE id = name_id), NULL, NULL,
+       txns, qty, NULL, total_cents / 100.0,
+       total_cents * 1.0 / SUM(total_cents) OVER (PARTITION BY period)
+FROM (
+    SELECT period, MAX(name_id) AS name_id, COUNT(DISTINCT receipt_id) AS txns,
+           SUM(quantity) AS qty, SUM(total_cents) AS total_cents
+    FROM f GROUP BY period, product_id
+)
+
+UNION ALL
+SELECT 'day', period, date(day * 86400, 'unixepoch'), NULL, NULL,
+       COUNT(DISTINCT receipt_id), SUM(quantity), NULL, SUM(total_cents) / 100.0,
+       SUM(SUM(total_cents)) OVER (PARTITION BY period ORDER BY day) / 100.0
+FROM f GROUP BY period, day
+
+UNION ALL
+SELECT 'promotion', period, (SELECT name FROM promotions WHERE id = promotion_id), NULL, NULL,
+       COUNT(DISTINCT receipt_id), SUM(quantity), NULL, SUM(total_cents) / 100.0,
+       SUM(discount_cents) / 100.0
+FROM f WHERE promotion_id IS NOT NULL GROUP BY period, promotion_id
+
+UNION ALL
+SELECT 'line', period, n.name, a.name, sold_at,
+       NULL, quantity, price_cents / 100.0, total_cents / 100.0, NULL
+FROM f
+LEFT JOIN product_names n ON n.id = f.name_id
+LEFT JOIN attendants a ON a.id = f.attendant_id
+WHERE period = 'current' AND :rows
+)
+ORDER BY kind = 'line', kind, sale_date
+"""
+
+EMPTY_SUMMARY = {"transactions": 0, "lines": 0, "items": 0, "revenue": 0}
+
+# REPORT_SQL column -> Sales List column for the 'line' rows, and their
+# Arrow types: names as dictionary strings, sold_at as a timestamp.
+LINE_COLUMNS = {
+    "label": "Product",
+    "qty": "Qty",
+    "price": "Price",
+    "total": "Total",
+    "attendant": "Attendant",
+    "sale_date": "Sale Date",
+}
+LINE_TYPES = {
+    "label": STRING,
+    "qty": pa.int64(),
+    "price": pa.float64(),
+    "total": pa.float64(),
+    "attendant": STRING,
+    "sale_date": pa.timestamp("s"),
+}
+
+
+def _read_report(cursor):
+    """([breakdown rows as tuples], Sales List DataFrame) from a REPORT_SQL cursor."""
+    rows, head = [], []
+    for row in cursor:
+        if row[0] == "line":
+            head = [row]
+            break
+        rows.append(row)
+    lines = cursor_arrow(cursor, LINE_TYPES, head=head)
+    lines = lines.select(list(LINE_COLUMNS)).rename_columns(list(LINE_COLUMNS.values()))
+    return rows, lines.to_pandas(types_mapper=pd.ArrowDtype)
+
+
+def _pct_change(current, previous):
+    if not previous:
+        return None
+    return (current - previous) * 100.0 / previous
+
+
+def run_report(start, end, compare="none", include_rows=True, conn=None):
+    """Build a sales report for the inclusive date range [start, end].
+
+    compare: one of COMPARISONS. Returns a dict:
+        range, compare_range,
+        summary: {current, previous, change}   (change is % per metric)
+        by_attendant / by_product / by_day / by_promotion:
+            {current: [...], previous: [...]}
+        rows: current-period sale lines as a DataFrame with pyarrow
+            dtypes (LINE_TYPES), streamed from the same statement; empty
+            unless include_rows
+
+    Runs on a fresh read-only connection unless `conn` is given; pass
+    `report_snapshot()` to query the in-memory copy instead.
+    """
+    if end < start:
+        raise ValueError("End date is before start date")
+
+    prev = comparison_range(start, end, compare)
+    cs, ce = _bounds(start, end)
+    # an empty range when there's no comparison
+    ps, pe = _bounds(*prev) if prev else (0, 0)
+
+    params = {"cs": cs, "ce": ce, "ps": ps, "pe": pe, "rows": int(include_rows)}
+    if isinstance(conn, ReportSnapshot):
+        rows, lines = conn._run(lambda mem: _read_report(mem.execute(REPORT_SQL, params)))
+    else:
+        own_conn = conn is None
+        conn = conn or get_read_connection()
+        try:
+            rows, lines = _read_report(conn.execute(REPORT_SQL, params))
+        finally:
+            if own_conn:
+                conn.close()
+
+    result = {
+        "range": (start, end),
+        "compare_range": prev,
+        "summary": {"current": dict(EMPTY_SUMMARY), "previous": dict(EMPTY_SUMMARY)},
+        "by_attendant": {"current": [], "previous": []},
+        "by_product": {"current": [], "previous": []},
+        "by_day": {"current": [], "previous": []},
+        "by_promotion": {"current": [], "previous": []},
+        "rows": lines,
+    }
+
+    for kind, period, label, attendant, sale_date, txns, qty, price, total, extra in rows:
+        if kind == "summary":
+            result["summary"][period] = {
+                "transactions": txns, "lines": extra, "items": qty, "revenue": total
+            }
+        elif kind == "attendant":
+            result["by_attendant"][period].append({
+                "attendant": label, "transactions": txns, "items": qty, "revenue": total
+            })
+        elif kind == "product":
+            result["by_product"][period].append({
+                "product": label, "transactions": txns, "items": qty,
+                "revenue": total, "share": extra
+            })
+        elif kind == "day":
+            result["by_day"][period].append({
+                "day": label, "transactions": txns, "items": qty,
+                "revenue": total, "running_total": extra
+            })
+        else:
+            result["by_promotion"][period].append({
+                "promotion": label, "transactions": txns, "items": qty,
+                "revenue": total, "discount": extra
+            })
+
+    for key in ("by_attendant", "by_product", "by_promotion"):
+        for period in ("current", "previous"):
+            result[key][period].sort(key=lambda r: r["revenue"], reverse=True)
+
+    current, previous = result["summary"]["current"], result["summary"]["previous"]
+    result["summary"]["change"] = {
+        k: _pct_change(current[k], previous[k]) for k in current
+    } if prev else {}
+    return result
+
+
+def preset_range(preset, today=None):
+    """Common ranges for the UI: today, this_week, this_month, last_30_days."""
+    today = today or date.today()
+    if preset == "this_week":
+        return today - timedelta(days=today.weekday()), today
+    if preset == "this_month":
+        return today.replace(day=1), today
+    if preset == "last_30_days":
+        return today - timedelta(days=29), today
+    return today, today
+
+
+# ---------------------------
+# In-memory snapshot
+# ---------------------------
+class ReportSnapshot:
+    """An in-memory copy of the sales tables for heavy reports.
+
+    Reports against the snapshot never touch stock.db, so they can't slow
+    a checkout no matter how long they run. The copy is rebuilt when it is
+    older than `max_age` seconds and a product or sale has changed since
+    (the change_log sequence moved); the rebuild reads the file once on a
+    read-only connection and swaps the new copy in.
+
+    A snapshot belongs to one DB file (the current shop's by default).
+    """
+
+    def __init__(self, max_age=SNAPSHOT_MAX_AGE, db_path=None):
+        self.db_path = db_path or current_db_path()
+        self.max_age = max_age
+        self.conn = None
+        self.version = None
+        self.loaded_at = 0.0
+        self.rows = 0
+        self.nbytes = 0                       # size of the copy, for the tenant cache
+        self.in_use = 0                       # queries running, for the tenant cache
+        self.lock = threading.Lock()          # guards conn while querying
+        self.refresh_lock = threading.Lock()  # one reload at a time
+        self.use_lock = threading.Lock()      # guards in_use
+
+    def _change_version(self):
+        conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+        try:
+            row = conn.execute(
+                "SELECT seq FROM sqlite_sequence WHERE name = 'change_log'"
+            ).fetchone()
+            return row[0] if row else 0
+        finally:
+            conn.close()
+
+    def _load(self, version):
+        # uri=True so the ATTACH below honours mode=ro
+        mem = sqlite3.connect(":memory:", uri=True, check_same_thread=False)
+        mem.execute(
+            "ATTACH DATABASE ? AS disk",
+            (f"file:{self.db_path}?mode=ro",)
+        )
+        for table in SNAPSHOT_TABLES:
+            mem.execute(f"CREATE TABLE {table} AS SELECT * FROM disk.{table}")
+        mem.execute("DETACH DATABASE disk")
+        mem.execute("CREATE UNIQUE INDEX idx_attendants_id ON attendants(id)")
+        mem.execute("CREATE UNIQUE INDEX idx_product_names_id ON product_names(id)")
+        mem.execute("CREATE UNIQUE INDEX idx_promotions_id ON promotions(id)")
+        mem.execute("CREATE INDEX idx_sale_lines_sold_at ON sale_lines(sold_at)")
+        mem.execute("ANALYZE")
+        rows = mem.execute("SELECT COUNT(*) FROM sale_lines").fetchone()[0]
+        nbytes = (mem.execute("PRAGMA page_count").fetchone()[0]
+                  * mem.execute("PRAGMA page_size").fetchone()[0])
+
+        with self.lock:
+            old, self.conn = self.conn, mem
+            self.version, self.loaded_at, self.rows = version, time.time(), rows
+            self.nbytes = nbytes
+        if old is not None:
+            old.close()
+
+    def refresh(self, force=False):
+        """Reload if stale; returns True if a new copy was loaded."""
+        if not force and self.conn is not None and self.age < self.max_age:
+            return False
+        with self.refresh_lock:
+            if not force and self.conn is not None and self.age < self.max_age:
+                return False  # another thread just reloaded
+            version = self._change_version()
+            if not force and self.conn is not None and version == self.version:
+                # nothing changed: just restart the clock
+                self.loaded_at = time.time()
+                return False
+            self._load(version)
+            return True
+
+    @property
+    def age(self):
+        return time.time() - self.loaded_at
+
+    def close(self):
+        """Free the copy; the next query loads a new one."""
+        with self.lock:
+            old, self.conn, self.nbytes = self.conn, None, 0
+        if old is not None:
+            old.close()
+
+    def _run(self, query):
+        # counted so tenant_cache won't evict (and close) the copy mid-query
+        with self.use_lock:
+            self.in_use += 1
+        try:
+            while True:
+                self.refresh()
+                with self.lock:
+                    if self.conn is not None:  # None if closed since the refresh
+                        return query(self.conn)
+        finally:
+            with self.use_lock:
+                self.in_use -= 1
+
+    def execute(self, sql, params=()):
+        """Run a query against the snapshot and return all rows."""
+        return self._run(lambda conn: conn.execute(sql, params).fetchall())
+
+
+_snapshot_lock = threading.Lock()
+
+
+def report_snapshot():
+    """The current shop's ReportSnapshot (created on first use).
+
+    Kept in the shop's slot of `tenant_cache`, so an idle shop's copy is
+    freed with the rest of its state.
+    """
+    tenant, path = current_tenant(), current_db_path()
+    with _snapshot_lock:
+        snapshot = tenant_cache.get(tenant, path, "report_snapshot")
+        if snapshot is None:
+            snapshot = tenant_cache.put(tenant, path, "report_snapshot", ReportSnapshot(db_path=path))
+    return snapshot
@@ -1,110 +1,57 @@
-import sqlite3
+import io
 import streamlit as st
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 import pandas as pd
 
-DB_PATH = "database/stock.db"
+from database.changes import POLL_SECONDS, Subscription
+from database.tables import get_read_connection, get_sales_summary
+from modules.report_engine import (
+    COMPARISONS,
+    preset_range,
+    report_snapshot,
+    run_report
+)
+from modules.receipt import reprint
+from utils.visitor_db import get_login_summary
 
-# ---------------------------
-# Database helpers
-# ---------------------------
-def get_connection():
-    return sqlite3.connect(DB_PATH, check_same_thread=False)
-
-def get_sales(filter_type, selected_date):
-    """
-    Fetch sales from the database.
-    filter_type: "daily" or "monthly"
-    selected_date: datetime.date object
-    """
-    conn = get_connection()
-    c = conn.cursor()
-
-    if filter_type == "daily":
-        query_date = selected_date.strftime("%Y-%m-%d")
-        sql_filter = "DATE(sale_date) = ?"
-        param = query_date
-
-    elif filter_type == "monthly":
-        query_date = selected_date.strftime("%Y-%m")
-        sql_filter = "strftime('%Y-%m', sale_date) = ?"
-        param = query_date
-
-    else:
-        conn.close()
-        return []
+PRESETS = {
+    "Today": "today",
+    "This week": "this_week",
+    "This month": "this_month",
+    "Last 30 days": "last_30_days",
+    "Custom": "custom",
+}
 
-    c.execute(f"""
-        SELECT product_name, quantity, price, total, attendant, sale_date
-        FROM sales
-        WHERE {sql_filter}
-        ORDER BY sale_date ASC
-    """, (param,))
 
-    rows = c.fetchall()
-    conn.close()
-    return rows
-
-
-def get_summary(filter_type, selected_date):
-    conn = get_connection()
-    c = conn.cursor()
-
-    if filter_type == "daily":
-        query_date = selected_date.strftime("%Y-%m-%d")
-        sql_filter = "DATE(sale_date) = ?"
-        param = query_date
-
-    elif filter_type == "monthly":
-        query_date = selected_date.strftime("%Y-%m")
-        sql_filter = "strftime('%Y-%m', sale_date) = ?"
-        param = query_date
-
-    else:
-        conn.close()
-        return (0, 0, 0)
-
-    c.execute(f"""
-        SELECT COUNT(*), IFNULL(SUM(quantity),0), IFNULL(SUM(total),0)
-        FROM sales
-        WHERE {sql_filter}
-    """, (param,))
-
-    summary = c.fetchone()
-    conn.close()
-    return summary
-
-
-def get_sales_by_attendant(filter_type, selected_date):
-    conn = get_connection()
-    c = conn.cursor()
-
-    if filter_type == "daily":
-        query_date = selected_date.strftime("%Y-%m-%d")
-        sql_filter = "DATE(sale_date) = ?"
-        param = query_date
-
-    else:
-        query_date = selected_date.strftime("%Y-%m")
-        sql_filter = "strftime('%Y-%m', sale_date) = ?"
-        param = query_date
-
-    c.execute(f"""
-        SELECT attendant, COUNT(*), SUM(total)
-        FROM sales
-        WHERE {sql_filter}
-        GROUP BY attendant
-        ORDER BY SUM(total) DESC
-    """, (param,))
-
-    rows = c.fetchall()
-    conn.close()
-    return rows
+def _delta(change, key):
+    pct = change.get(key)
+    return None if pct is None else f"{pct:+.1f}%"
 
 
 # ---------------------------
 # Streamlit UI
 # ---------------------------
+@st.fragment(run_every=POLL_SECONDS)
+def today_tiles():
+    """Today's totals, re-queried only when a sale has been made since."""
+    feed = st.session_state.get("today_feed")
+    changed = feed.poll() if feed else None
+    if changed != {} or st.session_state.get("today_day") != date.today():
+        st.session_state.today_feed = feed or Subscription("sales")
+        st.session_state.today_day = date.today()
+        conn = get_read_connection()
+        try:
+            st.session_state.today_summary = get_sales_summary(conn=conn)
+        finally:
+            conn.close()
+
+    today_count, today_qty, today_total = st.session_state.today_summary
+    col1, col2, col3 = st.columns(3)
+    col1.metric("📆 Today Transactions", today_count)
+    col2.metric("📦 Items Sold Today", today_qty)
+    col3.metric("💰 Today Sales (KSh)", today_total)
+
+
 def reports_ui():
     st.markdown(
         "<h1 style='text-align:center;color:#2196F3;'>📊 Sales Reports</h1>",
@@ -113,72 +60,145 @@ def reports_ui():
 
     # --- Quick Today Summary ---
     today = date.today()
-    today_count, today_qty, today_total = get_summary("daily", today)
-
-    col1, col2, col3 = st.columns(3)
-    col1.metric("📆 Today Transactions", today_count)
-    col2.metric("📦 Items Sold Today", today_qty)
-    col3.metric("💰 Today Sales (KSh)", today_total)
+    today_tiles()
 
     st.markdown("---")
 
-    report_type = st.radio("Report type", ["Daily", "Monthly"])
+    # ---------------------------
+    # Range & comparison
+    # ---------------------------
+    col1, col2 = st.columns([3, 2])
+    preset = PRESETS[col1.radio("Period", list(PRESETS), horizontal=True)]
+    compare = col2.selectbox(
+        "Compare with",
+        list(COMPARISONS),
+        format_func=COMPARISONS.get
+    )
 
-    if report_type == "Daily":
-        selected_date = st.date_input("Select date", value=today)
-        filter_type = "daily"
+    if preset == "custom":
+        picked = st.date_input("Date range", value=(today - timedelta(days=6), today))
+        if len(picked) != 2:
+            st.info("Pick a start and an end date")
+            return
+        start, end = picked
     else:
-        selected_date = st.date_input("Select month", value=today)
-        filter_type = "monthly"
+        start, end = preset_range(preset, today)
 
-    sales = get_sales(filter_type, selected_date)
-    summary = get_summary(filter_type, selected_date)
+    # long ranges can run against an in-memory copy so they never touch
+    # the file the tills are writing to
+    use_snapshot = st.toggle(
+        "⚡ Fast mode (in-memory copy, refreshed every few minutes)",
+        value=(end - start).days >= 28
+    )
+    source = report_snapshot() if use_snapshot else None
+    report = run_report(start, end, compare, conn=source)
+    if use_snapshot:
+        st.caption(f"Snapshot of {source.rows:,} sale lines, {int(source.age // 60)} min old")
+    current = report["summary"]["current"]
+    change = report["summary"]["change"]
+
+    st.caption(
+        f"{start:%d %b %Y} – {end:%d %b %Y}"
+        + (f" vs {report['compare_range'][0]:%d %b %Y} – {report['compare_range'][1]:%d %b %Y}"
+           if report["compare_range"] else "")
+    )
 
     st.markdown("---")
 
-    if not sales:
+    if not current["lines"]:
         st.info("No sales recorded for this selection")
         return
 
+    # ---------------------------
+    # Summary
+    # ---------------------------
+    st.subheader("📌 Summary")
+    col1, col2, col3 = st.columns(3)
+    col1.metric("🛒 Transactions", current["transactions"], _delta(change, "transactions"))
+    col2.metric("📦 Items Sold", current["items"], _delta(change, "items"))
+    col3.metric("💰 Total Sales (KSh)", f"{current['revenue']:,.2f}", _delta(change, "revenue"))
+
+    # ---------------------------
+    # Sales by Day
+    # ---------------------------
+    if len(report["by_day"]["current"]) > 1:
+        st.subheader("📈 Sales by Day")
+        day_df = pd.DataFrame(report["by_day"]["current"]).set_index("day")
+        st.line_chart(day_df[["revenue", "running_total"]])
+
     # ---------------------------
     # Sales List
     # ---------------------------
     st.subheader("🧾 Sales List")
 
-    df = pd.DataFrame(
-        sales,
-        columns=["Product", "Qty", "Price", "Total", "Attendant", "Sale Date"]
-    )
+    # typed Arrow columns, built from the report's own pass
+    df = report["rows"]
 
     st.dataframe(df, use_container_width=True)
 
     # ---------------------------
-    # Summary
+    # Sales by Attendant / Product
     # ---------------------------
-    count, total_qty, total_amount = summary
+    st.markdown("---")
+    col1, col2 = st.columns(2)
 
-    st.subheader("📌 Summary")
-    col1, col2, col3 = st.columns(3)
-    col1.success(f"🛒 Transactions: {count}")
-    col2.success(f"📦 Items Sold: {total_qty}")
-    col3.success(f"💰 Total Sales: KSh {total_amount}")
+    col1.subheader("👤 Sales by Attendant")
+    att_df = pd.DataFrame(report["by_attendant"]["current"])
+    att_df.columns = ["Attendant", "Transactions", "Items", "Total Sales"]
+    col1.dataframe(att_df, use_container_width=True)
+
+    col2.subheader("🧦 Sales by Product")
+    prod_df = pd.DataFrame(report["by_product"]["current"])
+    prod_df["share"] = (prod_df["share"] * 100).round(1)
+    prod_df.columns = ["Product", "Transactions", "Items", "Total Sales", "Share %"]
+    col2.dataframe(prod_df, use_container_width=True)
 
     # ---------------------------
-    # Sales by Attendant
+    # Promotions
     # ---------------------------
-    st.markdown("---")
-    st.subheader("👤 Sales by Attendant")
+    if report["by_promotion"]["current"]:
+        st.subheader("🏷️ Promotions")
+        promo_df = pd.DataFrame(report["by_promotion"]["current"])
+        promo_df.columns = ["Promotion", "Transactions", "Items", "Total Sales", "Discount Given"]
+        st.dataframe(promo_df, use_container_width=True, hide_index=True)
 
-    attendants = get_sales_by_attendant(filter_type, selected_date)
-
-    if attendants:
-        att_df = pd.DataFrame(
-            attendants,
-            columns=["Attendant", "Transactions", "Total Sales"]
+    # ---------------------------
+    # Staff activity
+    # ---------------------------
+    with st.expander("🕒 Staff logins"):
+        logins = get_login_summary(
+            datetime.combine(start, datetime.min.time()),
+            datetime.combine(end + timedelta(days=1), datetime.min.time())
         )
-        st.dataframe(att_df, use_container_width=True)
-    else:
-        st.info("No attendant data available")
+        if logins:
+            st.dataframe(pd.DataFrame(logins), use_container_width=True)
+        else:
+            st.info("No logins recorded for this selection")
+
+    # ---------------------------
+    # Receipt reprint
+    # ---------------------------
+    with st.expander("🖨️ Reprint receipts"):
+        col1, col2 = st.columns(2)
+        reprint_day = col1.date_input("Day", value=end, key="reprint_day")
+        formats = {"PDF": ("pdf", "application/pdf"),
+                   "ESC/POS (thermal)": ("escpos", "application/octet-stream"),
+                   "Text": ("text", "text/plain")}
+        fmt_label = col2.selectbox("Format", list(formats), key="reprint_format")
+        fmt, mime = formats[fmt_label]
+        if st.button("Prepare reprint"):
+            out = io.BytesIO()
+            count = reprint(reprint_day, reprint_day + timedelta(days=1), fmt, out)
+            if count:
+                ext = {"pdf": "pdf", "escpos": "bin", "text": "txt"}[fmt]
+                st.download_button(
+                    f"⬇️ {count} receipts",
+                    data=out.getvalue(),
+                    file_name=f"receipts_{reprint_day:%Y%m%d}.{ext}",
+                    mime=mime
+                )
+            else:
+                st.info("No receipts on that day")
 
     # ---------------------------
     # Export
@@ -187,7 +207,7 @@ def reports_ui():
     st.subheader("📤 Export Report")
 
     csv = df.to_csv(index=False).encode("utf-8")
-    filename = f"sales_report_{filter_type}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+    filename = f"sales_report_{start:%Y%m%d}_{end:%Y%m%d}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
 
     st.download_button(
         label="⬇️ Download CSV",
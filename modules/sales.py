@@ -1,15 +1,28 @@
 import streamlit as st
 from datetime import datetime
+import os
 import urllib.parse
 import base64
 
 from database.tables import (
     init_db,
     get_product_by_barcode,
-    update_stock,
-    record_sale
+    get_products_by_ids,
+    checkout,
+    get_active_cart,
+    get_held_carts
 )
-from modules.receipt import generate_receipt
+from database.changes import POLL_SECONDS, Subscription
+from database.pricing import get_price_book
+from modules.cart import Cart, from_cents
+from modules.receipt import (
+    receipt_from_cart,
+    render_escpos,
+    render_pdf,
+    render_text,
+    send_to_printer
+)
+from utils.visitor_db import record_event
 
 
 # ---------------------------
@@ -25,13 +38,59 @@ def play_beep():
 
 
 def reset_cart_and_receipt():
-    st.session_state.cart = []
+    st.session_state.cart.clear()
+    st.session_state.cart.autosave(st.session_state.attendant)
     st.session_state.last_receipt = ""
     st.session_state.ui_refresh = datetime.now()
 
 
-def remove_from_cart(idx):
-    st.session_state.cart.pop(idx)
+@st.fragment(run_every=POLL_SECONDS)
+def cart_stock_watch():
+    """Warn when another till sells what's in this basket (only changed rows are re-read)."""
+    cart = st.session_state.cart
+    feed = st.session_state.get("cart_feed")
+    changed = feed.poll() if feed else None
+    if changed is None:
+        st.session_state.cart_feed = feed or Subscription("products")
+        ids = list(cart.lines)
+    else:
+        ids = [pid for pid in changed.get("products", ()) if pid in cart]
+    if not ids:
+        short = [line for line in cart.lines.values() if line["qty"] > line["stock"]]
+    else:
+        levels = dict.fromkeys(ids, 0)  # a deleted product has none left
+        levels.update((pid, qty) for pid, _, _, _, qty, _ in get_products_by_ids(ids))
+        short = cart.update_stock(levels)
+    for line in short:
+        st.warning(
+            f"⚠️ Only {line['stock']} × {line['name']} left in stock "
+            f"(basket has {line['qty']})"
+        )
+
+
+def remove_from_cart(product_id):
+    st.session_state.cart.remove(product_id)
+    st.session_state.cart.autosave(st.session_state.attendant)
+    st.session_state.ui_refresh = datetime.now()
+
+
+def hold_current_cart(label):
+    cart = st.session_state.cart
+    cart.hold(st.session_state.attendant, label or f"Customer {datetime.now():%H:%M}")
+    st.session_state.last_receipt = ""
+    st.session_state.ui_refresh = datetime.now()
+
+
+def resume_cart(held_id):
+    cart = Cart.resume(held_id)
+    if cart is None:
+        st.session_state.resume_error = "That basket was already resumed at another till"
+        return
+    # park whatever is being rung up now so nothing is lost
+    if st.session_state.cart:
+        st.session_state.cart.hold(st.session_state.attendant, "Swapped out")
+    st.session_state.cart = cart
+    st.session_state.cart.autosave(st.session_state.attendant)
     st.session_state.ui_refresh = datetime.now()
 
 
@@ -57,7 +116,7 @@ def sales_ui():
     # Session defaults
     # ---------------------------
     if "cart" not in st.session_state:
-        st.session_state.cart = []
+        st.session_state.cart = Cart()
 
     if "last_receipt" not in st.session_state:
         st.session_state.last_receipt = ""
@@ -78,6 +137,33 @@ def sales_ui():
         st.warning("⚠️ Please enter attendant name before selling")
         return
 
+    # Restore an unfinished basket (e.g. after the tab was closed)
+    if not st.session_state.cart and not st.session_state.get("cart_restored"):
+        st.session_state.cart = Cart.from_json(get_active_cart(st.session_state.attendant))
+        st.session_state.cart_restored = True
+
+    cart_stock_watch()
+
+    # ---------------------------
+    # Held baskets
+    # ---------------------------
+    held = get_held_carts()
+    with st.expander(f"⏸️ Held baskets ({len(held)})"):
+        if st.session_state.get("resume_error"):
+            st.error(f"❌ {st.session_state.pop('resume_error')}")
+        if not held:
+            st.info("No held baskets")
+        for held_id, label, held_by, total_cents, held_at in held:
+            col1, col2, col3 = st.columns([4, 2, 1])
+            col1.write(f"**{label}** · {held_by} · {held_at[11:16]}")
+            col2.write(f"KSh {from_cents(total_cents):,.2f}")
+            col3.button(
+                "▶️ Resume",
+                key=f"resume_{held_id}",
+                on_click=resume_cart,
+                args=(held_id,)
+            )
+
     # ---------------------------
     # Barcode Scan (HARD LOCK)
     # ---------------------------
@@ -99,20 +185,32 @@ def sales_ui():
         st.error("❌ Invalid barcode. Product not found.")
         return
 
-    product_id, name, price, stock = selected_product
+    product_id, name, base_price, stock, category, pack_qty = selected_product
+
+    # Scheduled price and live promotions, from the cached price book
+    book = get_price_book()
+    price = from_cents(book.list_cents(product_id, base_price))
+    promotions = book.promotions_for(product_id, category)
 
     # Beep on successful scan
     play_beep()
 
     st.success("✅ Product loaded")
     st.write(f"**Product:** {name}")
-    st.write(f"**Price:** KSh {price}")
+    if pack_qty > 1:
+        st.write(f"**Pack:** {pack_qty} units")
+        st.write(f"**Price:** KSh {price * pack_qty} per pack (KSh {price} per unit)")
+    else:
+        st.write(f"**Price:** KSh {price}")
+    for promo in promotions:
+        st.write(f"🏷️ **Promotion:** {promo['name']}")
     st.write(f"**Stock Available:** {stock}")
 
     # ---------------------------
     # Stock check
     # ---------------------------
-    if stock <= 0:
+    # stock is kept in base units; a pack needs pack_qty of them
+    if stock < pack_qty:
         st.error("⛔ Product is OUT OF STOCK")
         return
 
@@ -120,64 +218,71 @@ def sales_ui():
     # Quantity & Add to Cart
     # ---------------------------
     qty_sold = st.number_input(
-        "Quantity to sell",
+        "Packs to sell" if pack_qty > 1 else "Quantity to sell",
         min_value=1,
-        max_value=stock,
+        max_value=stock // pack_qty,
         step=1
     )
 
     if st.button("➕ Add to Cart"):
-        existing = next(
-            (item for item in st.session_state.cart if item["product_id"] == product_id),
-            None
-        )
-
-        if existing:
-            if existing["qty"] + qty_sold > stock:
-                st.error("❌ Quantity exceeds available stock")
-            else:
-                existing["qty"] += qty_sold
-                st.success(f"Updated {name} quantity")
+        cart = st.session_state.cart
+        merging = product_id in cart
+        try:
+            cart.add(product_id, name, price, qty_sold * pack_qty, stock, promotions)
+        except ValueError as e:
+            st.error(f"❌ {e}")
         else:
-            st.session_state.cart.append({
-                "product_id": product_id,
-                "name": name,
-                "price": price,
-                "qty": qty_sold,
-                "stock": stock
-            })
-            st.success(f"Added {qty_sold} x {name} to cart")
+            cart.autosave(st.session_state.attendant)
+            if merging:
+                st.success(f"Updated {name} quantity")
+            else:
+                st.success(f"Added {qty_sold * pack_qty} x {name} to cart")
 
         st.session_state.ui_refresh = datetime.now()
 
     # ---------------------------
     # Cart Display
     # ---------------------------
-    if st.session_state.cart:
+    cart = st.session_state.cart
+    if cart:
         st.subheader("🛒 Cart")
-        total_amount = 0
-        for i, item in enumerate(st.session_state.cart):
+        for item in cart.items():
             col1, col2, col3, col4 = st.columns([4, 1, 2, 1])
-            col1.write(item["name"])
+            if item["promotion"]:
+                col1.write(f"{item['name']}  \n🏷️ {item['promotion']} (−KSh {item['discount']:,.2f})")
+            else:
+                col1.write(item["name"])
             col2.write(item["qty"])
-            col3.write(f"KSh {item['price'] * item['qty']}")
+            col3.write(f"KSh {cart.line_total(item['product_id']):,.2f}")
             col4.button(
                 "❌",
-                key=f"remove_{i}",
+                key=f"remove_{item['product_id']}",
                 on_click=remove_from_cart,
-                args=(i,)
+                args=(item["product_id"],)
             )
-            total_amount += item["price"] * item["qty"]
-        st.info(f"💰 Total Amount: KSh {total_amount}")
+        st.info(f"💰 Total Amount: KSh {cart.total:,.2f}")
+
+        col1, col2 = st.columns([3, 1])
+        hold_label = col1.text_input(
+            "Hold label",
+            placeholder="e.g. Lady in red",
+            label_visibility="collapsed"
+        )
+        col2.button(
+            "⏸️ Hold basket",
+            on_click=hold_current_cart,
+            args=(hold_label,)
+        )
 
     # ---------------------------
     # Receipt
     # ---------------------------
     if st.button("🧾 Generate Receipt"):
-        st.session_state.last_receipt = generate_receipt(
+        st.session_state.last_receipt_doc = receipt_from_cart(
             st.session_state.attendant,
-            st.session_state.cart
+            st.session_state.cart.items()
         )
+        st.session_state.last_receipt = render_text(st.session_state.last_receipt_doc)
 
     if st.session_state.last_receipt:
         st.subheader("🧾 Generated Receipt")
@@ -195,20 +300,47 @@ def sales_ui():
             unsafe_allow_html=True
         )
 
+        doc = st.session_state.last_receipt_doc
+        stamp = f"{doc['sold_at']:%Y%m%d_%H%M%S}"
+        col1, col2, col3 = st.columns(3)
+        col1.download_button(
+            "⬇️ PDF",
+            data=render_pdf(doc),
+            file_name=f"receipt_{stamp}.pdf",
+            mime="application/pdf"
+        )
+        col2.download_button(
+            "⬇️ ESC/POS",
+            data=render_escpos(doc),
+            file_name=f"receipt_{stamp}.bin",
+            mime="application/octet-stream"
+        )
+        if os.environ.get("DUKA_PRINTER") and col3.button("🖨️ Print"):
+            try:
+                send_to_printer(render_escpos(doc))
+                st.success("Sent to printer")
+            except OSError as e:
+                st.error(f"❌ Printer: {e}")
+
     # ---------------------------
     # Complete Sale
     # ---------------------------
     if st.button("♻️ Complete / New Sale"):
-        for item in st.session_state.cart:
-            new_stock = item["stock"] - item["qty"]
-            update_stock(item["product_id"], new_stock)
-            record_sale(
-                item["product_id"],
-                item["name"],
-                item["qty"],
-                item["price"],
-                st.session_state.attendant
-            )
-
+        cart = st.session_state.cart
+        if not cart:
+            reset_cart_and_receipt()
+            return
+
+        try:
+            receipt_no, _ = checkout(cart.items(), st.session_state.attendant)
+        except ValueError as e:
+            st.error(f"❌ {e}")
+            return
+
+        record_event(
+            st.session_state.attendant,
+            "sale",
+            f"{receipt_no} · {len(cart)} lines"
+        )
         reset_cart_and_receipt()
         st.success("✅ Sale completed successfully")
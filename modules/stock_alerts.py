@@ -0,0 +1,22 @@
+import streamlit as st
+
+from database.tables import get_low_stock_products
+
+
+# ---------------------------
+# Streamlit UI
+# ---------------------------
+def low_stock_panel():
+    low = get_low_stock_products()
+    st.subheader(f"⚠️ Low Stock ({len(low)})")
+
+    if not low:
+        st.success("✅ All products are above their reorder level")
+        return
+
+    for _, name, category, qty, level, barcode in low:
+        col1, col2, col3, col4 = st.columns([3, 2, 1, 1])
+        col1.write(name)
+        col2.write(category or "-")
+        col3.write(f"{qty} left")
+        col4.write(f"reorder at {level}")
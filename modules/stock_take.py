@@ -0,0 +1,470 @@
+"""Stock-take (cycle count) mode.
+
+Staff scan shelves continuously; each till keeps its counts in a
+`StockTake` object and flushes them to the `stock_counts` staging table
+in one executemany every FLUSH_EVERY scans, so counting never touches
+`products` and costs a handful of small commits. Several tills can count
+into the same session at once. While a till holds unsaved scans it keeps
+a row in `stock_take_tills` (written when its buffer starts filling,
+removed by the flush), and a count is not applied while another till
+still has one. An open Stock Take page saves a buffer that has sat idle
+for POLL_SECONDS.
+
+Reconciliation is set based: one transaction compares the staged counts
+with `products.quantity`, writes a `stock_adjustments` row for every
+difference and updates all affected products with a single UPDATE ... FROM.
+Units sold after a product was last scanned are taken off its count, so
+the till can keep selling during the count.
+"""
+
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+
+import pandas as pd
+import streamlit as st
+
+from database.changes import POLL_SECONDS, publish
+from database.tables import borrow_connection, get_products_by_barcodes
+
+FLUSH_EVERY = 25  # scans held in memory before they're written
+
+
+# ---------------------------
+# Tables
+# ---------------------------
+def init_stock_take_tables(conn):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS stock_take_sessions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        category TEXT,
+        started_by TEXT,
+        started_at TEXT NOT NULL,
+        finished_at TEXT,
+        status TEXT NOT NULL DEFAULT 'open'
+    )
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS stock_counts (
+        session_id INTEGER NOT NULL,
+        product_id INTEGER NOT NULL,
+        counted INTEGER NOT NULL,
+        counted_at TEXT NOT NULL,
+        PRIMARY KEY (session_id, product_id)
+    ) WITHOUT ROWID
+    """)
+    # tills with scans not yet in stock_counts
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS stock_take_tills (
+        session_id INTEGER NOT NULL,
+        till_id TEXT NOT NULL,
+        till TEXT,
+        pending_since TEXT NOT NULL,
+        PRIMARY KEY (session_id, till_id)
+    ) WITHOUT ROWID
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS stock_adjustments (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id INTEGER NOT NULL,
+        product_id INTEGER NOT NULL,
+        product_name TEXT,
+        expected INTEGER NOT NULL,
+        counted INTEGER NOT NULL,
+        diff INTEGER NOT NULL,
+        adjusted_at TEXT NOT NULL
+    )
+    """)
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_stock_adjustments_session ON stock_adjustments(session_id)"
+    )
+    conn.commit()
+
+
+def _now():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+# ---------------------------
+# Sessions
+# ---------------------------
+def get_open_stock_take(conn=None):
+    """(id, category, started_by, started_at) of the open count, or None."""
+    with borrow_connection(conn) as conn:
+        init_stock_take_tables(conn)
+        return conn.execute("""
+            SELECT id, category, started_by, started_at
+            FROM stock_take_sessions
+            WHERE status = 'open'
+            ORDER BY id DESC LIMIT 1
+        """).fetchone()
+
+
+def start_stock_take(started_by, category=None):
+    """Open a count (or join the one already open). Returns its id."""
+    with borrow_connection() as conn:
+        existing = get_open_stock_take(conn)
+        if existing:
+            return existing[0]
+        with conn:
+            cur = conn.execute("""
+                INSERT INTO stock_take_sessions (category, started_by, started_at)
+                VALUES (?, ?, ?)
+            """, (category or None, started_by, _now()))
+        return cur.lastrowid
+
+
+def cancel_stock_take(session_id):
+    with borrow_connection() as conn:
+        with conn:
+            conn.execute("DELETE FROM stock_counts WHERE session_id = ?", (session_id,))
+            conn.execute("DELETE FROM stock_take_tills WHERE session_id = ?", (session_id,))
+            conn.execute("""
+                UPDATE stock_take_sessions SET status = 'cancelled', finished_at = ?
+                WHERE id = ?
+            """, (_now(), session_id))
+
+
+class StockTake:
+    """One till's scans for a count, buffered in memory."""
+
+    def __init__(self, session_id, till=""):
+        self.session_id = session_id
+        self.till = till           # shown to other tills while scans are unsaved
+        self.till_id = uuid.uuid4().hex
+        self.pending = Counter()   # product_id -> units not yet written
+        self.scanned_at = {}       # product_id -> time of its last scan
+        self.products = {}         # barcode -> (product_id, name, pack_qty)
+        self.scans = 0
+        self.last = None
+        self.last_scan = 0.0       # time.monotonic() of the last scan
+
+    def scan(self, barcode, packs=1):
+        """Count one scan of `barcode`. Returns (name, units) or None if unknown."""
+        product = self.products.get(barcode)
+        if product is None:
+            row = get_products_by_barcodes([barcode]).get(barcode)
+            if row is None:
+                return None
+            product_id, name, _, _, pack_qty = row
+            product = self.products[barcode] = (product_id, name, pack_qty)
+
+        product_id, name, pack_qty = product
+        units = packs * pack_qty
+        if not self.pending:
+            self._mark_pending()
+        self.pending[product_id] += units
+        self.scanned_at[product_id] = _now()
+        self.scans += 1
+        self.last = (name, units)
+        self.last_scan = time.monotonic()
+        if self.scans % FLUSH_EVERY == 0:
+            self.flush()
+        return self.last
+
+    def _mark_pending(self):
+        with borrow_connection() as conn:
+            with conn:
+                conn.execute("""
+                    INSERT OR IGNORE INTO stock_take_tills (session_id, till_id, till, pending_since)
+                    VALUES (?, ?, ?, ?)
+                """, (self.session_id, self.till_id, self.till, _now()))
+
+    def flush(self):
+        """Add the buffered counts to the staging table in one transaction."""
+        if not self.pending:
+            return 0
+        rows = [
+            (self.session_id, pid, units, self.scanned_at[pid])
+            for pid, units in self.pending.items()
+        ]
+        with borrow_connection() as conn:
+            with conn:
+                conn.executemany("""
+                    INSERT INTO stock_counts (session_id, product_id, counted, counted_at)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT(session_id, product_id) DO UPDATE
+                    SET counted = counted + excluded.counted,
+                        counted_at = MAX(counted_at, excluded.counted_at)
+                """, rows)
+                conn.execute(
+                    "DELETE FROM stock_take_tills WHERE session_id = ? AND till_id = ?",
+                    (self.session_id, self.till_id)
+                )
+        self.pending.clear()
+        return len(rows)
+
+
+def set_count(session_id, product_id, counted):
+    """Overwrite a product's count (fixing a miscount)."""
+    with borrow_connection() as conn:
+        with conn:
+            conn.execute("""
+                INSERT INTO stock_counts (session_id, product_id, counted, counted_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(session_id, product_id) DO UPDATE
+                SET counted = excluded.counted, counted_at = excluded.counted_at
+            """, (session_id, product_id, counted, _now()))
+
+
+# ---------------------------
+# Reconciliation
+# ---------------------------
+# Products in the count (or, with zero_missing, every product in the
+# session's category), with what the DB expects, what was counted less
+# anything sold since the product was last scanned, and the difference.
+DIFF_SQL = """
+WITH session AS (
+    SELECT id, category, started_at FROM stock_take_sessions WHERE id = :sid
+),
+sold AS (
+    SELECT s.product_id, SUM(s.quantity) AS qty
+    FROM sale_lines s
+    JOIN stock_counts sc ON sc.session_id = :sid AND sc.product_id = s.product_id
+    WHERE s.sold_at >= (SELECT CAST(strftime('%s', started_at) AS INTEGER) FROM session)
+      AND s.sold_at > CAST(strftime('%s', sc.counted_at) AS INTEGER)
+    GROUP BY s.product_id
+),
+scope AS (
+    SELECT p.id, p.name, p.quantity AS expected,
+           MAX(IFNULL(sc.counted, 0) - IFNULL(sold.qty, 0), 0) AS counted
+    FROM products p
+    LEFT JOIN stock_counts sc ON sc.session_id = :sid AND sc.product_id = p.id
+    LEFT JOIN sold ON sold.product_id = p.id
+    WHERE sc.product_id IS NOT NULL
+       OR (:zero_missing AND (
+               (SELECT category FROM session) IS NULL
+               OR p.category = (SELECT category FROM session)))
+)
+SELECT id, name, expected, counted, counted - expected AS diff
+FROM scope
+"""
+
+
+def preview_stock_take(session_id, zero_missing=False):
+    """[(product_id, name, expected, counted, diff)] for products that differ."""
+    with borrow_connection() as conn:
+        return conn.execute(
+            f"SELECT * FROM ({DIFF_SQL}) WHERE diff <> 0 ORDER BY ABS(diff) DESC",
+            {"sid": session_id, "zero_missing": int(zero_missing)}
+        ).fetchall()
+
+
+def count_progress(session_id):
+    """(products counted, units counted) in the staging table."""
+    with borrow_connection() as conn:
+        return conn.execute("""
+            SELECT COUNT(*), IFNULL(SUM(counted), 0)
+            FROM stock_counts WHERE session_id = ?
+        """, (session_id,)).fetchone()
+
+
+def tills_with_unsaved_scans(session_id):
+    """[(till, pending since)] for tills holding scans not yet saved."""
+    with borrow_connection() as conn:
+        return conn.execute("""
+            SELECT till, pending_since FROM stock_take_tills
+            WHERE session_id = ? ORDER BY pending_since
+        """, (session_id,)).fetchall()
+
+
+def apply_stock_take(session_id, zero_missing=False, force=False):
+    """Reconcile the count in one transaction. Returns the products adjusted.
+
+    Raises ValueError while another till has unsaved scans (flush this
+    till's own first); force=True applies without them, e.g. for a till
+    that was abandoned mid-count.
+    """
+    now = _now()
+    with borrow_connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            unsaved = conn.execute(
+                "SELECT till FROM stock_take_tills WHERE session_id = ?", (session_id,)
+            ).fetchall()
+            if unsaved and not force:
+                names = ", ".join(sorted({till or "unnamed till" for till, in unsaved}))
+                raise ValueError(f"Unsaved scans on {names}: save them before applying")
+            conn.execute("DROP TABLE IF EXISTS temp.stock_take_diff")
+            conn.execute(
+                f"CREATE TEMP TABLE stock_take_diff AS SELECT * FROM ({DIFF_SQL}) WHERE diff <> 0",
+                {"sid": session_id, "zero_missing": int(zero_missing)}
+            )
+            conn.execute("""
+                INSERT INTO stock_adjustments
+                    (session_id, product_id, product_name, expected, counted, diff, adjusted_at)
+                SELECT ?, id, name, expected, counted, diff, ?
+                FROM temp.stock_take_diff
+            """, (session_id, now))
+            adjusted_ids = [
+                row[0] for row in conn.execute("SELECT id FROM temp.stock_take_diff")
+            ]
+            adjusted = conn.execute("""
+                UPDATE products SET quantity = d.counted
+                FROM temp.stock_take_diff d
+                WHERE d.id = products.id
+            """).rowcount
+            conn.execute("DELETE FROM stock_counts WHERE session_id = ?", (session_id,))
+            conn.execute("DELETE FROM stock_take_tills WHERE session_id = ?", (session_id,))
+            conn.execute("""
+                UPDATE stock_take_sessions SET status = 'applied', finished_at = ?
+                WHERE id = ?
+            """, (now, session_id))
+            conn.execute("DROP TABLE temp.stock_take_diff")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    publish("products", adjusted_ids)
+    return adjusted
+
+
+def get_stock_adjustments(limit=200):
+    """[(adjusted_at, product_name, expected, counted, diff, session_id)], newest first."""
+    with borrow_connection() as conn:
+        init_stock_take_tables(conn)
+        return conn.execute("""
+            SELECT adjusted_at, product_name, expected, counted, diff, session_id
+            FROM stock_adjustments
+            ORDER BY id DESC LIMIT ?
+        """, (limit,)).fetchall()
+
+
+# ---------------------------
+# Streamlit UI
+# ---------------------------
+def _on_scan():
+    barcode = st.session_state.stock_take_scan.strip()
+    st.session_state.stock_take_scan = ""  # ready for the next scan
+    if not barcode:
+        return
+    if st.session_state.stock_take.scan(barcode) is None:
+        st.session_state.stock_take_error = f"Unknown barcode {barcode}"
+
+
+@st.fragment(run_every=POLL_SECONDS)
+def count_status():
+    """Progress metrics; saves this till's scans once it stops scanning."""
+    tracker = st.session_state.stock_take
+    if tracker.pending and time.monotonic() - tracker.last_scan >= POLL_SECONDS:
+        tracker.flush()
+    products, units = count_progress(tracker.session_id)
+    pending = sum(tracker.pending.values())
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Scans (this till)", tracker.scans)
+    col2.metric("Products counted", products)
+    col3.metric("Units counted", units + pending)
+    if pending:
+        st.caption(f"{pending} unit(s) not saved yet")
+
+
+def stock_take_ui():
+    st.markdown(
+        "<h1 style='text-align:center;color:#009688;'>📋 Stock Take</h1>",
+        unsafe_allow_html=True
+    )
+
+    if st.session_state.get("stock_take_done"):
+        st.success(st.session_state.pop("stock_take_done"))
+
+    session = get_open_stock_take()
+    if session is None:
+        from database.tables import get_products
+        categories = sorted({p[2] for p in get_products() if p[2]})
+        category = st.selectbox("Count", ["All products"] + categories)
+        if st.button("▶️ Start stock take"):
+            start_stock_take(
+                st.session_state.get("username", ""),
+                None if category == "All products" else category
+            )
+            st.rerun()
+
+        adjustments = get_stock_adjustments()
+        if adjustments:
+            st.subheader("📜 Recent Adjustments")
+            st.dataframe(
+                pd.DataFrame(
+                    adjustments,
+                    columns=["Adjusted", "Product", "Expected", "Counted", "Difference", "Count #"]
+                ),
+                use_container_width=True,
+                hide_index=True
+            )
+        return
+
+    session_id, category, started_by, started_at = session
+    st.caption(
+        f"Count #{session_id} · {category or 'All products'} · "
+        f"started {started_at[:16]} by {started_by or '-'}"
+    )
+
+    tracker = st.session_state.get("stock_take")
+    if tracker is None or tracker.session_id != session_id:
+        tracker = st.session_state.stock_take = StockTake(
+            session_id, st.session_state.get("username", "")
+        )
+
+    # ---------------------------
+    # Scanning
+    # ---------------------------
+    st.text_input(
+        "Scan barcode",
+        key="stock_take_scan",
+        on_change=_on_scan,
+        placeholder="Scan items one after another"
+    )
+    if st.session_state.get("stock_take_error"):
+        st.error(f"❌ {st.session_state.pop('stock_take_error')}")
+    elif tracker.last:
+        st.success(f"✅ {tracker.last[0]} +{tracker.last[1]}")
+
+    count_status()
+    st.button("💾 Save progress", on_click=tracker.flush)
+
+    # ---------------------------
+    # Reconcile
+    # ---------------------------
+    st.markdown("---")
+    st.subheader("⚖️ Differences")
+    zero_missing = st.checkbox(
+        "Set products that were not counted to 0",
+        help="Only for a full count of " + (category or "the whole shop")
+    )
+    # off while scanning: the preview needs this till's counts saved first
+    if st.toggle("Show differences"):
+        tracker.flush()
+        diff = preview_stock_take(session_id, zero_missing)
+        if not diff:
+            st.success("✅ Counts match the system so far")
+        else:
+            st.dataframe(
+                pd.DataFrame(diff, columns=["ID", "Product", "Expected", "Counted", "Difference"])
+                .drop(columns="ID"),
+                use_container_width=True,
+                hide_index=True
+            )
+
+    tracker.flush()
+    others = tills_with_unsaved_scans(session_id)
+    force = False
+    if others:
+        st.warning("⏳ Unsaved scans on " + ", ".join(
+            f"{till or 'unnamed till'} (since {since[11:16]})" for till, since in others
+        ) + ". They are saved after a few seconds without scanning.")
+        force = st.checkbox("Apply without them (that till was abandoned)")
+
+    col1, col2 = st.columns(2)
+    if col1.button("✅ Apply counts", type="primary", disabled=bool(others) and not force):
+        try:
+            adjusted = apply_stock_take(session_id, zero_missing, force=force)
+        except ValueError as e:
+            st.error(f"❌ {e}")
+        else:
+            st.session_state.pop("stock_take", None)
+            st.session_state.stock_take_done = f"✅ Stock take applied, {adjusted} product(s) adjusted"
+            st.rerun()
+    if col2.button("🗑 Cancel stock take"):
+        cancel_stock_take(session_id)
+        st.session_state.pop("stock_take", None)
+        st.rerun()
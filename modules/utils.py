@@ -1,4 +1,3 @@
-import sqlite3
 import os
 from datetime import datetime
 import streamlit as st
@@ -9,11 +8,8 @@ from barcode.writer import ImageWriter
 
 # Database helpers
 # ---------------------------
-DB_PATH = "database/stock.db"
-
-def get_connection():
-    """Return a SQLite connection"""
-    return sqlite3.connect(DB_PATH, check_same_thread=False)
+# connections follow the shop selected at login (see database/tenants.py)
+from database.tables import get_connection  # noqa: E402
 
 # ---------------------------
 # Barcode helpers
@@ -0,0 +1,111 @@
+"""Load test for the headless API (`api_server.py`).
+
+Fires barcode lookups (and optionally checkouts) at a running API server
+from many concurrent clients and prints throughput and latency
+percentiles.
+
+    python api_server.py &
+    python utils/api_load_test.py --requests 5000 --concurrency 50
+
+Barcodes are taken from the local `stock.db` unless given with --barcode.
+"""
+
+import argparse
+import asyncio
+import json
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+from tornado.httpclient import AsyncHTTPClient, HTTPClientError
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from database.tables import DB_PATH
+
+
+def load_barcodes(limit=500):
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        rows = conn.execute(
+            "SELECT barcode FROM products WHERE quantity > 0 LIMIT ?", (limit,)
+        ).fetchall()
+    finally:
+        conn.close()
+    return [r[0] for r in rows]
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+async def run(base_url, barcodes, total, concurrency, checkout_every):
+    client = AsyncHTTPClient(max_clients=concurrency)
+    latencies = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            barcode = barcodes[i % len(barcodes)]
+            if checkout_every and i % checkout_every == 0:
+                url = f"{base_url}/api/checkout"
+                request = {
+                    "method": "POST",
+                    "body": json.dumps({
+                        "attendant": "loadtest",
+                        "items": [{"barcode": barcode, "qty": 1}]
+                    })
+                }
+            else:
+                url = f"{base_url}/api/products/{barcode}"
+                request = {}
+
+            start = time.perf_counter()
+            try:
+                await client.fetch(url, **request)
+            except HTTPClientError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"Requests:    {len(latencies)} ({errors} errors)")
+    print(f"Elapsed:     {elapsed:.2f}s")
+    print(f"Throughput:  {len(latencies) / elapsed:.0f} req/s")
+    for pct in (50, 95, 99):
+        print(f"p{pct}:         {percentile(latencies, pct) * 1000:.2f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test the Duka API")
+    parser.add_argument("--url", default="http://127.0.0.1:8600")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--barcode", action="append", help="barcode(s) to query")
+    parser.add_argument(
+        "--checkout-every", type=int, default=0,
+        help="make every Nth request a 1-item checkout (0 = lookups only)"
+    )
+    opts = parser.parse_args()
+
+    barcodes = opts.barcode or load_barcodes()
+    if not barcodes:
+        print("No barcodes to query. Add products first or pass --barcode.")
+        return
+
+    asyncio.run(run(opts.url, barcodes, opts.requests, opts.concurrency, opts.checkout_every))
+
+
+if __name__ == "__main__":
+    main()
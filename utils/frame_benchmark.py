@@ -0,0 +1,131 @@
+"""Time and memory: the report's Sales List from tuples vs from Arrow batches.
+
+For each month, runs the report's one statement (REPORT_SQL, with the
+sale lines) and builds the Sales List two ways from the same cursor:
+
+    tuples  cursor.fetchall() + pd.DataFrame(line rows, columns=...)
+    arrow   what run_report does: breakdown rows as tuples, then the rest
+            of the cursor -> Arrow batches -> pyarrow dtypes
+
+and prints the best-of-N build time, the peak Python heap while building
+(tracemalloc) and the size of the finished DataFrame (deep).
+
+    python utils/frame_benchmark.py                       # the app's stock.db
+    python utils/frame_benchmark.py --seed-per-day 5000   # seeded temp DB
+
+Months are the --months most recent calendar months with sales.
+"""
+
+import argparse
+import gc
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+
+def _cursor(conn, start, end):
+    from modules.report_engine import REPORT_SQL, _bounds
+
+    cs, ce = _bounds(start, end)
+    return conn.execute(REPORT_SQL, {"cs": cs, "ce": ce, "ps": 0, "pe": 0, "rows": 1})
+
+
+def tuples_frame(conn, start, end):
+    import pandas as pd
+    from modules.report_engine import LINE_COLUMNS
+
+    rows = _cursor(conn, start, end).fetchall()
+    return pd.DataFrame(
+        [(r[2], r[6], r[7], r[8], r[3], r[4]) for r in rows if r[0] == "line"],
+        columns=list(LINE_COLUMNS.values())
+    )
+
+
+def arrow_frame(conn, start, end):
+    from modules.report_engine import _read_report
+
+    return _read_report(_cursor(conn, start, end))[1]
+
+
+def measure(build, conn, start, end, repeat):
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        df = build(conn, start, end)
+        times.append(time.perf_counter() - started)
+        del df
+
+    gc.collect()
+    tracemalloc.start()
+    df = build(conn, start, end)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(times), peak, int(df.memory_usage(deep=True).sum()), len(df)
+
+
+def recent_months(conn, count):
+    """(first day, last day) of the `count` latest months with sales, newest first."""
+    from database.tables import to_sold_at
+
+    last = conn.execute("SELECT MAX(sold_at) FROM sale_lines").fetchone()[0]
+    if last is None:
+        return []
+    newest = date(1970, 1, 1) + timedelta(days=last // 86400)
+    months, first = [], newest.replace(day=1)
+    while len(months) < count:
+        end = (first + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        if not conn.execute(
+            "SELECT 1 FROM sale_lines WHERE sold_at >= ? AND sold_at < ? LIMIT 1",
+            (to_sold_at(first), to_sold_at(end + timedelta(days=1)))
+        ).fetchone():
+            break
+        months.append((first, end))
+        first = (first - timedelta(days=1)).replace(day=1)
+    return months
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Tuple vs Arrow DataFrame benchmark")
+    parser.add_argument("--db", help="DB to read (default: the app's stock.db)")
+    parser.add_argument("--seed-per-day", type=int, default=0,
+                        help="seed a temp DB with this many sales a day instead")
+    parser.add_argument("--months", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=3)
+    opts = parser.parse_args()
+
+    if opts.seed_per_day:
+        from utils.load_test_app import seed_database
+
+        db_path = os.path.join(tempfile.mkdtemp(prefix="duka-frames-"), "stock.db")
+        print(f"Seeding {db_path} ...")
+        seed_database(db_path, days=31 * opts.months, sales_per_day=opts.seed_per_day)
+    elif opts.db:
+        db_path = opts.db
+    else:
+        from database.tables import DB_PATH as db_path
+    os.environ["DUKA_DB_PATH"] = db_path
+
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    print(f"{'month':<9}{'path':<8}{'lines':>9}{'ms':>9}{'peak heap MB':>14}{'frame MB':>10}")
+    try:
+        for start, end in recent_months(conn, opts.months):
+            for name, build in (("tuples", tuples_frame), ("arrow", arrow_frame)):
+                seconds, peak, size, lines = measure(build, conn, start, end, opts.repeat)
+                print(f"{start:%Y-%m}  {name:<8}{lines:>9,}{seconds * 1000:>9.0f}"
+                      f"{peak / 1e6:>14.1f}{size / 1e6:>10.1f}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Dead-stock check for the inventory metrics.
+
+Seeds a throwaway DB with products last sold at known ages and checks
+`compute_inventory_metrics` flags exactly the ones that have not sold in
+the last `dead_days`, both when the sales window is shorter than the
+dead-stock window and when it is longer.
+
+    python utils/inventory_dead_stock_test.py
+
+Exits non-zero (AssertionError) on the first wrong flag.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+# name -> (stock, days since its last sale or None if never sold)
+PRODUCTS = {
+    "sold 10 days ago": (5, 10),
+    "sold 60 days ago": (5, 60),
+    "never sold": (5, None),
+    "sold out 60 days ago": (0, 60),
+}
+
+# (window_days, dead_days) -> products that must show as dead
+EXPECTED = {
+    (30, 90): {"never sold"},
+    (90, 30): {"sold 60 days ago", "never sold"},
+    (30, 30): {"sold 60 days ago", "never sold"},
+}
+
+
+def seed():
+    from database.tables import get_connection, init_db, to_sold_at
+
+    init_db()
+    now = datetime.now()
+    conn = get_connection()
+    try:
+        for n, (name, (stock, age)) in enumerate(PRODUCTS.items()):
+            cur = conn.execute(
+                "INSERT INTO products (name, category, price, quantity, barcode) "
+                "VALUES (?, 'test', 100, ?, ?)",
+                (name, stock, f"DEAD-{n}")
+            )
+            if age is not None:
+                conn.execute(
+                    "INSERT INTO sale_lines (product_id, quantity, price_cents, sold_at) "
+                    "VALUES (?, 1, 10000, ?)",
+                    (cur.lastrowid, to_sold_at(now - timedelta(days=age)))
+                )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def main() -> None:
+    folder = tempfile.mkdtemp(prefix="duka-dead-")
+    os.environ["DUKA_DB_PATH"] = os.path.join(folder, "stock.db")
+    try:
+        from modules.inventory import compute_inventory_metrics, load_inventory_arrays
+
+        seed()
+        for (window_days, dead_days), expected in EXPECTED.items():
+            arrays = load_inventory_arrays(window_days=window_days, dead_days=dead_days)
+            _, per_product, _ = compute_inventory_metrics(arrays)
+            dead = set(per_product.loc[per_product["Dead"], "Product"])
+            assert dead == expected, f"window {window_days}d, dead {dead_days}d: {sorted(dead)}"
+            print(f"window {window_days}d, dead {dead_days}d: {sorted(dead)}")
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""End-to-end load test for the Streamlit app.
+
+Runs N simulated attendants at once, each in its own process with a
+headless Streamlit session (`streamlit.testing.v1.AppTest`) driving the
+real `app.py`: log in, open Sales, scan a barcode, add to cart, complete
+the sale and every few rounds open Reports. All sessions share one seeded SQLite file, so DB
+lock contention between tills shows up as it would in the shop.
+
+    python utils/load_test_app.py --attendants 4 --rounds 25
+
+Prints p50/p95/p99 rerun latency per action, reruns per second and the
+number of "database is locked" errors. The seeded DB is a temporary file
+(or --db PATH) so the real stock.db is never touched.
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+APP = str(ROOT / "app.py")
+
+
+def seed_database(path, products=500, days=90, sales_per_day=300):
+    """Create a DB at `path` with products and `days` of sales history."""
+    os.environ["DUKA_DB_PATH"] = path
+    from database.tables import init_db
+
+    init_db()
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.executemany(
+            "INSERT INTO products (name, category, price, quantity, barcode) VALUES (?, ?, ?, ?, ?)",
+            [
+                (f"Item {i}", f"Category {i % 12}", 50 + i % 400, 100000, f"LT{i:06d}")
+                for i in range(products)
+            ]
+        )
+        start = datetime.now() - timedelta(days=days)
+        rows = []
+        for n in range(days * sales_per_day):
+            pid = random.randint(1, products)
+            qty = random.randint(1, 3)
+            price = 50 + (pid - 1) % 400
+            when = start + timedelta(seconds=random.randint(0, days * 86400))
+            rows.append((
+                pid, f"Item {pid - 1}", qty, price, qty * price,
+                when.strftime("%Y-%m-%d %H:%M:%S"), f"seed{n % 5}", f"SEED-{n}"
+            ))
+        conn.executemany("""
+            INSERT INTO sales (product_id, product_name, quantity, price, total,
+                               sale_date, attendant, receipt_no)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+    conn.close()
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+class Attendant:
+    """One till: a Streamlit session driven through AppTest."""
+
+    def __init__(self, name, barcodes, rounds, report_every):
+        self.name = name
+        self.barcodes = barcodes
+        self.rounds = rounds
+        self.report_every = report_every
+        self.results = defaultdict(list)
+        self.lock_errors = 0
+        self.other_errors = []
+
+    def step(self, action, fn):
+        started = time.perf_counter()
+        at = None
+        try:
+            at = fn()
+        except sqlite3.OperationalError as e:
+            self._record_error(str(e))
+        except RuntimeError as e:  # AppTest run timeout
+            self._record_error(str(e))
+        self.results[action].append(time.perf_counter() - started)
+        if at is not None:
+            for exc in at.exception:
+                self._record_error(exc.message)
+        return at
+
+    def _record_error(self, message):
+        if "locked" in message or "busy" in message:
+            self.lock_errors += 1
+        else:
+            self.other_errors.append(message)
+
+    def run(self, start_at):
+        from streamlit.testing.v1 import AppTest
+
+        at = AppTest.from_file(APP, default_timeout=120)
+        time.sleep(max(0.0, start_at - time.time()))
+
+        self.step("load", at.run)
+        at.text_input[0].input(self.name)
+        at.text_input[1].input("1234")
+        self.step("login", lambda: at.button[0].click().run())
+        # login ends in st.rerun(); AppTest keeps the dead login form in
+        # its tree and would look up its (now unset) widget state on the
+        # next run, so pin those values first
+        for widget in at.text_input:
+            if widget.label in ("Your Name", "Password"):
+                widget.set_value("")
+
+        self.step("open_sales", lambda: at.sidebar.radio[0].set_value("Sales").run())
+        self.step("attendant", lambda: at.text_input[0].input(self.name).run())
+
+        for n in range(self.rounds):
+            barcode = random.choice(self.barcodes)
+            self.step("scan", lambda: at.text_input(key="barcode_input").input(barcode).run())
+            add = [b for b in at.button if b.label.startswith("➕")]
+            if add:
+                self.step("add_to_cart", lambda: add[0].click().run())
+            done = [b for b in at.button if b.label.startswith("♻️")]
+            if done:
+                self.step("checkout", lambda: done[0].click().run())
+
+            if self.report_every and (n + 1) % self.report_every == 0:
+                self.step("open_reports", lambda: at.sidebar.radio[0].set_value("Reports").run())
+                self.step("open_sales", lambda: at.sidebar.radio[0].set_value("Sales").run())
+
+        return dict(self.results), self.lock_errors, self.other_errors
+
+
+def _run_attendant(args):
+    # one process per till: AppTest sessions are not safe to share an
+    # interpreter across threads, and separate processes also contend on
+    # the SQLite file the way separate tills do
+    name, barcodes, rounds, report_every, start_at = args
+    return Attendant(name, barcodes, rounds, report_every).run(start_at)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Multi-session load test for app.py")
+    parser.add_argument("--attendants", type=int, default=4)
+    parser.add_argument("--rounds", type=int, default=20, help="sales per attendant")
+    parser.add_argument("--report-every", type=int, default=5)
+    parser.add_argument("--products", type=int, default=500)
+    parser.add_argument("--days", type=int, default=90, help="days of seeded history")
+    parser.add_argument("--db", help="use this DB file instead of a seeded temp file")
+    opts = parser.parse_args()
+
+    tmpdir = None
+    if opts.db:
+        db_path = opts.db
+        os.environ["DUKA_DB_PATH"] = db_path
+    else:
+        tmpdir = tempfile.mkdtemp(prefix="duka-load-")
+        db_path = os.path.join(tmpdir, "stock.db")
+        print(f"Seeding {db_path} ...")
+        seed_database(db_path, products=opts.products, days=opts.days)
+
+    conn = sqlite3.connect(db_path)
+    barcodes = [r[0] for r in conn.execute("SELECT barcode FROM products WHERE quantity > 0")]
+    conn.close()
+
+    # sessions start together, once every process has imported Streamlit
+    start_at = time.time() + 5
+    jobs = [
+        (f"till{i + 1}", barcodes, opts.rounds, opts.report_every, start_at)
+        for i in range(opts.attendants)
+    ]
+    with multiprocessing.Pool(opts.attendants) as pool:
+        outcomes = pool.map(_run_attendant, jobs)
+    elapsed = time.time() - start_at
+
+    results = defaultdict(list)
+    for per_action, _, _ in outcomes:
+        for action, times in per_action.items():
+            results[action].extend(times)
+
+    all_runs = sorted(t for times in results.values() for t in times)
+    print(f"\n{opts.attendants} attendants, {len(all_runs)} reruns in {elapsed:.1f}s "
+          f"({len(all_runs) / elapsed:.1f} reruns/s)")
+    print(f"{'action':<14}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for action in sorted(results):
+        times = sorted(results[action])
+        print(f"{action:<14}{len(times):>7}"
+              + "".join(f"{percentile(times, p) * 1000:>10.1f}" for p in (50, 95, 99)))
+    print(f"{'all':<14}{len(all_runs):>7}"
+          + "".join(f"{percentile(all_runs, p) * 1000:>10.1f}" for p in (50, 95, 99)))
+
+    lock_errors = sum(o[1] for o in outcomes)
+    other = [e for o in outcomes for e in o[2]]
+    print(f"\nDB lock errors: {lock_errors}")
+    if other:
+        print(f"Other errors: {len(other)} (first: {other[0][:200]})")
+
+    if tmpdir:
+        print(f"Seeded DB kept at {db_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""Checkout commit latency while heavy reports run.
+
+Copies stock.db (or --db) to a temp file, then for each reader mode runs
+one till thread doing checkouts back to back while --readers threads run
+long-range reports non-stop:
+
+    none      no reports (baseline)
+    rw        reports on ordinary read/write connections (the old way)
+    ro        reports on read-only connections (get_read_connection)
+    snapshot  reports on the in-memory ReportSnapshot
+
+    python utils/report_load_test.py --seconds 10 --readers 3
+    python utils/report_load_test.py --journal delete   # pre-WAL behaviour
+
+Prints commit p50/p95/p99/max, failed checkouts and reports completed.
+"""
+
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+MODES = ("none", "rw", "ro", "snapshot")
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+def run_mode(mode, seconds, readers, days, product_ids):
+    from database.tables import checkout, get_connection
+    from modules.report_engine import ReportSnapshot, run_report
+
+    stop = threading.Event()
+    reports = [0]
+    end = date.today()
+    start = end - timedelta(days=days - 1)
+
+    snapshot = None
+    if mode == "snapshot":
+        snapshot = ReportSnapshot()
+        snapshot.refresh(force=True)
+
+    def reader():
+        while not stop.is_set():
+            if mode == "rw":
+                conn = get_connection()
+                try:
+                    run_report(start, end, "previous_period", conn=conn)
+                finally:
+                    conn.close()
+            elif mode == "ro":
+                run_report(start, end, "previous_period")
+            else:
+                run_report(start, end, "previous_period", conn=snapshot)
+            reports[0] += 1
+
+    threads = [threading.Thread(target=reader, daemon=True) for _ in range(readers if mode != "none" else 0)]
+    for t in threads:
+        t.start()
+
+    latencies, failures = [], 0
+    conn = get_connection()
+    deadline = time.perf_counter() + seconds
+    i = 0
+    while time.perf_counter() < deadline:
+        item = {"product_id": product_ids[i % len(product_ids)], "qty": 1}
+        i += 1
+        started = time.perf_counter()
+        try:
+            checkout([item], "loadtest", conn=conn)
+            latencies.append(time.perf_counter() - started)
+        except sqlite3.OperationalError:
+            failures += 1
+    conn.close()
+
+    stop.set()
+    for t in threads:
+        t.join()
+    return sorted(latencies), failures, reports[0]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Checkout latency under report load")
+    parser.add_argument("--db", help="DB to copy (default: the app's stock.db)")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--readers", type=int, default=3)
+    parser.add_argument("--days", type=int, default=90, help="report range")
+    parser.add_argument("--journal", choices=("wal", "delete"), default="wal")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    opts = parser.parse_args()
+
+    if opts.db:
+        source = opts.db
+    else:
+        from database.tables import DB_PATH as source
+
+    tmpdir = tempfile.mkdtemp(prefix="duka-report-load-")
+    db_path = os.path.join(tmpdir, "stock.db")
+    src = sqlite3.connect(source)
+    dst = sqlite3.connect(db_path)
+    src.backup(dst)
+    src.close()
+    dst.execute(f"PRAGMA journal_mode = {opts.journal}")
+    dst.execute("UPDATE products SET quantity = 1000000")
+    dst.commit()
+    product_ids = [r[0] for r in dst.execute("SELECT id FROM products LIMIT 50")]
+    dst.close()
+
+    # every module below must see the copy, never the real file
+    os.environ["DUKA_DB_PATH"] = db_path
+    for name in [m for m in sys.modules if m.startswith(("database", "modules"))]:
+        del sys.modules[name]
+
+    print(f"{opts.journal} journal, {opts.readers} report threads, "
+          f"{opts.days}-day reports, {opts.seconds:.0f}s per mode")
+    print(f"{'mode':<10}{'sales':>7}{'failed':>8}{'p50 ms':>9}{'p95 ms':>9}"
+          f"{'p99 ms':>9}{'max ms':>9}{'reports':>9}")
+    try:
+        for mode in opts.modes:
+            times, failures, reports = run_mode(
+                mode, opts.seconds, opts.readers, opts.days, product_ids
+            )
+            print(f"{mode:<10}{len(times):>7}{failures:>8}"
+                  + "".join(f"{percentile(times, p) * 1000:>9.1f}" for p in (50, 95, 99))
+                  + f"{(times[-1] * 1000 if times else 0):>9.1f}{reports:>9}")
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
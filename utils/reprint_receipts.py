@@ -0,0 +1,56 @@
+"""Reprint a day's receipts as one job: to a file, a printer, or PDF.
+
+    python utils/reprint_receipts.py --day 2026-10-18 --format pdf --out day.pdf
+    python utils/reprint_receipts.py --day 2026-10-18 --printer tcp://192.168.1.50:9100
+    python utils/reprint_receipts.py --format escpos --out /dev/usb/lp0
+
+Receipts are streamed from the DB and written as each one is complete.
+ESC/POS output to a file is byte-for-byte what a printer would receive.
+"""
+
+import argparse
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Reprint a day's receipts")
+    parser.add_argument("--day", type=date.fromisoformat, default=date.today(),
+                        help="YYYY-MM-DD (default: today)")
+    parser.add_argument("--format", choices=("escpos", "pdf", "text"), default="escpos")
+    parser.add_argument("--paper", choices=("58mm", "80mm"))
+    parser.add_argument("--out", help="file or device to write to")
+    parser.add_argument("--printer", help="send ESC/POS to this printer (tcp://host:port or a path)")
+    opts = parser.parse_args()
+
+    from modules.receipt import get_template, open_printer, reprint
+
+    template = get_template(opts.paper)
+    start, end = opts.day, opts.day + timedelta(days=1)
+    started = time.perf_counter()
+    if opts.printer:
+        if opts.format != "escpos":
+            parser.error("--printer needs --format escpos")
+        with open_printer(opts.printer) as out:
+            count = reprint(start, end, "escpos", out, template)
+        target = opts.printer
+    elif opts.out:
+        with open(opts.out, "ab" if opts.format == "escpos" else "wb") as out:
+            count = reprint(start, end, opts.format, out, template)
+        target = opts.out
+    else:
+        out = sys.stdout.buffer
+        count = reprint(start, end, opts.format, out, template)
+        target = "stdout"
+    print(f"{count} receipts for {opts.day} -> {target} "
+          f"in {time.perf_counter() - started:.2f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
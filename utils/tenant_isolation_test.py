@@ -0,0 +1,159 @@
+"""Two-shop isolation test for the per-shop caches.
+
+Creates two throwaway shops whose databases have gone through the same
+number of writes (so their change_log sequences, which several caches
+key on, are equal) but hold different products and sales, then checks
+that each shop only ever sees its own:
+
+- reorder suggestions (modules/forecast.py)
+- the report snapshot and the reports built from it
+- the day summary and the change feed
+
+and that evicting a shop from `tenant_cache` never closes a report
+snapshot another session is in the middle of querying.
+
+    python utils/tenant_isolation_test.py
+
+Exits non-zero (AssertionError) on the first leak.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from datetime import date, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+SHOPS = {"north": "North socks", "south": "South caps"}
+
+
+def seed_shop(shop, product):
+    """One product and one sale three days ago; the same writes in every shop."""
+    from database.tables import checkout, get_connection
+
+    conn = get_connection()
+    try:
+        conn.execute(
+            "INSERT INTO products (name, category, price, quantity, barcode, reorder_level) "
+            "VALUES (?, 'test', 100, 50, ?, 5)",
+            (product, f"ISO-{shop}")
+        )
+        conn.commit()
+        product_id = conn.execute("SELECT id FROM products WHERE name = ?", (product,)).fetchone()[0]
+    finally:
+        conn.close()
+
+    checkout([{"product_id": product_id, "qty": 3}], attendant=f"{shop}-till")
+    conn = get_connection()
+    try:
+        conn.execute("UPDATE sale_lines SET sold_at = sold_at - 3 * 86400")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def check_caches():
+    from database.changes import Subscription
+    from database.tables import get_connection, get_sales_summary
+    from database.tenants import use_tenant
+    from modules.forecast import _data_version, suggest_reorders
+    from modules.report_engine import report_snapshot, run_report
+
+    versions = {}
+    for shop in SHOPS:
+        with use_tenant(shop):
+            conn = get_connection()
+            try:
+                versions[shop] = _data_version(conn)
+            finally:
+                conn.close()
+    assert len(set(versions.values())) == 1, f"seeding should leave equal versions: {versions}"
+
+    day = date.today() - timedelta(days=3)
+    for _ in range(2):  # the second round is served from the caches
+        for shop, product in SHOPS.items():
+            with use_tenant(shop):
+                names = [row["name"] for row in suggest_reorders()]
+                assert names == [product], f"{shop} reorder suggestions: {names}"
+
+                report = run_report(day, day, conn=report_snapshot())
+                listed = list(report["rows"]["Product"].astype(str))
+                assert listed == [product], f"{shop} report rows: {listed}"
+
+                transactions = get_sales_summary(day.isoformat())[0]
+                assert transactions == 1, f"{shop} day summary: {transactions} transactions"
+
+    with use_tenant("north"):
+        north_feed = Subscription("sales")
+    with use_tenant("south"):
+        from database.changes import publish
+        publish("sales", [99])
+    assert north_feed.poll() == {}, "a south sale reached the north feed"
+    print("caches: each shop sees only its own data")
+
+
+def check_snapshot_eviction():
+    from database.tables import get_sales_summary
+    from database.tenants import tenant_cache, use_tenant
+    from modules.report_engine import report_snapshot
+
+    with use_tenant("north"):
+        snapshot = report_snapshot()
+    started, finish = threading.Event(), threading.Event()
+
+    def slow_query(conn):
+        started.set()
+        finish.wait(10)
+        return conn.execute("SELECT COUNT(*) FROM sale_lines").fetchone()[0]
+
+    result = []
+    reader = threading.Thread(target=lambda: result.append(snapshot._run(slow_query)))
+    reader.start()
+    started.wait(10)
+
+    # an over-full cache: everything but the newest shop is up for eviction
+    budget, tenant_cache.max_bytes = tenant_cache.max_bytes, 0
+    try:
+        with use_tenant("south"):
+            get_sales_summary()  # returning the connection runs an eviction pass
+        assert "north" in tenant_cache.entries, "shop evicted while its snapshot was in use"
+        finish.set()
+        reader.join()
+        assert result == [1], f"query on the snapshot returned {result}"
+
+        with use_tenant("south"):
+            get_sales_summary()  # and again, now that north is idle
+        assert "north" not in tenant_cache.entries, "idle shop was not evicted"
+        assert snapshot.conn is None, "evicted snapshot was not closed"
+    finally:
+        finish.set()
+        tenant_cache.max_bytes = budget
+    print("eviction: a snapshot in use is kept, then freed once idle")
+
+
+def main() -> None:
+    tenants_dir = tempfile.mkdtemp(prefix="duka-tenants-")
+    os.environ["DUKA_TENANTS_DIR"] = tenants_dir
+    try:
+        from database.tenants import create_tenant, tenant_cache, use_tenant
+
+        for shop, product in SHOPS.items():
+            create_tenant(shop)
+            with use_tenant(shop):
+                seed_shop(shop, product)
+
+        check_caches()
+        check_snapshot_eviction()
+        tenant_cache.clear()
+    finally:
+        shutil.rmtree(tenants_dir, ignore_errors=True)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,29 +8,51 @@ Functions
 - `init_visitor_db(db_path: str | Path = None) -> None`
 - `save_visitor(name: str, contact: str, db_path: str | Path = None) -> int`
 - `get_recent_visitors(limit: int = 20, db_path: str | Path = None) -> list[dict]`
+- `record_event(attendant: str, event: str, detail: str = None) -> None`
+- `flush_events() -> None`
+- `get_events(start: datetime, end: datetime, attendant: str = None) -> list[dict]`
+- `get_login_summary(start: datetime, end: datetime) -> list[dict]`
+- `compact_events(retention_days: int = 90) -> int`
 
 The DB schema:
-- id INTEGER PRIMARY KEY AUTOINCREMENT
-- name TEXT NOT NULL
-- contact TEXT
-- timestamp TEXT (ISO-8601)
+- visitors: id, name, contact, timestamp TEXT (ISO-8601)
+- events: id, attendant, event, detail, ts INTEGER (unix epoch seconds)
 
-The implementation is minimal and uses context managers for safety.
+Staff events (logins, sales, ...) go through a buffered writer: callers
+only append to an in-memory queue and a background thread writes them in
+batches, so auditing never adds a DB commit to the login path. If the
+DB cannot be written, the writer keeps at most `max_backlog` events for
+the retry and logs how many of the oldest it drops.
+
+When a hosted shop is selected (database/tenants.py) the default DB is
+that shop's own `visitors.db`, and each shop gets its own writer.
 """
 
 from __future__ import annotations
 
+import atexit
+import logging
+import queue
 import sqlite3
+import threading
+import time
 from datetime import datetime
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Optional
 
 DB_FILENAME = "visitors.db"
 
+log = logging.getLogger(__name__)
+
 
 def _resolve_db_path(db_path: str | Path | None) -> Path:
 	if db_path:
 		return Path(db_path)
+	from database.tenants import current_tenant, tenant_file
+
+	tenant = current_tenant()
+	if tenant is not None:
+		return Path(tenant_file(tenant, DB_FILENAME))
 	# default: place DB next to this module
 	return Path(__file__).resolve().parent / DB_FILENAME
 
@@ -57,6 +79,23 @@ def init_visitor_db(db_path: str | Path | None = None) -> None:
 				)
 				"""
 			)
+			# visitors are only ever read newest-first by id
+			conn.execute("DROP INDEX IF EXISTS idx_visitors_timestamp")
+			conn.execute(
+				"""
+				CREATE TABLE IF NOT EXISTS events (
+					id INTEGER PRIMARY KEY AUTOINCREMENT,
+					attendant TEXT NOT NULL,
+					event TEXT NOT NULL,
+					detail TEXT,
+					ts INTEGER NOT NULL
+				)
+				"""
+			)
+			conn.execute("CREATE INDEX IF NOT EXISTS idx_events_ts ON events(ts)")
+			conn.execute(
+				"CREATE INDEX IF NOT EXISTS idx_events_attendant_ts ON events(attendant, ts)"
+			)
 	finally:
 		conn.close()
 
@@ -105,5 +144,193 @@ def get_recent_visitors(limit: int = 20, db_path: str | Path | None = None) -> L
 		conn.close()
 
 
-__all__ = ["init_visitor_db", "save_visitor", "get_recent_visitors"]
+class EventWriter:
+	"""Queue events in memory and write them in batches on a daemon thread.
+
+	A batch is written when `batch_size` events are waiting or every
+	`flush_interval` seconds, whichever comes first, as one executemany
+	in one transaction. A batch that fails is retried every
+	`flush_interval` seconds together with what arrives meanwhile, capped
+	at the newest `max_backlog` events.
+	"""
+
+	def __init__(
+		self,
+		db_path: str | Path | None = None,
+		batch_size: int = 100,
+		flush_interval: float = 2.0,
+		max_backlog: int = 10_000,
+	):
+		self.path = _resolve_db_path(db_path)
+		self.batch_size = batch_size
+		self.flush_interval = flush_interval
+		self.max_backlog = max_backlog
+		self.queue: "queue.Queue[tuple]" = queue.Queue()
+		self._flushed = threading.Condition()
+		self._pending = 0
+		self._thread = threading.Thread(target=self._run, name="duka-events", daemon=True)
+		self._thread.start()
+
+	def put(self, attendant: str, event: str, detail: Optional[str] = None) -> None:
+		with self._flushed:
+			self._pending += 1
+		self.queue.put((attendant, event, detail, int(time.time())))
+
+	def flush(self, timeout: float = 5.0) -> None:
+		"""Block until everything queued so far has been written."""
+		self.queue.put(None)
+		with self._flushed:
+			self._flushed.wait_for(lambda: self._pending == 0, timeout=timeout)
+
+	def _write(self, conn: sqlite3.Connection, batch: list) -> None:
+		with conn:
+			conn.executemany(
+				"INSERT INTO events (attendant, event, detail, ts) VALUES (?, ?, ?, ?)",
+				batch,
+			)
+		with self._flushed:
+			self._pending -= len(batch)
+			self._flushed.notify_all()
+
+	def _drop_oldest(self, batch: list) -> None:
+		excess = len(batch) - self.max_backlog
+		if excess <= 0:
+			return
+		del batch[:excess]
+		with self._flushed:
+			self._pending -= excess
+			self._flushed.notify_all()
+		log.warning("Cannot write events to %s: dropped the %d oldest", self.path, excess)
+
+	def _run(self) -> None:
+		conn = sqlite3.connect(self.path)
+		batch: list = []
+		retrying = False
+		deadline = time.monotonic() + self.flush_interval
+		while True:
+			try:
+				item = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+			except queue.Empty:
+				item = None
+			if item is not None:
+				batch.append(item)
+			due = item is None or time.monotonic() >= deadline
+			# a failing DB is only retried on the tick, not on every new event
+			if batch and (due or (len(batch) >= self.batch_size and not retrying)):
+				try:
+					self._write(conn, batch)
+				except sqlite3.Error:
+					self._drop_oldest(batch)
+					retrying = True
+					deadline = time.monotonic() + self.flush_interval
+					continue
+				batch = []
+				retrying = False
+			if due:
+				deadline = time.monotonic() + self.flush_interval
+
+
+_writers: Dict[Path, EventWriter] = {}
+_writer_lock = threading.Lock()
+
+
+def _get_writer() -> EventWriter:
+	"""The writer for the current DB (one per shop)."""
+	path = _resolve_db_path(None)
+	with _writer_lock:
+		writer = _writers.get(path)
+		if writer is None:
+			init_visitor_db(path)
+			writer = _writers[path] = EventWriter(path)
+			atexit.register(writer.flush)
+		return writer
+
+
+def record_event(attendant: str, event: str, detail: str | None = None) -> None:
+	"""Queue a staff activity event (e.g. "login", "sale"). Never blocks on the DB."""
+	if not attendant:
+		raise ValueError("attendant is required")
+	_get_writer().put(attendant, event, detail)
+
+
+def flush_events() -> None:
+	"""Write any queued events now."""
+	with _writer_lock:
+		writers = list(_writers.values())
+	for writer in writers:
+		writer.flush()
+
+
+def get_events(
+	start: datetime,
+	end: datetime,
+	attendant: str | None = None,
+	event: str | None = None,
+	db_path: str | Path | None = None,
+) -> List[Dict]:
+	"""Return events with start <= time < end, oldest first (uses the ts indexes)."""
+	where = ["ts >= ?", "ts < ?"]
+	params: list = [int(start.timestamp()), int(end.timestamp())]
+	if attendant:
+		where.append("attendant = ?")
+		params.append(attendant)
+	if event:
+		where.append("event = ?")
+		params.append(event)
+	sql = f"SELECT id, attendant, event, detail, ts FROM events WHERE {' AND '.join(where)} ORDER BY ts"
+	conn = sqlite3.connect(_resolve_db_path(db_path))
+	try:
+		conn.row_factory = sqlite3.Row
+		return [dict(r) for r in conn.execute(sql, params).fetchall()]
+	finally:
+		conn.close()
+
+
+def get_login_summary(start: datetime, end: datetime, db_path: str | Path | None = None) -> List[Dict]:
+	"""Logins per attendant per (local) day in [start, end)."""
+	conn = sqlite3.connect(_resolve_db_path(db_path))
+	try:
+		conn.row_factory = sqlite3.Row
+		cur = conn.execute(
+			"""
+			SELECT date(ts, 'unixepoch', 'localtime') AS day,
+			       attendant,
+			       COUNT(*) AS logins,
+			       time(MIN(ts), 'unixepoch', 'localtime') AS first_login,
+			       time(MAX(ts), 'unixepoch', 'localtime') AS last_login
+			FROM events
+			WHERE event = 'login' AND ts >= ? AND ts < ?
+			GROUP BY day, attendant
+			ORDER BY day, attendant
+			""",
+			(int(start.timestamp()), int(end.timestamp())),
+		)
+		return [dict(r) for r in cur.fetchall()]
+	finally:
+		conn.close()
+
+
+def compact_events(retention_days: int = 90, db_path: str | Path | None = None) -> int:
+	"""Delete events older than `retention_days`; returns rows removed."""
+	cutoff = int(time.time()) - retention_days * 86400
+	conn = sqlite3.connect(_resolve_db_path(db_path))
+	try:
+		with conn:
+			cur = conn.execute("DELETE FROM events WHERE ts < ?", (cutoff,))
+		return cur.rowcount
+	finally:
+		conn.close()
+
+
+__all__ = [
+	"init_visitor_db",
+	"save_visitor",
+	"get_recent_visitors",
+	"EventWriter",
+	"record_event",
+	"flush_events",
+	"get_events",
+	"get_login_summary",
+	"compact_events",
+]
 
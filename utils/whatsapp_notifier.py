@@ -5,41 +5,113 @@ Environment variables:
 - `TWILIO_AUTH_TOKEN`
 - `TWILIO_WHATSAPP_FROM` (e.g. 'whatsapp:+1415xxxx')
 - `TWILIO_WHATSAPP_TO` (e.g. 'whatsapp:+2547xxxx')
+- `DUKA_NOTIFY_TRANSPORT`: 'twilio' (default) or 'stub' to append
+  messages to a local file instead of sending them
+- `DUKA_NOTIFY_OUTBOX`: the stub's file (default utils/outbox.log)
 
-Function: `notify(name: str, contact: str) -> bool`
+Functions
+- `notify(name: str, contact: str) -> bool`
+- `send_message(body: str) -> bool`
+- `get_transport()` / `set_transport(transport)`
 """
 
 from __future__ import annotations
 
 import os
+import threading
+from datetime import datetime
 from typing import Optional
 
-from twilio.rest import Client
+DEFAULT_OUTBOX = os.path.join(os.path.dirname(os.path.abspath(__file__)), "outbox.log")
 
 
-def _get_client() -> Client:
-    sid = os.environ.get("TWILIO_ACCOUNT_SID")
-    token = os.environ.get("TWILIO_AUTH_TOKEN")
-    if not sid or not token:
-        raise RuntimeError("Twilio credentials not set in environment variables")
-    return Client(sid, token)
+# ---------------------------
+# Transports
+# ---------------------------
+class TwilioTransport:
+    """Send through the Twilio WhatsApp API."""
+
+    def _get_client(self):
+        from twilio.rest import Client
+
+        sid = os.environ.get("TWILIO_ACCOUNT_SID")
+        token = os.environ.get("TWILIO_AUTH_TOKEN")
+        if not sid or not token:
+            raise RuntimeError("Twilio credentials not set in environment variables")
+        return Client(sid, token)
+
+    def send(self, body: str, *, from_whatsapp: Optional[str] = None, to_whatsapp: Optional[str] = None) -> bool:
+        client = self._get_client()
+        from_whatsapp = from_whatsapp or os.environ.get("TWILIO_WHATSAPP_FROM")
+        to_whatsapp = to_whatsapp or os.environ.get("TWILIO_WHATSAPP_TO")
+        if not from_whatsapp or not to_whatsapp:
+            raise RuntimeError("Twilio WhatsApp phone numbers not configured (TWILIO_WHATSAPP_FROM/TO)")
+
+        try:
+            message = client.messages.create(body=body, from_=from_whatsapp, to=to_whatsapp)
+            return bool(message.sid)
+        except Exception:
+            return False
+
+
+class StubTransport:
+    """Append messages to a local file (demos, tests, shops without Twilio)."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.environ.get("DUKA_NOTIFY_OUTBOX") or DEFAULT_OUTBOX
+        self.lock = threading.Lock()
+        self.sent = 0
+
+    def send(self, body: str, *, from_whatsapp: Optional[str] = None, to_whatsapp: Optional[str] = None) -> bool:
+        to = to_whatsapp or os.environ.get("TWILIO_WHATSAPP_TO") or "owner"
+        stamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self.lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(f"----- {stamp} to {to} ({len(body)} chars)\n{body}\n")
+            self.sent += 1
+        return True
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def get_transport():
+    """The process-wide transport, picked from DUKA_NOTIFY_TRANSPORT on first use."""
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            kind = os.environ.get("DUKA_NOTIFY_TRANSPORT", "twilio").lower()
+            _transport = StubTransport() if kind == "stub" else TwilioTransport()
+        return _transport
+
+
+def set_transport(transport) -> None:
+    """Use `transport` (anything with a `send(body, ...)` method) from now on."""
+    global _transport
+    with _transport_lock:
+        _transport = transport
+
+
+# ---------------------------
+# Messages
+# ---------------------------
+def send_message(body: str, *, from_whatsapp: Optional[str] = None, to_whatsapp: Optional[str] = None) -> bool:
+    """Send `body` as a WhatsApp message to the owner. Returns True on success."""
+    return get_transport().send(body, from_whatsapp=from_whatsapp, to_whatsapp=to_whatsapp)
 
 
 def notify(name: str, contact: str, *, from_whatsapp: Optional[str] = None, to_whatsapp: Optional[str] = None) -> bool:
     """Send a WhatsApp message about a new visitor. Returns True on success."""
-    client = _get_client()
-    from_whatsapp = from_whatsapp or os.environ.get("TWILIO_WHATSAPP_FROM")
-    to_whatsapp = to_whatsapp or os.environ.get("TWILIO_WHATSAPP_TO")
-    if not from_whatsapp or not to_whatsapp:
-        raise RuntimeError("Twilio WhatsApp phone numbers not configured (TWILIO_WHATSAPP_FROM/TO)")
-
     body = f"New Duka Demo Visitor:\nName: {name}\nContact: {contact or 'N/A'}"
-
-    try:
-        message = client.messages.create(body=body, from_=from_whatsapp, to=to_whatsapp)
-        return bool(message.sid)
-    except Exception:
-        return False
+    return send_message(body, from_whatsapp=from_whatsapp, to_whatsapp=to_whatsapp)
 
 
-__all__ = ["notify"]
+__all__ = [
+    "notify",
+    "send_message",
+    "get_transport",
+    "set_transport",
+    "StubTransport",
+    "TwilioTransport",
+]